@@ -0,0 +1,8 @@
+"""
+性能测试工具
+
+不需要真实设备：用进程内的 FakeYCYBLEClient 代替 YCYBLEClient，
+通过本地 UDP 回放 OSC 流量，测量 OSC 到 BLE 写入的端到端延迟。
+
+    python -m bench.osc_e2e --mode distance --speed 10
+"""
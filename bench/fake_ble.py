@@ -0,0 +1,65 @@
+"""
+进程内的 YCYBLEClient 替身
+
+接口与 pydglab_ws.YCYBLEClient 中连接器用到的部分一致，
+每次写入都以 time.perf_counter() 记录时间戳，供延迟统计使用。
+"""
+import asyncio
+import time
+from typing import List, Tuple
+
+from pydglab_ws import Channel
+from pydglab_ws.ble import ElectrodeStatus
+from pydglab_ws.models import StrengthData
+
+
+class FakeYCYBLEClient:
+    """
+    模拟的役次元 BLE 客户端
+
+    :param device: 设备地址 (仅用于兼容构造参数)
+    :param strength_limit: 强度上限
+    :param write_latency: 模拟单次 BLE 写入耗时 (秒)
+    """
+
+    def __init__(self, device=None, strength_limit: int = 200, write_latency: float = 0.005):
+        self.device = device
+        self.strength_limit = strength_limit
+        self.write_latency = write_latency
+        self.connected = False
+        self._strength = {Channel.A: 0, Channel.B: 0}
+        # (perf_counter 时间戳, 通道 'A'/'B', 强度)
+        self.writes: List[Tuple[float, str, int]] = []
+        self.clears: List[Tuple[float, str]] = []
+
+    async def connect(self) -> bool:
+        self.connected = True
+        return True
+
+    async def disconnect(self):
+        self.connected = False
+
+    @property
+    def strength_data(self) -> StrengthData:
+        return StrengthData(
+            a=self._strength[Channel.A], b=self._strength[Channel.B],
+            a_limit=self.strength_limit, b_limit=self.strength_limit,
+        )
+
+    async def set_strength(self, channel: Channel, operation, value: int) -> bool:
+        await asyncio.sleep(self.write_latency)
+        self._strength[channel] = value
+        self.writes.append((time.perf_counter(), channel.name, value))
+        return True
+
+    async def clear_pulses(self, channel: Channel) -> bool:
+        self.clears.append((time.perf_counter(), channel.name))
+        return True
+
+    async def get_battery(self) -> int:
+        await asyncio.sleep(self.write_latency)
+        return 100
+
+    async def get_electrode_status(self, channel: Channel) -> ElectrodeStatus:
+        await asyncio.sleep(self.write_latency)
+        return ElectrodeStatus.CONNECTED_ACTIVE
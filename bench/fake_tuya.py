@@ -0,0 +1,203 @@
+"""
+本地涂鸦云 API 替身与连接器测试
+
+FakeTuyaCloud 在本机 HTTP 端口上实现 TuyaOpenAPI 用到的接口 (获取 / 刷新令牌、设备命令)，
+可为每个设备设置响应延迟，记录收到的命令及时间。把 TuYaConnection 的 api_endpoint 指向它即可在无云端账号时测试。
+
+    python -m bench.fake_tuya --devices 3 --latency-ms 300 --slow-device 1500
+    python -m bench.fake_tuya --rate 50 --cmd-gap 0.2 --max-lag-ms 20    # 事件循环最大延迟超过阈值时退出码为 1
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from srv.connector.machine_tuya_cloud import TuYaConnection
+
+_COMMANDS_PATH = re.compile(r'^/v1\.0/iot-03/devices/([^/]+)/commands$')
+
+
+class FakeTuyaCloud:
+    """
+    涂鸦云 API 替身 (不校验签名)
+
+    :param device_ids: 在线设备，其它设备 ID 返回离线错误
+    :param latency: 默认响应延迟 (秒)
+    :param device_latency: 各设备的响应延迟 (秒)，覆盖 latency
+    """
+
+    def __init__(self, device_ids: List[str], latency: float = 0.0, device_latency: Dict[str, float] = None):
+        self.device_ids = set(device_ids)
+        self.latency = latency
+        self.device_latency = device_latency or {}
+        # (perf_counter, 设备 ID, 命令列表)
+        self.commands: List[Tuple[float, str, list]] = []
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> 'FakeTuyaCloud':
+        cloud = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, body: dict):
+                data = json.dumps({**body, 't': int(time.time() * 1000)}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.startswith('/v1.0/token'):
+                    self._reply({'success': True, 'result': {
+                        'access_token': 'fake-access', 'refresh_token': 'fake-refresh',
+                        'expire_time': 7200, 'uid': 'fake-uid',
+                    }})
+                else:
+                    self._reply({'success': False, 'code': 1108, 'msg': 'uri path invalid'})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                match = _COMMANDS_PATH.match(self.path.split('?')[0])
+                if not match:
+                    self._reply({'success': False, 'code': 1108, 'msg': 'uri path invalid'})
+                    return
+                device_id = match.group(1)
+                time.sleep(cloud.device_latency.get(device_id, cloud.latency))
+                if device_id not in cloud.device_ids:
+                    self._reply({'success': False, 'code': 2001, 'msg': 'device is offline'})
+                    return
+                with cloud._lock:
+                    cloud.commands.append((time.perf_counter(), device_id, json.loads(body or b'{}').get('commands', [])))
+                self._reply({'success': True, 'result': True})
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def last_values(self, code: str) -> Dict[str, object]:
+        """各设备最近一次收到的 code 命令的值"""
+        values = {}
+        with self._lock:
+            for _, device_id, commands in self.commands:
+                for command in commands:
+                    if command.get('code') == code:
+                        values[device_id] = command.get('value')
+        return values
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+async def _loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """测量事件循环的最大调度延迟"""
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    while not stop.is_set():
+        target = loop.time() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, loop.time() - target)
+    return worst
+
+
+async def run(args) -> dict:
+    device_ids = [f"fake-device-{i}" for i in range(args.devices)]
+    device_latency = {device_ids[-1]: args.slow_device / 1000} if args.slow_device is not None else {}
+    cloud = FakeTuyaCloud(device_ids, latency=args.latency_ms / 1000, device_latency=device_latency).start()
+    try:
+        conn = TuYaConnection(
+            access_id='fake', access_key='fake', device_ids=device_ids, api_endpoint=cloud.endpoint,
+            cmd_gap=args.cmd_gap, burst=args.burst, request_timeout=args.request_timeout,
+        )
+        conn.start()
+        stop = asyncio.Event()
+        lag = asyncio.ensure_future(_loop_lag(stop))
+
+        start = time.perf_counter()
+        levels = 0
+        while time.perf_counter() - start < args.seconds:
+            levels += 1
+            await conn.set_level(levels % 10 + 1)
+            await asyncio.sleep(1 / args.rate)
+        final = f"level_{levels % 10 + 1}"
+        # 等待最终档位送达所有设备
+        def delivered() -> bool:
+            values = cloud.last_values('level')
+            return len(values) == len(device_ids) and set(values.values()) == {final}
+
+        deadline = time.perf_counter() + args.request_timeout + args.cmd_gap * 2
+        while not delivered() and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        stop.set()
+        worst_lag = await lag
+        await conn.close()
+    finally:
+        cloud.stop()
+
+    per_device = {device_id: 0 for device_id in device_ids}
+    for _, device_id, _ in cloud.commands:
+        per_device[device_id] += 1
+    return {
+        'devices': len(device_ids),
+        'seconds': args.seconds,
+        'stats': conn.stats,
+        'requests': per_device,
+        'final_level_delivered': delivered(),
+        'max_loop_lag_ms': round(worst_lag * 1000, 2),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='涂鸦连接器测试 (本地 API 替身)')
+    parser.add_argument('--devices', type=int, default=2, help='设备数量')
+    parser.add_argument('--latency-ms', type=float, default=200, help='每个请求的响应延迟')
+    parser.add_argument('--slow-device', type=float, metavar='MS', help='最后一个设备的响应延迟')
+    parser.add_argument('--rate', type=float, default=30, help='档位变化的提交频率 (Hz)')
+    parser.add_argument('--seconds', type=float, default=3.0, help='提交时长 (秒)')
+    parser.add_argument('--cmd-gap', type=float, default=0.2, help='令牌桶速率 1 / cmd_gap')
+    parser.add_argument('--burst', type=int, default=1, help='令牌桶容量')
+    parser.add_argument('--request-timeout', type=float, default=5.0, help='单个设备请求的等待超时')
+    parser.add_argument('--max-lag-ms', type=float, help='事件循环最大延迟上限，超过时退出码为 1')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    parser.add_argument('--verbose', action='store_true', help='输出程序日志')
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level='DEBUG' if args.verbose else 'WARNING')
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print(f"{report['devices']} 台设备, {report['seconds']} s: {report['stats']}")
+        print(f"各设备请求数: {report['requests']}  最终档位已送达: {report['final_level_delivered']}")
+        print(f"事件循环最大延迟: {report['max_loop_lag_ms']} ms")
+    if args.max_lag_ms is not None and not report['max_loop_lag_ms'] <= args.max_lag_ms:
+        print(f"事件循环最大延迟 {report['max_loop_lag_ms']} ms 超过上限 {args.max_lag_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+OSC → ShockHandler → YCYBLEConnector 端到端基准测试
+
+在本机 UDP 端口上启动与正式程序相同的 CompiledDispatcher / ShockHandler / YCYBLEConnector，
+用 FakeYCYBLEClient 代替设备，回放合成或录制的 OSC 流量，输出：
+    - 吞吐量 (收到的 OSC 消息数 / 秒) 与 UDP 丢包数
+    - BLE 写入数与调度器合并情况
+    - OSC 到 BLE 写入延迟的 p50 / p99 / max
+
+延迟定义：每次 BLE 写入，取该通道上一次写入之后发出的第一条通道参数消息，
+计算其发送时间到本次写入完成的间隔，即一次输入变化最多等待多久到达设备。
+
+    python -m bench.osc_e2e --mode distance --speed 10 --duration 10
+    python -m bench.osc_e2e --replay session.oscrec --param A:/avatar/parameters/ShockA --speed 50 --json
+    python -m bench.osc_e2e --max-p99-ms 60    # 超过阈值时以退出码 1 结束，可用于回归检查
+"""
+import argparse
+import asyncio
+import bisect
+import copy
+import json
+import re
+import sys
+from typing import Dict, List
+
+from loguru import logger
+from pythonosc.osc_server import AsyncIOOSCUDPServer
+
+import srv
+from srv import config as srv_config
+from srv.connector import ycy_ble
+from srv.connector.registry import DeviceRegistry
+from srv.connector.ycy_ble import YCYBLEConnector
+from srv.handler.shock_handler import ShockHandler
+from srv.osc.router import CompiledDispatcher
+
+from .fake_ble import FakeYCYBLEClient
+from . import traffic
+
+CHANNEL_CONFIG = {
+    'mode_config': {
+        'shock': {
+            'duration': 2,
+        },
+        'distance': {
+            'freq_ms': 10,
+            'tick_hz': 25,
+        },
+        'trigger_range': {
+            'bottom': 0.0,
+            'top': 1.0,
+        },
+        'touch': {
+            'freq_ms': 10,
+            'tick_hz': 25,
+            'n_derivative': 1,
+            'derivative_params': [
+                {"top": 1, "bottom": 0},
+                {"top": 5, "bottom": 0},
+                {"top": 50, "bottom": 0},
+                {"top": 500, "bottom": 0},
+            ]
+        },
+    },
+    'strength_limit': 100,
+}
+
+
+class CountingDispatcher(CompiledDispatcher):
+    """统计收到的数据报数量"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.received = 0
+
+    def call_handlers_for_packet(self, data, client_address):
+        self.received += 1
+        return super().call_handlers_for_packet(data, client_address)
+
+
+def bench_settings(mode: str, params_per_channel: int, tick_hz: int, params: List[str] = None) -> dict:
+    """
+    :param params: 'A:/avatar/parameters/xxx' 形式的通道参数地址 (回放真实录制时使用)，
+                   不指定则每个通道生成 params_per_channel 个合成地址
+    """
+    settings = {'ble': {}, 'dglab3': {}}
+    explicit = {'A': [], 'B': []}
+    for item in params or []:
+        chann, _, address = item.partition(':')
+        explicit[chann.upper()].append(address)
+    for chann in ('A', 'B'):
+        config = copy.deepcopy(CHANNEL_CONFIG)
+        config['mode'] = mode
+        if params:
+            config['avatar_params'] = explicit[chann]
+        else:
+            config['avatar_params'] = [f"/avatar/parameters/Bench/Shock{chann}{i}" for i in range(params_per_channel)]
+        for mode_name in ('distance', 'touch'):
+            config['mode_config'][mode_name]['tick_hz'] = tick_hz
+        settings['dglab3'][f'channel_{chann.lower()}'] = config
+    return settings
+
+
+def channel_matcher(settings: dict):
+    """返回 address -> 通道 ('A'/'B'/None) 的函数，参数地址中的 * 与路由规则一致"""
+    patterns = []
+    for chann in ('A', 'B'):
+        for param in settings['dglab3'][f'channel_{chann.lower()}']['avatar_params']:
+            patterns.append((re.compile('.*?'.join(re.escape(part) for part in param.split('*'))), chann))
+    cache = {}
+
+    def channel_of(address: str):
+        if address not in cache:
+            cache[address] = next((chann for regex, chann in patterns if regex.fullmatch(address)), None)
+        return cache[address]
+    return channel_of
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def attribute_latency(sends: Dict[str, List[float]], writes: List[tuple]) -> Dict[str, List[float]]:
+    """
+    把每次写入对应到触发它的输入消息
+
+    :param sends: 通道 -> 该通道参数消息的发送时间 (升序)
+    :param writes: FakeYCYBLEClient.writes
+    :return: 通道 -> 延迟列表 (秒)
+    """
+    latencies: Dict[str, List[float]] = {ch: [] for ch in sends}
+    last_write = {ch: float('-inf') for ch in sends}
+    for written_at, channel, _ in writes:
+        channel_sends = sends.get(channel)
+        if not channel_sends:
+            continue
+        i = bisect.bisect_right(channel_sends, last_write[channel])
+        if i < len(channel_sends) and channel_sends[i] <= written_at:
+            latencies[channel].append(written_at - channel_sends[i])
+        last_write[channel] = written_at
+    return latencies
+
+
+async def build_pipeline(settings: dict, write_interval_ms: float, write_latency_ms: float):
+    """
+    按正式程序的方式组装 CompiledDispatcher / ShockHandler / YCYBLEConnector，设备替换为 FakeYCYBLEClient
+
+    :return: (connector, dispatcher)
+    """
+    srv.DEADLINES.attach()
+    # 连接器通过模块内的 YCYBLEClient 创建客户端，这里替换为进程内替身
+    real_client = ycy_ble.YCYBLEClient
+    ycy_ble.YCYBLEClient = lambda device, strength_limit=200: FakeYCYBLEClient(
+        device, strength_limit, write_latency=write_latency_ms / 1000.0)
+    try:
+        registry = DeviceRegistry()
+        connector = registry.add(YCYBLEConnector(
+            device_address='bench',
+            write_interval=write_interval_ms / 1000.0,
+            telemetry_interval=3600.0,
+        ))
+        await registry.connect()
+    finally:
+        ycy_ble.YCYBLEClient = real_client
+    srv.BLE_DEVICES = registry
+
+    srv_config.publish(settings)
+    dispatcher = CountingDispatcher()
+    handlers = []
+    for chann in ('A', 'B'):
+        handler = ShockHandler(SETTINGS=settings, channel_name=chann)
+        handlers.append(handler)
+        for param in settings['dglab3'][f'channel_{chann.lower()}']['avatar_params']:
+            dispatcher.map(param, handler.osc_handler)
+    for handler in handlers:
+        handler.start_background_jobs()
+    return connector, dispatcher
+
+
+async def run(args) -> dict:
+    settings = bench_settings(args.mode, args.params, args.tick_hz, args.param)
+    channel_of = channel_matcher(settings)
+
+    if args.replay:
+        messages = traffic.load(args.replay)
+    else:
+        messages = traffic.synthetic(
+            [param for chann in ('a', 'b') for param in settings['dglab3'][f'channel_{chann}']['avatar_params']],
+            duration=args.duration, rate=args.rate,
+            noise_addresses=args.noise, noise_rate=args.noise_rate, seed=args.seed,
+        )
+
+    connector, dispatcher = await build_pipeline(settings, args.write_interval_ms, args.write_latency_ms)
+    client: FakeYCYBLEClient = connector.client
+
+    loop = asyncio.get_running_loop()
+    server = AsyncIOOSCUDPServer(('127.0.0.1', 0), dispatcher, loop)
+    transport, _ = await server.create_serve_endpoint()
+    target = transport.get_extra_info('sockname')[:2]
+
+    replayer = traffic.Replayer(messages, target, speed=args.speed)
+    replayer.start()
+    while replayer.is_alive():
+        await asyncio.sleep(0.05)
+    # 等待最后的输入写入设备、超时清除完成
+    await asyncio.sleep(args.settle)
+    transport.close()
+    await connector.disconnect()
+
+    sends: Dict[str, List[float]] = {'A': [], 'B': []}
+    for (_, address, _), sent_at in zip(messages, replayer.sent_at):
+        chann = channel_of(address)
+        if chann:
+            sends[chann].append(sent_at)
+    latencies = attribute_latency(sends, client.writes)
+    all_latencies = [v for values in latencies.values() for v in values]
+
+    elapsed = replayer.finished_at - replayer.started_at
+    stages = {
+        name: {
+            'count': hist.count,
+            'p50_ms': round(hist.quantile(0.5) * 1000, 3),
+            'p99_ms': round(hist.quantile(0.99) * 1000, 3),
+        }
+        for name, hist in srv.METRICS.stages.items()
+    }
+    return {
+        'mode': args.mode,
+        'speed': args.speed,
+        'messages': len(messages),
+        'channel_messages': sum(len(v) for v in sends.values()),
+        'received': dispatcher.received,
+        'dropped': len(replayer.sent_at) - dispatcher.received,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_msg_s': round(dispatcher.received / elapsed, 1) if elapsed > 0 else 0,
+        'ble_writes': len(client.writes),
+        'ble_clears': len(client.clears),
+        'scheduler': connector.scheduler.totals(),
+        'router_cache': {'hits': dispatcher.cache_hits, 'misses': dispatcher.cache_misses},
+        'stages': stages,
+        'latency_samples': len(all_latencies),
+        'latency_ms': {
+            'p50': round(percentile(all_latencies, 50) * 1000, 2),
+            'p99': round(percentile(all_latencies, 99) * 1000, 2),
+            'max': round(max(all_latencies) * 1000, 2) if all_latencies else float('nan'),
+        },
+    }
+
+
+def print_report(report: dict):
+    latency = report['latency_ms']
+    print(f"模式: {report['mode']}  倍速: {report['speed']}x  用时: {report['elapsed_s']} s")
+    print(f"OSC 消息: 发送 {report['messages']} (通道参数 {report['channel_messages']})  "
+          f"收到 {report['received']}  丢失 {report['dropped']}")
+    print(f"吞吐量: {report['throughput_msg_s']} msg/s")
+    print(f"BLE 写入: {report['ble_writes']}  清除: {report['ble_clears']}  调度器: {report['scheduler']}")
+    print(f"路由缓存: {report['router_cache']}")
+    for name, stage in report['stages'].items():
+        print(f"  {name:<15} n={stage['count']:<7} p50 {stage['p50_ms']} ms  p99 {stage['p99_ms']} ms")
+    print(f"OSC→BLE 延迟 ({report['latency_samples']} 个样本): "
+          f"p50 {latency['p50']} ms  p99 {latency['p99']} ms  max {latency['max']} ms")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='OSC 到 BLE 写入的端到端基准测试 (无需设备)')
+    parser.add_argument('--mode', choices=('distance', 'touch', 'shock'), default='distance', help='通道工作模式')
+    parser.add_argument('--replay', help='回放录制文件 (.oscrec 或 JSON Lines)，不指定则使用合成流量')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放倍速 (1-50)')
+    parser.add_argument('--duration', type=float, default=10.0, help='合成流量时长 (秒)')
+    parser.add_argument('--rate', type=float, default=60.0, help='每个通道参数的发送频率 (Hz)')
+    parser.add_argument('--params', type=int, default=2, help='每个通道的合成参数地址数量')
+    parser.add_argument('--param', action='append', metavar='CH:ADDRESS', help='通道参数地址，如 A:/avatar/parameters/ShockA (可重复)')
+    parser.add_argument('--noise', type=int, default=200, help='无关 avatar 参数地址数量')
+    parser.add_argument('--noise-rate', type=float, default=5.0, help='每个无关地址的发送频率 (Hz)')
+    parser.add_argument('--seed', type=int, default=0, help='合成流量随机种子')
+    parser.add_argument('--tick-hz', type=int, default=25, help='distance / touch 模式的发送节拍')
+    parser.add_argument('--write-interval-ms', type=float, default=25, help='同一通道两次 BLE 写入的最小间隔')
+    parser.add_argument('--write-latency-ms', type=float, default=5, help='模拟单次 BLE 写入耗时')
+    parser.add_argument('--settle', type=float, default=1.0, help='回放结束后的等待时间 (秒)')
+    parser.add_argument('--max-p99-ms', type=float, help='p99 延迟上限，超过时退出码为 1')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    parser.add_argument('--verbose', action='store_true', help='输出程序日志')
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level='DEBUG' if args.verbose else 'WARNING')
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print_report(report)
+    if args.max_p99_ms is not None and not report['latency_ms']['p99'] <= args.max_p99_ms:
+        print(f"p99 延迟 {report['latency_ms']['p99']} ms 超过上限 {args.max_p99_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
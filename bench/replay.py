@@ -0,0 +1,99 @@
+"""
+录制会话的进程内回放
+
+不经过 UDP：用 mmap 读取 srv.osc.recorder 录制的文件，把原始数据报直接交给 dispatcher，
+驱动 ShockHandler 与 YCYBLEConnector (设备为 FakeYCYBLEClient)。
+--fast 模式下结果与机器速度无关，适合配合 --profile 做性能分析与回归对比。
+
+    python -m bench.replay session.oscrec --param A:/avatar/parameters/ShockA --mode touch
+    python -m bench.replay session.oscrec --param A:/avatar/parameters/ShockA --fast --profile
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import pstats
+import sys
+import time
+
+from loguru import logger
+
+import srv
+from srv.osc import recorder
+
+from .osc_e2e import bench_settings, build_pipeline
+
+
+async def run(args, profiler: cProfile.Profile = None) -> dict:
+    settings = bench_settings(args.mode, 0, args.tick_hz, args.param)
+    connector, dispatcher = await build_pipeline(settings, args.write_interval_ms, args.write_latency_ms)
+    client = connector.client
+
+    if profiler:
+        profiler.enable()
+    start = time.perf_counter()
+    count = await recorder.replay(args.file, dispatcher, speed=None if args.fast else args.speed)
+    elapsed = time.perf_counter() - start
+    if profiler:
+        profiler.disable()
+    await asyncio.sleep(args.settle)
+    await connector.disconnect()
+
+    return {
+        'file': args.file,
+        'mode': args.mode,
+        'datagrams': count,
+        'elapsed_s': round(elapsed, 3),
+        'datagrams_per_s': round(count / elapsed, 1) if elapsed > 0 else 0,
+        'ble_writes': len(client.writes),
+        'ble_clears': len(client.clears),
+        'scheduler': connector.scheduler.totals(),
+        'stages': {
+            name: {
+                'count': hist.count,
+                'p50_ms': round(hist.quantile(0.5) * 1000, 3),
+                'p99_ms': round(hist.quantile(0.99) * 1000, 3),
+            }
+            for name, hist in srv.METRICS.stages.items()
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='回放录制的 OSC 会话 (进程内，无需设备)')
+    parser.add_argument('file', help='srv.osc.recorder 录制的 .oscrec 文件')
+    parser.add_argument('--param', action='append', required=True, metavar='CH:ADDRESS',
+                        help='通道参数地址，如 A:/avatar/parameters/ShockA (可重复)')
+    parser.add_argument('--mode', choices=('distance', 'touch', 'shock'), default='distance', help='通道工作模式')
+    parser.add_argument('--speed', type=float, default=1.0, help='按录制节奏回放的倍速')
+    parser.add_argument('--fast', action='store_true', help='忽略录制节奏，尽可能快地回放')
+    parser.add_argument('--tick-hz', type=int, default=25, help='distance / touch 模式的发送节拍')
+    parser.add_argument('--write-interval-ms', type=float, default=25, help='同一通道两次 BLE 写入的最小间隔')
+    parser.add_argument('--write-latency-ms', type=float, default=5, help='模拟单次 BLE 写入耗时')
+    parser.add_argument('--settle', type=float, default=1.0, help='回放结束后的等待时间 (秒)')
+    parser.add_argument('--profile', action='store_true', help='使用 cProfile 分析并输出耗时最多的函数')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    parser.add_argument('--verbose', action='store_true', help='输出程序日志')
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level='DEBUG' if args.verbose else 'WARNING')
+
+    profiler = cProfile.Profile() if args.profile else None
+    report = asyncio.run(run(args, profiler))
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print(f"{report['file']}: {report['datagrams']} 个数据报, 用时 {report['elapsed_s']} s "
+              f"({report['datagrams_per_s']}/s)")
+        print(f"BLE 写入: {report['ble_writes']}  清除: {report['ble_clears']}  调度器: {report['scheduler']}")
+        for name, stage in report['stages'].items():
+            print(f"  {name:<15} n={stage['count']:<7} p50 {stage['p50_ms']} ms  p99 {stage['p99_ms']} ms")
+    if profiler:
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('tottime').print_stats(25)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+波形播放时间精度测试
+
+在与 bench.osc_e2e 相同的进程内管线 (FakeYCYBLEClient) 上用 srv.WAVE_SEQUENCERS 播放预设波形，
+同时按 --rate 在事件循环中分发合成 OSC 流量作为负载，统计每个 25ms 子步实际执行时间与计划时间之差。
+
+    python -m bench.sequencer_jitter --seconds 10
+    python -m bench.sequencer_jitter --wave 2 --rate 500 --max-p99-ms 3    # 超过阈值时以退出码 1 结束
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import List
+
+from loguru import logger
+
+import srv
+
+from .osc_e2e import bench_settings, build_pipeline, percentile
+from . import traffic
+
+
+class _JitterRecorder:
+    """代替 srv.METRICS 直方图，保留每个样本以计算精确的最大值"""
+
+    def __init__(self):
+        self.samples: List[float] = []
+
+    def observe(self, value: float):
+        self.samples.append(value)
+
+
+async def _load(dispatcher, messages, rate_scale: float):
+    """按消息时间在事件循环中分发 OSC 数据报"""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for t, _, packet in messages:
+        delay = start + t / rate_scale - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        dispatcher.call_handlers_for_packet(packet, ('bench', 0))
+
+
+async def run(args) -> dict:
+    settings = bench_settings('distance', 1, 25)
+    connector, dispatcher = await build_pipeline(settings, args.write_interval_ms, args.write_latency_ms)
+    params = [p for ch in ('channel_a', 'channel_b') for p in settings['dglab3'][ch]['avatar_params']]
+    messages = traffic.synthetic(params, duration=args.seconds, rate=args.rate, seed=0)
+    packets = [(t, address, traffic._build(address, values)) for t, address, values in messages]
+
+    wave = srv.WAVE_PRESETS[args.wave]
+    recorders = {}
+    for channel, sequencer in srv.WAVE_SEQUENCERS.items():
+        recorders[channel] = sequencer._jitter = _JitterRecorder()
+        if args.spin_ms is not None:
+            sequencer.spin = args.spin_ms / 1000
+        sequencer.play(wave, 100)
+    await _load(dispatcher, packets, 1.0)
+    await asyncio.sleep(max(0.0, args.seconds - (packets[-1][0] if packets else 0)))
+    for sequencer in srv.WAVE_SEQUENCERS.values():
+        sequencer.stop()
+    await connector.disconnect()
+
+    samples = [value for recorder in recorders.values() for value in recorder.samples]
+    return {
+        'wave': args.wave,
+        'seconds': args.seconds,
+        'osc_messages': len(packets),
+        'steps': len(samples),
+        'skipped': sum(sequencer.skipped for sequencer in srv.WAVE_SEQUENCERS.values()),
+        'spin_ms': round(srv.WAVE_SEQUENCERS['A'].spin * 1000, 3),
+        'ble_writes': len(connector.client.writes),
+        'jitter_ms': {
+            'p50': round(percentile(samples, 50) * 1000, 3),
+            'p99': round(percentile(samples, 99) * 1000, 3),
+            'max': round(max(samples, default=0.0) * 1000, 3),
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='波形播放子步时间精度测试 (无需设备)')
+    parser.add_argument('--wave', type=int, default=1, help='srv.waveData 中的预设波形序号')
+    parser.add_argument('--seconds', type=float, default=5.0, help='播放时长 (秒)')
+    parser.add_argument('--rate', type=float, default=60.0, help='负载：每个通道参数的 OSC 发送频率 (Hz)')
+    parser.add_argument('--spin-ms', type=float, help='子步末尾让出事件循环忙等的时长 (默认 0 不忙等)')
+    parser.add_argument('--write-interval-ms', type=float, default=25, help='同一通道两次 BLE 写入的最小间隔')
+    parser.add_argument('--write-latency-ms', type=float, default=5, help='模拟单次 BLE 写入耗时')
+    parser.add_argument('--max-p99-ms', type=float, help='p99 抖动上限，超过时退出码为 1')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    parser.add_argument('--verbose', action='store_true', help='输出程序日志')
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level='DEBUG' if args.verbose else 'WARNING')
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        jitter = report['jitter_ms']
+        print(f"波形 {report['wave']}: {report['steps']} 个子步, 跳过 {report['skipped']}, "
+              f"负载 {report['osc_messages']} 条 OSC 消息, BLE 写入 {report['ble_writes']}")
+        print(f"抖动: p50 {jitter['p50']} ms  p99 {jitter['p99']} ms  max {jitter['max']} ms  (spin {report['spin_ms']} ms)")
+    if args.max_p99_ms is not None and not report['jitter_ms']['p99'] <= args.max_p99_ms:
+        print(f"p99 抖动 {report['jitter_ms']['p99']} ms 超过上限 {args.max_p99_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+启动耗时测试
+
+在临时目录中生成配置文件并启动正式程序 (shocking_vrchat.py)，启动后持续向 OSC 端口发送数据报，
+从 /api/v1/metrics 读取 srv.STARTUP 记录的各阶段耗时 (相对程序开始加载)，
+重点是收到第一个 OSC 数据报的时间：BLE 扫描在后台进行，不应推迟 OSC 与 HTTP 的监听。
+
+    python -m bench.startup
+    python -m bench.startup --runs 5 --max-first-packet-ms 1500    # 超过阈值时退出码为 1
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List
+
+import yaml
+
+from .osc_e2e import percentile
+from . import traffic
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SCRIPT = os.path.join(_ROOT, 'shocking_vrchat.py')
+_CONFIG_FILENAME = 'settings-advanced-v0.2.yaml'
+
+
+def _free_port(kind: int) -> int:
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def prepare(workdir: str, scan_timeout: float) -> Dict[str, int]:
+    """生成配置文件并改为本机空闲端口，:return: {'osc': 端口, 'http': 端口}"""
+    subprocess.run([sys.executable, _SCRIPT], cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60)
+    path = os.path.join(workdir, _CONFIG_FILENAME)
+    with open(path, 'r', encoding='utf-8') as fr:
+        settings = yaml.safe_load(fr)
+    ports = {'osc': _free_port(socket.SOCK_DGRAM), 'http': _free_port(socket.SOCK_STREAM)}
+    settings['SERVER_IP'] = '127.0.0.1'
+    settings['osc']['listen_port'] = ports['osc']
+    settings['osc']['output_enabled'] = False
+    settings['web_server']['listen_port'] = ports['http']
+    settings['ble']['scan_timeout'] = scan_timeout
+    settings['general']['config_reload_interval'] = 0
+    with open(path, 'w', encoding='utf-8') as fw:
+        yaml.safe_dump(settings, fw, allow_unicode=True)
+    return ports
+
+
+def _milestones(http_port: int) -> Dict[str, float]:
+    url = f'http://127.0.0.1:{http_port}/api/v1/metrics?format=json'
+    with urllib.request.urlopen(url, timeout=1) as resp:
+        counters = json.load(resp)['counters']
+    return {item['labels']['phase']: item['value'] for item in counters.get('startup_seconds', [])}
+
+
+def run_once(workdir: str, ports: Dict[str, int], timeout: float) -> dict:
+    packet = traffic._build('/avatar/parameters/Bench/Startup', [0.0])
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    spawned = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, _SCRIPT], cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    milestones: Dict[str, float] = {}
+    try:
+        deadline = spawned + timeout
+        while time.perf_counter() < deadline and proc.poll() is None:
+            sock.sendto(packet, ('127.0.0.1', ports['osc']))
+            try:
+                milestones = _milestones(ports['http'])
+            except OSError:
+                pass
+            if 'first_osc_packet' in milestones:
+                break
+            time.sleep(0.005)
+        observed = time.perf_counter() - spawned
+    finally:
+        sock.close()
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return {'milestones': milestones, 'spawn_to_observed': observed}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='启动到收到第一个 OSC 数据报的耗时 (无需设备)')
+    parser.add_argument('--runs', type=int, default=3, help='启动次数')
+    parser.add_argument('--scan-timeout', type=float, default=10.0, help='BLE 扫描超时 (在后台进行)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='单次启动的等待上限 (秒)')
+    parser.add_argument('--max-first-packet-ms', type=float, help='收到第一个数据报的耗时上限 (取最大值)，超过时退出码为 1')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args(argv)
+
+    results: List[dict] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        ports = prepare(workdir, args.scan_timeout)
+        for _ in range(args.runs):
+            results.append(run_once(workdir, ports, args.timeout))
+
+    phases: Dict[str, List[float]] = {}
+    for result in results:
+        for name, value in result['milestones'].items():
+            phases.setdefault(name, []).append(value * 1000)
+    first_packet = phases.get('first_osc_packet', [])
+    report = {
+        'runs': args.runs,
+        'completed': len(first_packet),
+        'phases_ms': {
+            name: {'p50': round(percentile(values, 50), 1), 'max': round(max(values), 1)}
+            for name, values in phases.items()
+        },
+        'spawn_to_observed_ms': round(max(r['spawn_to_observed'] for r in results) * 1000, 1) if results else 0.0,
+    }
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print(f"{report['completed']}/{report['runs']} 次启动收到 OSC 数据报 (各阶段为距程序开始加载的耗时)")
+        for name, value in report['phases_ms'].items():
+            print(f"  {name:<18} p50 {value['p50']} ms  max {value['max']} ms")
+        print(f"  进程创建到测试端观察到首个数据报: 最长 {report['spawn_to_observed_ms']} ms")
+    if len(first_packet) < args.runs:
+        print("部分启动未收到 OSC 数据报", file=sys.stderr)
+        return 1
+    if args.max_first_packet_ms is not None and not max(first_packet) <= args.max_first_packet_ms:
+        print(f"收到首个 OSC 数据报耗时 {max(first_packet):.1f} ms 超过上限 {args.max_first_packet_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
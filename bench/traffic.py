@@ -0,0 +1,143 @@
+"""
+OSC 流量生成与回放
+
+流量是按时间排序的 (t, address, args) 列表，t 为相对开始的秒数。
+来源可以是合成流量，也可以是录制文件：srv.osc.recorder 录制的二进制会话，
+或 JSON Lines (每行 {"t": ..., "address": ..., "args": [...]})。
+回放在独立线程中按 speed 倍速发送 UDP 数据报，并记录每条消息的发送时间。
+"""
+import json
+import math
+import random
+import socket
+import threading
+import time
+from typing import Iterable, List, Sequence, Tuple
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.osc_packet import OscPacket, ParseError
+
+from srv.osc import recorder
+
+Message = Tuple[float, str, list]
+
+
+def synthetic(
+        channel_params: Sequence[str],
+        duration: float = 10.0,
+        rate: float = 60.0,
+        noise_addresses: int = 200,
+        noise_rate: float = 5.0,
+        seed: int = 0,
+    ) -> List[Message]:
+    """
+    生成合成流量
+
+    :param channel_params: 通道参数地址，每个地址以 rate Hz 发送平滑变化的 0-1 浮点数
+    :param duration: 时长 (秒)
+    :param rate: 通道参数的发送频率 (Hz)，VRChat 在参数变化时约按帧率发送
+    :param noise_addresses: 与本程序无关的 avatar 参数地址数量
+    :param noise_rate: 每个无关地址的发送频率 (Hz)
+    :param seed: 随机种子，保证多次运行的流量一致
+    """
+    rng = random.Random(seed)
+    messages: List[Message] = []
+    for index, address in enumerate(channel_params):
+        phase = rng.random() * math.tau
+        period = 1.5 + index * 0.37
+        step = 1 / rate
+        for i in range(int(duration * rate)):
+            t = i * step + rng.random() * step * 0.2
+            value = 0.5 + 0.5 * math.sin(phase + math.tau * t / period)
+            messages.append((t, address, [round(value, 4)]))
+    for index in range(noise_addresses):
+        address = f"/avatar/parameters/Bench/Noise{index}"
+        t = rng.random() / noise_rate
+        while t < duration:
+            messages.append((t, address, [rng.random()]))
+            t += rng.expovariate(noise_rate)
+    messages.sort(key=lambda m: m[0])
+    return messages
+
+
+def load_jsonl(path: str) -> List[Message]:
+    """读取 JSON Lines 格式的录制文件"""
+    messages: List[Message] = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            messages.append((float(record['t']), record['address'], list(record.get('args', []))))
+    messages.sort(key=lambda m: m[0])
+    if messages:
+        start = messages[0][0]
+        messages = [(t - start, address, args) for t, address, args in messages]
+    return messages
+
+
+def load_session(path: str) -> List[Message]:
+    """读取 srv.osc.recorder 录制的二进制会话，无法解析的数据报会被跳过"""
+    messages: List[Message] = []
+    for offset_ns, data in recorder.read_session(path):
+        try:
+            packet = OscPacket(data)
+        except ParseError:
+            continue
+        for timed in packet.messages:
+            messages.append((offset_ns / 1e9, timed.message.address, list(timed.message.params)))
+    return messages
+
+
+def load(path: str) -> List[Message]:
+    """按文件内容自动选择录制格式"""
+    if recorder.is_session_file(path):
+        return load_session(path)
+    return load_jsonl(path)
+
+
+def _build(address: str, args: Iterable) -> bytes:
+    builder = OscMessageBuilder(address=address)
+    for arg in args:
+        builder.add_arg(arg)
+    return builder.build().dgram
+
+
+class Replayer(threading.Thread):
+    """
+    在独立线程中按倍速回放流量
+
+    数据报在开始前预先编码，发送时间戳与 FakeYCYBLEClient 使用同一时钟 (time.perf_counter)。
+
+    :param messages: 流量
+    :param target: 目标 (host, port)
+    :param speed: 回放倍速
+    """
+
+    def __init__(self, messages: List[Message], target: Tuple[str, int], speed: float = 1.0):
+        super().__init__(daemon=True)
+        self.messages = messages
+        self.target = target
+        self.speed = speed
+        self._packets = [(t / speed, address, _build(address, args)) for t, address, args in messages]
+        # 与 messages 一一对应的发送时间 (perf_counter)
+        self.sent_at: List[float] = []
+        self.started_at = 0.0
+        self.finished_at = 0.0
+
+    def run(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sent_at = self.sent_at
+        clock = time.perf_counter
+        self.started_at = start = clock()
+        try:
+            for offset, _, packet in self._packets:
+                delay = start + offset - clock()
+                if delay > 0.001:
+                    time.sleep(delay)
+                sock.sendto(packet, self.target)
+                sent_at.append(clock())
+        finally:
+            self.finished_at = clock()
+            sock.close()
@@ -1,34 +1,53 @@
-from typing import List
+import time
+# 启动计时起点 (srv.STARTUP 中各阶段的耗时相对此时间)
+START_TIME = time.perf_counter()
+
+from typing import Dict, List, TYPE_CHECKING
 import asyncio
-import yaml, uuid, os, sys, traceback, time, socket, re, json
-from threading import Thread
+import yaml, uuid, os, sys, traceback, socket, re, json
+from threading import Thread, Lock
 from loguru import logger
 import traceback
 import copy
 
-from flask import Flask, render_template, redirect, request, jsonify
+from flask import Flask, Response, render_template, redirect, request, jsonify
 
 import srv
+import srv.config
+import srv.logs
+from srv.wave import WavePattern, intern as intern_wave
 from srv.connector.ycy_ble import YCYBLEConnector
+from srv.connector.registry import DeviceRegistry
 from srv.handler.shock_handler import ShockHandler
-from srv.handler.machine_handler import TuyaHandler, TuYaConnection
 
 from pythonosc.osc_server import AsyncIOOSCUDPServer
-from pythonosc.dispatcher import Dispatcher
-from pythonosc.udp_client import SimpleUDPClient
+from srv.osc.router import CompiledDispatcher
+from srv.http_server import LoopHTTPServer
+from srv.status import StatusHub
+
+# 可选功能 (涂鸦设备、OSC 输出、会话录制) 的模块在启用时才导入
+if TYPE_CHECKING:
+    from srv.osc.output import OSCOutput
 
-# 全局 BLE 连接器实例
-ble_connector: YCYBLEConnector = None
-# OSC 输出客户端 (用于向 VRChat 发送设备状态)
-osc_client: SimpleUDPClient = None
+srv.STARTUP.origin = START_TIME
+
+# 全局役次元设备注册表 (同 srv.BLE_DEVICES)
+ble_devices: DeviceRegistry = None
+# OSC 状态输出 (向 VRChat 发送设备状态)
+osc_output: "OSCOutput" = None
+# 设备状态推送 (SSE)
+status_hub: StatusHub = None
 
 # 通道时间管理器 (BLE 模式下模拟波形队列)
 class ChannelTimeManager:
     """管理每个通道的强度和清除时间 - 模拟波形队列"""
     def __init__(self):
-        self.clear_time = {'A': 0, 'B': 0}  # 清除时间
         self.current_strength = {'A': 0, 'B': 0}  # 当前强度
-        self._running = False
+        self._expired = set()  # 本轮到期、等待归零的通道
+
+    @staticmethod
+    def clear_key(channel: str):
+        return ('api', channel)
 
     async def set_strength_for_duration(self, channel: str, strength: int, duration_ms: int, reset: bool = False):
         """设置强度并在指定时间后自动清除
@@ -39,39 +58,78 @@ class ChannelTimeManager:
             duration_ms: 持续时间 (毫秒)
             reset: True=重置队列时间, False=叠加队列时间
         """
+        await self.set_strengths_for_duration({channel: strength}, duration_ms, reset)
+
+    async def set_strengths_for_duration(self, strengths: Dict[str, int], duration_ms: int, reset: bool = False):
+        """同 set_strength_for_duration，同时设置多个通道
+
+        两个通道一起设置时合并为一次 A+B 写入 (强度相同时为单个合并帧)。
+
+        Args:
+            strengths: 通道 -> 强度 (0-200)
+        """
+        strengths = {channel.upper(): strength for channel, strength in strengths.items()}
+
+        for channel, strength in strengths.items():
+            # 固定强度覆盖正在播放的波形
+            srv.WAVE_SEQUENCERS[channel].stop()
+            self._arm(channel, duration_ms, reset)
+            self.current_strength[channel] = strength
+
+        # 设置强度
+        if len(strengths) == 2:
+            await YCYBLEConnector.broadcast_strength_both(strengths['A'], strengths['B'])
+        else:
+            for channel, strength in strengths.items():
+                await YCYBLEConnector.broadcast_strength(channel, strength)
+
+    async def play_wave_for_duration(self, channel: str, wave: WavePattern, strength_limit: int, duration_ms: int, reset: bool = False):
+        """按帧循环播放波形并在指定时间后自动清除
+
+        同一波形正在播放时 (叠加调用) 只延长时间，不从头播放。
+
+        Args:
+            wave: 波形
+            strength_limit: 强度软上限 (0-200)
+        """
         channel = channel.upper()
-        now = time.time()
-        duration_sec = duration_ms / 1000.0
+        self._arm(channel, duration_ms, reset)
+        self.current_strength[channel] = max(wave.strengths) * strength_limit // 100
+        srv.WAVE_SEQUENCERS[channel].play(wave, strength_limit, restart=False)
 
+    def _arm(self, channel: str, duration_ms: int, reset: bool):
+        duration_sec = duration_ms / 1000.0
+        expire = lambda: self.expire(channel)
         if reset:
             # 重置模式：直接覆盖时间
-            self.clear_time[channel] = now + duration_sec
+            srv.DEADLINES.set(self.clear_key(channel), duration_sec, expire)
         else:
             # 叠加模式：如果当前还有剩余时间，在其基础上增加
-            if self.clear_time[channel] > now:
-                self.clear_time[channel] += duration_sec
-            else:
-                self.clear_time[channel] = now + duration_sec
-
-        self.current_strength[channel] = strength
-
-        # 设置强度
-        await YCYBLEConnector.broadcast_strength(channel, strength)
-
-    async def clear_check_loop(self):
-        """后台任务：检查并清除过期的强度"""
-        self._running = True
-        while self._running:
-            await asyncio.sleep(0.05)  # 50ms 检查间隔
-            now = time.time()
-            for channel in ['A', 'B']:
-                if self.current_strength[channel] > 0 and now > self.clear_time[channel]:
-                    await YCYBLEConnector.broadcast_strength(channel, 0)
-                    logger.info(f'[TimeManager] Channel {channel}: 队列结束，强度归零')
-                    self.current_strength[channel] = 0
+            srv.DEADLINES.extend(self.clear_key(channel), duration_sec, expire)
+
+    def expire(self, channel: str):
+        """队列到期回调：同一批到期的通道合并为一次归零写入"""
+        srv.WAVE_SEQUENCERS[channel].stop()
+        if not self._expired:
+            asyncio.get_running_loop().create_task(self.clear())
+        self._expired.add(channel)
+
+    async def clear(self):
+        """强度归零"""
+        channels = [channel for channel in sorted(self._expired) if self.current_strength[channel] > 0]
+        self._expired = set()
+        if len(channels) == 2:
+            await YCYBLEConnector.broadcast_strength_both(0, 0)
+        elif channels:
+            await YCYBLEConnector.broadcast_strength(channels[0], 0)
+        for channel in channels:
+            logger.info(f'[TimeManager] Channel {channel}: 队列结束，强度归零')
+            self.current_strength[channel] = 0
 
     def stop(self):
-        self._running = False
+        for channel in ['A', 'B']:
+            srv.DEADLINES.cancel(self.clear_key(channel))
+            srv.WAVE_SEQUENCERS[channel].stop()
 
 # 全局时间管理器
 channel_manager = ChannelTimeManager()
@@ -112,6 +170,18 @@ SETTINGS = {
         'device_address': None,  # 留空则自动扫描
         'scan_timeout': 10.0,
         'strength_limit': 200,
+        'write_interval_ms': 25,  # 同一通道两次 BLE 写入的最小间隔
+        'telemetry_interval': 30.0,  # 电量 / 电极状态后台刷新间隔
+        'telemetry_max_age': 120.0,  # 输出进行中推迟刷新的上限
+        'device_timeout': 5.0,  # 单台设备写入 / 操作的超时
+        'max_devices': 1,  # 自动扫描时最多连接的设备数
+        'devices': [],  # 多设备配置，见 README
+        'connect_timeout': 20.0,  # 单台设备连接 / 重连的超时
+        'reconnect': True,  # 断开后自动重连
+        'reconnect_min_delay': 0.5,  # 重连失败后的首次等待，之后每次加倍
+        'reconnect_max_delay': 30.0,  # 重连等待的上限
+        'remember_device': True,  # 记录自动扫描连接成功的地址，下次启动先直接连接
+        'remembered_connect_timeout': 3.0,  # 直接连接记录地址的超时，超时后改为扫描
     },
     'dglab3': {
         'channel_a': {
@@ -122,6 +192,9 @@ SETTINGS = {
                 },
                 'distance': {
                     'freq_ms': 10,
+                    'tick_hz': 25, # 输入变化时的最高发送频率，无输入时不发送
+                    'fusion': 'max', # 多个参数同时有输入时的合并方式: max / sum (按 weights 加权求和) / priority (avatar_params 中靠前的优先)
+                    'weights': {}, # sum 合并的权重 {参数地址: 权重}，地址可含 *，未列出的为 1.0
                 },
                 'trigger_range': {
                     'bottom': 0.0,
@@ -129,6 +202,7 @@ SETTINGS = {
                 },
                 'touch': {
                     'freq_ms': 10,
+                    'tick_hz': 25,
                     'n_derivative': 1, # 0 for distance, 1 for velocity, 2 for acceleration, 3 for jerk
                     'derivative_params': [
                         {
@@ -159,6 +233,9 @@ SETTINGS = {
                 },
                 'distance': {
                     'freq_ms': 10,
+                    'tick_hz': 25, # 输入变化时的最高发送频率，无输入时不发送
+                    'fusion': 'max', # 多个参数同时有输入时的合并方式: max / sum (按 weights 加权求和) / priority (avatar_params 中靠前的优先)
+                    'weights': {}, # sum 合并的权重 {参数地址: 权重}，地址可含 *，未列出的为 1.0
                 },
                 'trigger_range': {
                     'bottom': 0.0,
@@ -166,6 +243,7 @@ SETTINGS = {
                 },
                 'touch': {
                     'freq_ms': 10,
+                    'tick_hz': 25,
                     'n_derivative': 1,
                     'derivative_params': [
                         {
@@ -196,15 +274,25 @@ SETTINGS = {
         'output_port': 9000,
         'output_param_prefix': '/avatar/parameters/ShockingVRChat',
         'output_enabled': True,
+        'output_min_interval': 0.1,  # 两次状态输出的最小间隔 (秒)，期间的变化合并为一个 bundle
+        'output_keyframe_interval': 5.0,  # 重新发送全部状态参数的间隔 (秒)，0 为只在变化时发送
+        'record_file': None,  # 录制收到的 OSC 数据报，如 recordings/osc-%Y%m%d-%H%M%S.oscrec
     },
     'web_server':{
         'listen_host': '127.0.0.1',
-        'listen_port': 8800
+        'listen_port': 8800,
+        'mode': 'asyncio', # asyncio: 与 OSC/BLE 共用事件循环; flask: Flask 开发服务器 (独立线程)
     },
     'log_level': 'INFO',
+    'log': {
+        'levels': {},  # 各子系统的日志级别，覆盖 log_level，如 {'srv.connector': 'DEBUG', 'srv.handler': 'WARNING'}
+        'enqueue': True,  # 由后台线程写控制台，事件循环不等待控制台输出
+        'tick_interval': 1.0,  # 每个节拍都会产生的日志的最小输出间隔 (秒)，0 为不限流
+    },
     'version': CONFIG_FILE_VERSION,
     'general': {
         'auto_open_qr_web_page': False,  # BLE 模式不需要二维码
+        'config_reload_interval': 1.0,  # 检查配置文件修改的间隔 (秒)，0 为不热加载
         'local_ip_detect': {
             'host': '223.5.5.5',
             'port': 80,
@@ -212,6 +300,8 @@ SETTINGS = {
     }
 }
 SERVER_IP = None
+# 修改 SETTINGS 并发布通道配置快照时持有 (Flask 线程与配置热加载)
+CONFIG_LOCK = Lock()
 
 @app.route('/get_ip')
 def get_current_ip():
@@ -233,22 +323,22 @@ def web_status():
 @app.route('/conns')
 def get_conns():
     """获取连接状态"""
-    global ble_connector
-    if ble_connector and ble_connector.connected:
-        return f"BLE connected: {ble_connector.device_address}"
+    global ble_devices
+    if ble_devices and ble_devices.connected:
+        return "BLE connected: " + ', '.join(device.name for device in ble_devices.connected_devices())
     return "BLE not connected"
 
 @app.route('/sendwav')
 async def sendwav():
     """测试端点：发送当前选中的波形"""
-    strength_limit = SETTINGS['dglab3']['channel_a'].get('strength_limit', 200)
+    strength_limit = srv.CHANNEL_CONFIG['A'].strength_limit
     await YCYBLEConnector.broadcast_wave(channel='A', wavestr=srv.DEFAULT_WAVE, strength_limit=strength_limit)
     return 'OK'
 
 @app.after_request
-async def after_request_hook(response):
+def after_request_hook(response):
     if request.args.get('ret') == 'status' and response.status_code == 200:
-        response = jsonify(await api_v1_status())
+        response = jsonify(api_v1_status())
     return response
 
 class ClientNotAllowed(Exception):
@@ -282,15 +372,15 @@ def allow_vrchat_only(func):
     return wrapper
 
 @app.route('/api/v1/status')
-async def api_v1_status():
+def api_v1_status():
     """完全兼容原版 API 格式"""
-    global ble_connector
+    global ble_devices
     devices = []
 
-    if ble_connector and ble_connector.connected:
-        strength = ble_connector.strength_data
+    for device in (ble_devices.connected_devices() if ble_devices else []):
+        strength = device.strength_data
         # 基于 MAC 地址生成 UUID 格式
-        mac = ble_connector.device_address or '00:00:00:00:00:00'
+        mac = device.device_address or '00:00:00:00:00:00'
         mac_hex = mac.replace(':', '').lower()
         # 填充为 UUID 格式: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx
         device_uuid = f"{mac_hex[:8]}-{mac_hex[8:12] if len(mac_hex) > 8 else '0000'}-4000-8000-{mac_hex.zfill(12)}"
@@ -314,22 +404,18 @@ async def api_v1_status():
 
 
 @app.route('/api/v1/status/detail')
-async def api_v1_status_detail():
-    """详细状态 API (扩展)"""
-    global ble_connector
+def api_v1_status_detail():
+    """详细状态 API (扩展)，电量与电极状态来自连接器的遥测缓存"""
+    return status_detail()
+
+def status_detail():
+    """由本地状态与遥测缓存组装详细状态 (不访问设备)"""
+    global ble_devices
     devices = []
 
-    if ble_connector and ble_connector.connected:
-        strength = ble_connector.strength_data
-        battery = -1
-        electrode_a = 'unknown'
-        electrode_b = 'unknown'
-        try:
-            battery = await ble_connector.get_battery()
-            electrode_a = await ble_connector.get_electrode_status('A')
-            electrode_b = await ble_connector.get_electrode_status('B')
-        except Exception:
-            pass
+    for device in (ble_devices.connected_devices() if ble_devices else []):
+        strength = device.strength_data
+        telemetry = device.telemetry()
 
         devices.append({
             "type": 'shock',
@@ -337,19 +423,36 @@ async def api_v1_status_detail():
             'attr': {
                 'strength_a': strength.a if strength else 0,
                 'strength_b': strength.b if strength else 0,
-                'uuid': ble_connector.device_address or 'ble-device',
-                'battery': battery,
-                'electrode_a': electrode_a,
-                'electrode_b': electrode_b,
+                'uuid': device.name,
+                'channels': device.channel_map,
+                'battery': telemetry['battery'],
+                'electrode_a': telemetry['electrode_a'],
+                'electrode_b': telemetry['electrode_b'],
+                'telemetry_age': telemetry['age'],
+                'telemetry_stale': telemetry['stale'],
             }
         })
 
     return {
         'healthy': 'ok',
-        'connected': ble_connector.connected if ble_connector else False,
+        'connected': ble_devices.connected if ble_devices else False,
         'devices': devices
     }
 
+@app.route('/api/v1/status/stream')
+def api_v1_status_stream():
+    """详细状态的 SSE 推送 (格式同 /api/v1/status/detail)，所有观看者共用一个生产者"""
+    if status_hub is None or SETTINGS['web_server'].get('mode', 'asyncio') != 'asyncio':
+        return {'error': 'Status stream requires web_server.mode: asyncio'}, 501
+    return Response(status_hub.stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/api/v1/metrics')
+def api_v1_metrics():
+    """运行指标：默认 Prometheus 文本格式，?format=json 或 Accept: application/json 时返回 JSON"""
+    if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+        return srv.METRICS.to_dict()
+    return Response(srv.METRICS.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/v1/shock/<channel>/<second>', endpoint='api_v1_shock')
 @allow_vrchat_only
 async def api_v1_shock(channel, second):
@@ -366,11 +469,11 @@ async def api_v1_shock(channel, second):
     second = min(second, 10.0)
     duration_ms = int(second * 1000)
 
-    # 使用时间管理器设置强度 (reset=True: 重置队列而非叠加)
-    for chan in channels:
-        config_channel = f'channel_{chan.lower()}'
-        strength_limit = SETTINGS['dglab3'][config_channel].get('strength_limit', 200)
-        await channel_manager.set_strength_for_duration(chan, strength_limit, duration_ms, reset=True)
+    # 使用时间管理器设置强度 (reset=True: 重置队列而非叠加)，两个通道合并为一次写入
+    configs = srv.CHANNEL_CONFIG
+    strengths = {chan: configs[chan].strength_limit for chan in channels}
+    await channel_manager.set_strengths_for_duration(strengths, duration_ms, reset=True)
+    for chan, strength_limit in strengths.items():
         logger.success(f'[API][shock] Channel {chan}: 强度 {strength_limit}, 持续 {second}s (队列重置)')
 
     return {'result': 'OK'}
@@ -385,7 +488,7 @@ async def api_v1_sendwave(channel, repeat, wavedata):
     repeat -- repeat times, 1 for 100ms, 1 to 80. Max 80 for json length limit.
     wavedata -- Coyote v3 wave format, eg. 0A0A0A0A64646464.
 
-    BLE 模式: 解析波形强度，设置强度并持续 repeat*100ms
+    BLE 模式: 按 25ms 子步播放波形强度，持续 repeat*100ms
     """
     try:
         channel = channel.upper()
@@ -404,25 +507,20 @@ async def api_v1_sendwave(channel, repeat, wavedata):
     try:
         if not re.match(r'^([0-9A-F]{16})$', wavedata):
             raise Exception
+        # 强度字节超过 0x64 (100%) 时 ValueError
+        wave = intern_wave(f'["{wavedata}"]')
     except:
         logger.warning('[API][sendwave] Invalid wave, set to 0A0A0A0A64646464.')
-        wavedata = '0A0A0A0A64646464'
-
-    # 解析波形强度 (最后2个hex字符)
-    strength_percent = int(wavedata[-2:], 16)  # 0-100
+        wave = intern_wave('["0A0A0A0A64646464"]')
 
     # 获取通道的 strength_limit
-    config_channel = f'channel_{channel.lower()}'
-    strength_limit = SETTINGS['dglab3'][config_channel].get('strength_limit', 200)
-
-    # 计算实际强度
-    actual_strength = int(strength_percent * strength_limit / 100)
+    strength_limit = srv.CHANNEL_CONFIG[channel].strength_limit
     duration_ms = repeat * 100
 
-    logger.success(f'[API][sendwave] C:{channel} 强度:{strength_percent}% -> {actual_strength}/{strength_limit}, 持续:{duration_ms}ms')
+    logger.success(f'[API][sendwave] C:{channel} 强度:{list(wave.strengths)}% 上限:{strength_limit}, 持续:{duration_ms}ms')
 
     # 使用时间管理器 (支持队列叠加)
-    await channel_manager.set_strength_for_duration(channel, actual_strength, duration_ms)
+    await channel_manager.play_wave_for_duration(channel, wave, strength_limit, duration_ms)
 
     return {'result': 'OK'}
 
@@ -452,25 +550,30 @@ def update_config():
 
     # 更新 strength_limit
     if 'strength_limit' in data:
-        for channel, value in data['strength_limit'].items():
-            channel_key = f'channel_{channel.lower()}'
-            if channel_key in SETTINGS['dglab3']:
-                value = max(0, min(200, int(value)))
-                SETTINGS['dglab3'][channel_key]['strength_limit'] = value
-                SETTINGS_BASIC['dglab3'][channel_key]['strength_limit'] = value
-                updated.append(f'{channel}_strength_limit={value}')
+        with CONFIG_LOCK:
+            for channel, value in data['strength_limit'].items():
+                channel_key = f'channel_{channel.lower()}'
+                if channel_key in SETTINGS['dglab3']:
+                    value = max(0, min(200, int(value)))
+                    SETTINGS['dglab3'][channel_key]['strength_limit'] = value
+                    SETTINGS_BASIC['dglab3'][channel_key]['strength_limit'] = value
+                    updated.append(f'{channel}_strength_limit={value}')
+            srv.config.publish(SETTINGS)
 
     # 更新 wave_index
     if 'wave_index' in data:
         idx = int(data['wave_index'])
-        if 0 <= idx < len(srv.waveData):
-            srv.DEFAULT_WAVE = srv.waveData[idx]
+        if 0 <= idx < len(srv.WAVE_PRESETS):
+            srv.DEFAULT_WAVE = srv.WAVE_PRESETS[idx]
             updated.append(f'wave_index={idx}')
 
     # 更新自定义波形
     if 'custom_wave' in data:
-        srv.DEFAULT_WAVE = data['custom_wave']
-        updated.append('custom_wave=set')
+        try:
+            srv.DEFAULT_WAVE = intern_wave(data['custom_wave'])
+            updated.append('custom_wave=set')
+        except ValueError as e:
+            return {'success': False, 'message': str(e), 'updated': updated}, 400
 
     return {
         'success': True,
@@ -492,13 +595,15 @@ def update_strength_limit(channel, value):
     channels = ['A', 'B'] if channel == 'AB' else [channel]
     updated = []
 
-    for chan in channels:
-        channel_key = f'channel_{chan.lower()}'
-        if channel_key in SETTINGS['dglab3']:
-            SETTINGS['dglab3'][channel_key]['strength_limit'] = value
-            SETTINGS_BASIC['dglab3'][channel_key]['strength_limit'] = value
-            updated.append(chan)
-            logger.info(f'[Config] Channel {chan} strength_limit updated to {value}')
+    with CONFIG_LOCK:
+        for chan in channels:
+            channel_key = f'channel_{chan.lower()}'
+            if channel_key in SETTINGS['dglab3']:
+                SETTINGS['dglab3'][channel_key]['strength_limit'] = value
+                SETTINGS_BASIC['dglab3'][channel_key]['strength_limit'] = value
+                updated.append(chan)
+                logger.info(f'[Config] Channel {chan} strength_limit updated to {value}')
+        srv.config.publish(SETTINGS)
 
     if not updated:
         return {'success': False, 'message': f'Invalid channel: {channel}'}, 400
@@ -514,8 +619,9 @@ def get_wave_config():
     """获取波形配置"""
     return {
         'presets': srv.waveData,
-        'current': srv.DEFAULT_WAVE,
-        'current_index': srv.waveData.index(srv.DEFAULT_WAVE) if srv.DEFAULT_WAVE in srv.waveData else -1
+        'current': srv.DEFAULT_WAVE.source,
+        'current_index': srv.WAVE_PRESET_INDEX.get(srv.DEFAULT_WAVE, -1),
+        'duration': srv.DEFAULT_WAVE.duration,
     }
 
 @app.route('/api/v1/config/wave/<int:index>', methods=['PUT', 'POST'])
@@ -525,13 +631,13 @@ def set_wave_preset(index):
     Args:
         index: 波形预设索引 (0-2)
     """
-    if 0 <= index < len(srv.waveData):
-        srv.DEFAULT_WAVE = srv.waveData[index]
+    if 0 <= index < len(srv.WAVE_PRESETS):
+        srv.DEFAULT_WAVE = srv.WAVE_PRESETS[index]
         logger.info(f'[Config] Wave preset set to index {index}')
         return {
             'success': True,
             'index': index,
-            'wave': srv.DEFAULT_WAVE
+            'wave': srv.DEFAULT_WAVE.source
         }
     return {'success': False, 'message': f'Invalid index: {index}, max: {len(srv.waveData)-1}'}, 400
 
@@ -542,88 +648,142 @@ def set_custom_wave():
     if not data or 'wave' not in data:
         return {'success': False, 'message': 'Missing wave data'}, 400
 
-    srv.DEFAULT_WAVE = data['wave']
-    logger.info(f'[Config] Custom wave set: {data["wave"][:50]}...')
+    try:
+        srv.DEFAULT_WAVE = intern_wave(data['wave'])
+    except ValueError as e:
+        return {'success': False, 'message': str(e)}, 400
+    logger.info(f'[Config] Custom wave set: {srv.DEFAULT_WAVE!r}')
     return {
         'success': True,
-        'wave': srv.DEFAULT_WAVE
+        'wave': srv.DEFAULT_WAVE.source
     }
 
-async def send_osc_status():
-    """定期发送设备状态到 VRChat"""
-    global osc_client, ble_connector
-
-    osc_config = SETTINGS.get('osc', {})
-    if not osc_config.get('output_enabled', True):
-        return
-
-    prefix = osc_config.get('output_param_prefix', '/avatar/parameters/ShockingVRChat')
-    last_connected = None
-
-    while True:
-        await asyncio.sleep(0.5)  # 每 0.5 秒检查一次
-
-        if not osc_client:
-            continue
-
-        try:
-            connected = ble_connector.connected if ble_connector else False
-
-            # 只在状态变化时发送，或者每 5 秒发送一次
-            if connected != last_connected:
-                osc_client.send_message(f"{prefix}/Connected", connected)
-                logger.info(f"OSC 发送设备状态: Connected = {connected}")
-                last_connected = connected
-        except Exception as e:
-            logger.debug(f"OSC 发送状态失败: {e}")
+async def start_osc_output(osc_config: dict):
+    """启动 OSC 状态输出：强度写入、连接变化与遥测刷新时发送变化的参数，失败时返回 None"""
+    from srv.osc.output import OSCOutput, device_parameters
+    output = OSCOutput(
+        osc_config.get('output_host', '127.0.0.1'),
+        osc_config.get('output_port', 9000),
+        osc_config.get('output_param_prefix', '/avatar/parameters/ShockingVRChat'),
+        snapshot=lambda: device_parameters(ble_devices),
+        min_interval=osc_config.get('output_min_interval', 0.1),
+        keyframe_interval=osc_config.get('output_keyframe_interval', 5.0),
+    )
+    try:
+        await output.start()
+    except OSError as e:
+        logger.error(f"OSC 输出启动失败: {e!r}")
+        return None
+    for device in ble_devices.devices:
+        device.scheduler.listeners.append(output.notify)
+        device.listeners.append(output.notify)
+    srv.METRICS.add_collector(output.collect)
+    logger.success(f"OSC 输出已启用: {output.host}:{output.port}")
+    return output
+
+
+async def start_http_server():
+    """在本事件循环上提供 HTTP API，监听失败时返回 None"""
+    http_server = LoopHTTPServer(app, SETTINGS['web_server']['listen_host'], SETTINGS['web_server']['listen_port'])
+    try:
+        await http_server.start()
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        logger.error("HTTP 服务监听失败，可能存在端口冲突")
+        return None
+    srv.STARTUP.mark('http_listening')
+    logger.success(f"HTTP Listening: {SETTINGS['web_server']['listen_host']}:{SETTINGS['web_server']['listen_port']}")
+    return http_server
+
+async def start_osc_server():
+    """启动 OSC 服务器，监听失败时返回 None"""
+    try:
+        server = AsyncIOOSCUDPServer((SETTINGS["osc"]["listen_host"], SETTINGS["osc"]["listen_port"]), dispatcher, asyncio.get_running_loop())
+        transport, protocol = await server.create_serve_endpoint()
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        logger.error("OSC UDP Recevier listen failed.")
+        logger.error("OSC监听失败，可能存在端口冲突")
+        return None
+    srv.STARTUP.mark('osc_listening')
+    logger.success(f'OSC Listening: {SETTINGS["osc"]["listen_host"]}:{SETTINGS["osc"]["listen_port"]}')
+    return transport
 
+async def connect_ble_devices(ble_config: dict):
+    """后台扫描并连接 BLE 设备，OSC 与 HTTP 不等待扫描结束"""
+    scan_timeout = ble_config.get('scan_timeout', 10.0)
+    try:
+        connected = await ble_devices.connect(scan_timeout=scan_timeout)
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        connected = False
+    if connected:
+        srv.STARTUP.mark('ble_connected')
+    else:
+        logger.error("BLE 设备连接失败，请确保设备已开启并在范围内")
+        logger.error("程序将继续运行，已找到地址的设备会在后台自动重连")
 
 async def async_main():
-    global ble_connector, osc_client
+    global ble_devices, osc_output, status_hub
 
-    # 初始化 OSC 输出客户端
-    osc_config = SETTINGS.get('osc', {})
-    if osc_config.get('output_enabled', True):
-        osc_client = SimpleUDPClient(
-            osc_config.get('output_host', '127.0.0.1'),
-            osc_config.get('output_port', 9000)
-        )
-        logger.success(f"OSC 输出已启用: {osc_config.get('output_host')}:{osc_config.get('output_port')}")
-        # 启动状态发送任务
-        asyncio.create_task(send_osc_status())
+    # 截止时间调度器绑定到本事件循环 (API 时间管理器与各处理器共用)
+    srv.DEADLINES.attach()
+    # 波形播放器同样绑定到本事件循环，flask 模式下的 sendwave 请求转交到这里播放
+    for sequencer in srv.WAVE_SEQUENCERS.values():
+        sequencer.attach()
 
-    # 初始化 BLE 连接
+    # 初始化 BLE 设备注册表 (一台或多台)，连接在 OSC / HTTP 开始监听后于后台进行
     ble_config = SETTINGS.get('ble', {})
-    ble_connector = YCYBLEConnector(
-        device_address=ble_config.get('device_address'),
-        strength_limit=ble_config.get('strength_limit', 200)
-    )
-
-    # 连接 BLE 设备
-    scan_timeout = ble_config.get('scan_timeout', 10.0)
-    if not await ble_connector.connect(timeout=scan_timeout):
-        logger.error("BLE 设备连接失败，请确保设备已开启并在范围内")
-        logger.error("程序将继续运行，等待设备连接...")
-
-    # 启动后台任务
+    ble_devices = DeviceRegistry.from_config(ble_config)
+    srv.BLE_DEVICES = ble_devices
+    srv.METRICS.add_collector(ble_devices.collect)
+
+    # 状态推送：强度写入、连接变化与遥测刷新时推送
+    status_hub = StatusHub(snapshot=status_detail)
+    for device in ble_devices.devices:
+        device.scheduler.listeners.append(status_hub.notify)
+        device.listeners.append(status_hub.notify)
+    status_hub.start()
+
+    # 启动后台任务 (设备未连接时各处理器的输出只记录为目标状态，连接后恢复)
     for handler in handlers:
         handler.start_background_jobs()
 
-    # 启动 API 时间管理器
-    asyncio.create_task(channel_manager.clear_check_loop())
-    logger.success("API 时间管理器已启动")
-
-    # 启动 OSC 服务器
-    try:
-        server = AsyncIOOSCUDPServer((SETTINGS["osc"]["listen_host"], SETTINGS["osc"]["listen_port"]), dispatcher, asyncio.get_event_loop())
-        logger.success(f'OSC Listening: {SETTINGS["osc"]["listen_host"]}:{SETTINGS["osc"]["listen_port"]}')
-        transport, protocol = await server.create_serve_endpoint()
-    except Exception as e:
-        logger.error(traceback.format_exc())
-        logger.error("OSC UDP Recevier listen failed.")
-        logger.error("OSC监听失败，可能存在端口冲突")
+    # OSC 会话录制 (用于回放分析)
+    recorder = None
+    if SETTINGS['osc'].get('record_file'):
+        from srv.osc.recorder import SessionRecorder
+        recorder = SessionRecorder(SETTINGS['osc']['record_file'])
+        recorder.start()
+        dispatcher.recorder = recorder
+
+    # OSC 与 HTTP 同时开始监听
+    listeners = [start_osc_server()]
+    if SETTINGS['web_server'].get('mode', 'asyncio') == 'asyncio':
+        listeners.append(start_http_server())
+    transport, *http_servers = await asyncio.gather(*listeners)
+    http_server = http_servers[0] if http_servers else None
+    if transport is None:
+        if recorder:
+            dispatcher.recorder = None
+            await recorder.close()
+        if http_server:
+            await http_server.close()
         return
 
+    # 在后台连接 BLE 设备
+    ble_task = asyncio.create_task(connect_ble_devices(ble_config))
+
+    # OSC 状态输出
+    osc_config = SETTINGS.get('osc', {})
+    if osc_config.get('output_enabled', True):
+        osc_output = await start_osc_output(osc_config)
+
+    # 配置文件热加载
+    reload_interval = SETTINGS['general'].get('config_reload_interval', 1.0)
+    if reload_interval and reload_interval > 0:
+        asyncio.create_task(watch_config_files(reload_interval))
+
     # 保持运行
     try:
         await asyncio.Future()  # run forever
@@ -631,8 +791,16 @@ async def async_main():
         pass
     finally:
         transport.close()
-        if ble_connector:
-            await ble_connector.disconnect()
+        ble_task.cancel()
+        if osc_output:
+            osc_output.close()
+        if recorder:
+            dispatcher.recorder = None
+            await recorder.close()
+        if http_server:
+            await http_server.close()
+        if ble_devices:
+            await ble_devices.disconnect()
 
 def async_main_wrapper():
     """Not async Wrapper around async_main to run it as target function of Thread"""
@@ -647,6 +815,86 @@ def config_save():
 class ConfigFileInited(Exception):
     pass
 
+def config_load():
+    """读取两个配置文件并合并基础配置，:return: (SETTINGS, SETTINGS_BASIC)"""
+    with open(CONFIG_FILENAME, 'r', encoding='utf-8') as fr:
+        settings = yaml.safe_load(fr)
+    with open(CONFIG_FILENAME_BASIC, 'r', encoding='utf-8') as fr:
+        settings_basic = yaml.safe_load(fr)
+
+    if not isinstance(settings, dict) or not isinstance(settings_basic, dict) \
+            or settings.get('version', None) != CONFIG_FILE_VERSION or settings_basic.get('version', None) != CONFIG_FILE_VERSION:
+        logger.error(f"Configuration file version mismatch! Please delete the {CONFIG_FILENAME_BASIC} and {CONFIG_FILENAME} files and run the program again to generate the latest version of the configuration files.")
+        raise Exception(f'配置文件版本不匹配！请删除 {CONFIG_FILENAME_BASIC} {CONFIG_FILENAME} 文件后再次运行程序，以生成最新版本的配置文件。')
+
+    for chann in ['channel_a', 'channel_b']:
+        settings['dglab3'][chann]['avatar_params'] = settings_basic['dglab3'][chann].get('avatar_params', [])
+        settings['dglab3'][chann]['mode'] = settings_basic['dglab3'][chann].get('mode', 'distance')
+        # 确保 strength_limit 有默认值
+        raw_limit = settings_basic['dglab3'][chann].get('strength_limit')
+        settings['dglab3'][chann]['strength_limit'] = raw_limit if raw_limit is not None else 200
+        logger.info(f"[Config] {chann}: strength_limit from file = {raw_limit}, using = {settings['dglab3'][chann]['strength_limit']}")
+    return settings, settings_basic
+
+def config_reload():
+    """
+    重新读取配置文件，校验通过后替换 SETTINGS 并发布新的通道快照
+
+    avatar_params 与 mode 决定 OSC 地址映射和处理器，修改后保留运行中的值 (SETTINGS 与 SETTINGS_BASIC，
+    /api/v1/config 返回的始终是生效中的配置)，重启后生效。
+    """
+    global SETTINGS, SETTINGS_BASIC
+    settings, settings_basic = config_load()
+    # 先构建以校验，失败时不修改任何状态
+    configs = srv.config.build(settings)
+    with CONFIG_LOCK:
+        pending = srv.config.restart_required(srv.CHANNEL_CONFIG, configs)
+        for item in pending:
+            chann, _, key = item.partition('.')
+            channel_key = f'channel_{chann.lower()}'
+            settings['dglab3'][channel_key][key] = SETTINGS['dglab3'][channel_key][key]
+            settings_basic['dglab3'][channel_key][key] = settings['dglab3'][channel_key][key]
+        if (settings.get('log_level'), settings.get('log')) != (SETTINGS.get('log_level'), SETTINGS.get('log')):
+            srv.logs.setup(settings)
+        SETTINGS, SETTINGS_BASIC = settings, settings_basic
+        srv.config.publish(SETTINGS)
+    if pending:
+        logger.warning(f"[Config] {', '.join(pending)} 已修改，重启程序后生效")
+    logger.success('[Config] 配置文件已重新加载')
+
+def _config_files_signature():
+    signature = []
+    for filename in (CONFIG_FILENAME, CONFIG_FILENAME_BASIC):
+        try:
+            stat = os.stat(filename)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+async def watch_config_files(interval: float):
+    """
+    轮询配置文件的修改时间与大小，变化后重新加载
+
+    文件在一个轮询间隔内不再变化才读取，避免读到编辑器写了一半的文件；
+    读取或校验失败时继续使用当前配置，文件再次修改后重试。
+    """
+    loop = asyncio.get_running_loop()
+    applied = seen = _config_files_signature()
+    while True:
+        await asyncio.sleep(interval)
+        current = _config_files_signature()
+        if current != seen:
+            seen = current
+            continue
+        if current == applied or None in current:
+            continue
+        applied = current
+        try:
+            await loop.run_in_executor(None, config_reload)
+        except Exception as e:
+            logger.error(f"[Config] 配置文件重新加载失败，继续使用当前配置: {e}")
+
 def config_init():
     logger.info(f'Init settings..., Config filename: {CONFIG_FILENAME_BASIC} {CONFIG_FILENAME}, Config version: {CONFIG_FILE_VERSION}.')
     global SETTINGS, SETTINGS_BASIC, SERVER_IP
@@ -654,52 +902,44 @@ def config_init():
         config_save()
         raise ConfigFileInited()
 
-    with open(CONFIG_FILENAME, 'r', encoding='utf-8') as fr:
-        SETTINGS = yaml.safe_load(fr)
-    with open(CONFIG_FILENAME_BASIC, 'r', encoding='utf-8') as fr:
-        SETTINGS_BASIC = yaml.safe_load(fr)
-
-    if SETTINGS.get('version', None) != CONFIG_FILE_VERSION or SETTINGS_BASIC.get('version', None) != CONFIG_FILE_VERSION:
-        logger.error(f"Configuration file version mismatch! Please delete the {CONFIG_FILENAME_BASIC} and {CONFIG_FILENAME} files and run the program again to generate the latest version of the configuration files.")
-        raise Exception(f'配置文件版本不匹配！请删除 {CONFIG_FILENAME_BASIC} {CONFIG_FILENAME} 文件后再次运行程序，以生成最新版本的配置文件。')
+    SETTINGS, SETTINGS_BASIC = config_load()
+    srv.config.publish(SETTINGS)
 
     SERVER_IP = SETTINGS.get('SERVER_IP') or get_current_ip()
 
-    for chann in ['channel_a', 'channel_b']:
-        SETTINGS['dglab3'][chann]['avatar_params'] = SETTINGS_BASIC['dglab3'][chann].get('avatar_params', [])
-        SETTINGS['dglab3'][chann]['mode'] = SETTINGS_BASIC['dglab3'][chann].get('mode', 'distance')
-        # 确保 strength_limit 有默认值
-        raw_limit = SETTINGS_BASIC['dglab3'][chann].get('strength_limit')
-        SETTINGS['dglab3'][chann]['strength_limit'] = raw_limit if raw_limit is not None else 200
-        logger.info(f"[Config] {chann}: strength_limit from file = {raw_limit}, using = {SETTINGS['dglab3'][chann]['strength_limit']}")
-
-    logger.remove()
-    logger.add(sys.stderr, level=SETTINGS['log_level'])
+    srv.logs.setup(SETTINGS)
     logger.success("Configuration initialized. BLE mode enabled - will scan for YCY device.")
     logger.success("配置文件初始化完成，BLE 模式已启用 - 将扫描役次元设备。")
 
 def main():
     global dispatcher, handlers
-    dispatcher = Dispatcher()
+    dispatcher = CompiledDispatcher()
+    srv.METRICS.add_collector(dispatcher.collect)
     handlers = []
 
     for chann in ['A', 'B']:
-        config_chann_name = f'channel_{chann.lower()}'
-        chann_mode = SETTINGS['dglab3'][config_chann_name]['mode']
-        chann_strength_limit = SETTINGS['dglab3'][config_chann_name].get('strength_limit', 200)
+        chann_config = srv.CHANNEL_CONFIG[chann]
         shock_handler = ShockHandler(SETTINGS=SETTINGS, channel_name=chann)
         handlers.append(shock_handler)
-        logger.success(f"Channel {chann} Mode: {chann_mode}, Strength Limit: {chann_strength_limit}")
-        for param in SETTINGS['dglab3'][config_chann_name]['avatar_params']:
+        logger.success(f"Channel {chann} Mode: {chann_config.mode}, Strength Limit: {chann_config.strength_limit}")
+        for param in chann_config.avatar_params:
             logger.success(f"  Listening: {param}")
             dispatcher.map(param, shock_handler.osc_handler)
     
     if 'machine' in SETTINGS and 'tuya' in SETTINGS['machine']:
+        from srv.handler.machine_handler import TuyaHandler, TuYaConnection
+        tuya_config = SETTINGS['machine']['tuya']
         TuyaConn = TuYaConnection(
-            access_id=SETTINGS['machine']['tuya']['access_id'],
-            access_key=SETTINGS['machine']['tuya']['access_key'],
-            device_ids=SETTINGS['machine']['tuya']['device_ids'],
+            access_id=tuya_config['access_id'],
+            access_key=tuya_config['access_key'],
+            device_ids=tuya_config['device_ids'],
+            api_endpoint=tuya_config.get('api_endpoint', "https://openapi.tuyacn.com"),
+            cmd_gap=tuya_config.get('cmd_gap', 0.2),
+            burst=tuya_config.get('burst', 1),
+            max_workers=tuya_config.get('max_workers', 8),
+            request_timeout=tuya_config.get('request_timeout', 5.0),
         )
+        srv.METRICS.add_collector(TuyaConn.collect)
         machine_tuya_handler = TuyaHandler(SETTINGS=SETTINGS, DEV_CONN=TuyaConn)
         handlers.append(machine_tuya_handler)
         for param in SETTINGS['machine']['tuya']['avatar_params']:
@@ -707,8 +947,10 @@ def main():
             dispatcher.map(param, machine_tuya_handler.osc_handler)
 
 
-    th = Thread(target=async_main_wrapper, daemon=True)
-    th.start()
+    web_mode = SETTINGS['web_server'].get('mode', 'asyncio')
+    if web_mode != 'asyncio':
+        th = Thread(target=async_main_wrapper, daemon=True)
+        th.start()
 
     if SETTINGS['general']['auto_open_qr_web_page']:
         import webbrowser
@@ -718,7 +960,14 @@ def main():
         if info_ip == '0.0.0.0':
             info_ip = get_current_ip()
         logger.success(f"请打开浏览器访问 http://{info_ip}:{SETTINGS['web_server']['listen_port']}")
-    app.run(SETTINGS['web_server']['listen_host'], SETTINGS['web_server']['listen_port'], debug=False)
+    if web_mode == 'asyncio':
+        # HTTP、OSC 与 BLE 共用主线程上的同一个事件循环
+        try:
+            async_main_wrapper()
+        except KeyboardInterrupt:
+            pass
+    else:
+        app.run(SETTINGS['web_server']['listen_host'], SETTINGS['web_server']['listen_port'], debug=False)
 
 if __name__ == "__main__":
     try:
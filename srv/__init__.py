@@ -1,17 +1,43 @@
-from typing import Optional, TYPE_CHECKING
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from srv.deadline import DeadlineScheduler
+from srv.metrics import Metrics, Milestones
+from srv.wave import WavePattern, intern as intern_wave
+from srv.sequencer import WaveSequencer
 
 if TYPE_CHECKING:
-    from pydglab_ws import YCYBLEClient
+    from srv.config import ChannelConfig
+    from srv.connector.registry import DeviceRegistry
 
 # WebSocket 连接集合 (保留兼容)
 WS_CONNECTIONS = set()
 
-# 全局 BLE 客户端
-BLE_CLIENT: Optional["YCYBLEClient"] = None
+# 全局役次元设备注册表 (所有强度写入经由各设备的调度器合并发送)
+BLE_DEVICES: Optional["DeviceRegistry"] = None
+
+# 各通道的配置快照 (不可变，由 srv.config.publish 整体替换)
+CHANNEL_CONFIG: Dict[str, "ChannelConfig"] = {}
+
+# 全局截止时间调度器 (各通道的超时清除共用)
+DEADLINES = DeadlineScheduler()
+
+# 全局运行指标 (各阶段延迟直方图，/api/v1/metrics 导出)
+METRICS = Metrics()
+
+# 启动阶段耗时 (origin 由入口脚本设为开始加载的时间)
+STARTUP = Milestones()
+METRICS.add_collector(STARTUP.collect)
 
 waveData = [
     '["0A0A0A0A00000000","0A0A0A0A0A0A0A0A","0A0A0A0A14141414","0A0A0A0A1E1E1E1E","0A0A0A0A28282828","0A0A0A0A32323232","0A0A0A0A3C3C3C3C","0A0A0A0A46464646","0A0A0A0A50505050","0A0A0A0A5A5A5A5A","0A0A0A0A64646464"]',
     '["0A0A0A0A00000000","0D0D0D0D0F0F0F0F","101010101E1E1E1E","1313131332323232","1616161641414141","1A1A1A1A50505050","1D1D1D1D64646464","202020205A5A5A5A","2323232350505050","262626264B4B4B4B","2A2A2A2A41414141"]',
     '["4A4A4A4A64646464","4545454564646464","4040404064646464","3B3B3B3B64646464","3636363664646464","3232323264646464","2D2D2D2D64646464","2828282864646464","2323232364646464","1E1E1E1E64646464","1A1A1A1A64646464"]'
 ]
-DEFAULT_WAVE = waveData[0]
\ No newline at end of file
+# 预设波形 (预解码，与 waveData 一一对应)
+WAVE_PRESETS: List[WavePattern] = [intern_wave(source) for source in waveData]
+WAVE_PRESET_INDEX: Dict[WavePattern, int] = {wave: index for index, wave in enumerate(WAVE_PRESETS)}
+# 当前波形 (str() 为源字符串)
+DEFAULT_WAVE: WavePattern = WAVE_PRESETS[0]
+
+# 各通道的波形播放器 (shock 模式与 /api/v1/sendwave 共用)
+WAVE_SEQUENCERS: Dict[str, WaveSequencer] = {channel: WaveSequencer(channel) for channel in ('A', 'B')}
@@ -0,0 +1,137 @@
+"""
+通道配置快照
+
+SETTINGS 是从 YAML 读取的嵌套 dict，Flask 线程与热加载都会修改它。
+处理器的热路径不再逐级查找 SETTINGS，而是读取 srv.CHANNEL_CONFIG 中的 ChannelConfig：
+创建后不可修改，系数 (触发区间、导数区间的缩放) 预先计算好。
+配置变化时构建一组新的快照，整体替换 srv.CHANNEL_CONFIG (单次引用赋值，读取方不会看到一半新一半旧的配置)。
+"""
+from typing import Dict, Tuple
+
+import srv
+
+CHANNELS = ('A', 'B')
+
+# 修改后需要重启才能生效的通道配置 (决定 OSC 地址映射与处理器类型)
+RESTART_KEYS = ('avatar_params', 'mode')
+
+
+class ChannelConfig:
+    """
+    单个通道的配置快照 (不可变)
+
+    :ivar strength_limit: 强度软上限 (0-200)
+    :ivar trigger_scale: 1 / (trigger_top - trigger_bottom)
+    :ivar tick_interval: 当前模式下两次波形发送的最小间隔 (秒)
+    :ivar freq_ms: 当前模式下生成波形使用的频率
+    :ivar deriv_bottom / deriv_scale: touch 模式所选导数的下限与 1 / (top - bottom)
+    :ivar fusion: distance 模式下多个参数的合并方式 (见 srv.handler.fusion)
+    :ivar fusion_weights: sum 合并的权重 ((地址, 权重), ...)，地址可含 *
+    """
+    __slots__ = (
+        'channel', 'mode', 'avatar_params', 'strength_limit',
+        'trigger_bottom', 'trigger_top', 'trigger_scale',
+        'tick_interval', 'freq_ms', 'shock_duration',
+        'n_derivative', 'deriv_bottom', 'deriv_top', 'deriv_scale',
+        'fusion', 'fusion_weights',
+    )
+
+    def __init__(self, channel: str, settings: dict):
+        """
+        :param channel: 逻辑通道 'A' 或 'B'
+        :param settings: SETTINGS['dglab3']['channel_x'] (已合并基础配置)
+        :raises ValueError: 配置无效
+        """
+        mode_config = settings['mode_config']
+        mode = settings.get('mode', 'distance')
+        if mode not in ('distance', 'shock', 'touch'):
+            raise ValueError(f"Channel {channel}: 不支持的模式 {mode!r}")
+
+        trigger_bottom = float(mode_config['trigger_range']['bottom'])
+        trigger_top = float(mode_config['trigger_range']['top'])
+        if trigger_top <= trigger_bottom:
+            raise ValueError(f"Channel {channel}: trigger_range 的 top 必须大于 bottom")
+
+        mode_params = mode_config.get(mode) or {}
+        tick_hz = float(mode_params.get('tick_hz', 25))
+        if tick_hz <= 0:
+            raise ValueError(f"Channel {channel}: {mode}.tick_hz 必须大于 0")
+
+        touch = mode_config['touch']
+        n_derivative = int(touch['n_derivative'])
+        if not 0 <= n_derivative < len(touch['derivative_params']):
+            raise ValueError(f"Channel {channel}: touch.n_derivative 超出 derivative_params 范围")
+        deriv_bottom = float(touch['derivative_params'][n_derivative]['bottom'])
+        deriv_top = float(touch['derivative_params'][n_derivative]['top'])
+        if deriv_top <= deriv_bottom:
+            raise ValueError(f"Channel {channel}: derivative_params[{n_derivative}] 的 top 必须大于 bottom")
+
+        distance = mode_config.get('distance') or {}
+        fusion = distance.get('fusion', 'max')
+        if fusion not in ('max', 'sum', 'priority'):
+            raise ValueError(f"Channel {channel}: 不支持的 distance.fusion {fusion!r}")
+        fusion_weights = tuple((str(address), float(weight)) for address, weight in (distance.get('weights') or {}).items())
+        if any(weight < 0 for _, weight in fusion_weights):
+            raise ValueError(f"Channel {channel}: distance.weights 不能为负数")
+
+        strength_limit = settings.get('strength_limit')
+        strength_limit = 200 if strength_limit is None else max(0, min(200, int(strength_limit)))
+
+        setattr_ = object.__setattr__
+        setattr_(self, 'channel', channel)
+        setattr_(self, 'mode', mode)
+        setattr_(self, 'avatar_params', tuple(settings.get('avatar_params') or ()))
+        setattr_(self, 'strength_limit', strength_limit)
+        setattr_(self, 'trigger_bottom', trigger_bottom)
+        setattr_(self, 'trigger_top', trigger_top)
+        setattr_(self, 'trigger_scale', 1 / (trigger_top - trigger_bottom))
+        setattr_(self, 'tick_interval', 1 / tick_hz)
+        setattr_(self, 'freq_ms', int(mode_params.get('freq_ms', 10)))
+        setattr_(self, 'shock_duration', float(mode_config['shock']['duration']))
+        setattr_(self, 'n_derivative', n_derivative)
+        setattr_(self, 'deriv_bottom', deriv_bottom)
+        setattr_(self, 'deriv_top', deriv_top)
+        setattr_(self, 'deriv_scale', 1 / (deriv_top - deriv_bottom))
+        setattr_(self, 'fusion', fusion)
+        setattr_(self, 'fusion_weights', fusion_weights)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} 不可修改")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} 不可修改")
+
+    def __repr__(self) -> str:
+        return f"ChannelConfig({self.channel}, mode={self.mode}, strength_limit={self.strength_limit})"
+
+
+def build(settings: dict) -> Dict[str, ChannelConfig]:
+    """
+    从 SETTINGS 构建全部通道的快照
+
+    :raises ValueError: 任一通道配置无效 (此时不应发布)
+    """
+    try:
+        return {
+            channel: ChannelConfig(channel, settings['dglab3'][f'channel_{channel.lower()}'])
+            for channel in CHANNELS
+        }
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"配置缺少或包含无效字段: {e!r}") from None
+
+
+def publish(settings: dict) -> Dict[str, ChannelConfig]:
+    """构建快照并整体替换 srv.CHANNEL_CONFIG，返回新的快照"""
+    configs = build(settings)
+    srv.CHANNEL_CONFIG = configs
+    return configs
+
+
+def restart_required(old: Dict[str, ChannelConfig], new: Dict[str, ChannelConfig]) -> Tuple[str, ...]:
+    """:return: 新旧快照之间需要重启才能生效的变化，如 ('A.mode',)"""
+    return tuple(
+        f'{channel}.{key}'
+        for channel in CHANNELS if channel in old and channel in new
+        for key in RESTART_KEYS
+        if getattr(old[channel], key) != getattr(new[channel], key)
+    )
@@ -0,0 +1,413 @@
+"""
+BLE 输出调度器
+
+位于处理器与 YCYBLEClient 之间，每个通道只保留最新的目标状态：
+被新值覆盖的写入和与设备当前强度相同的写入都会被丢弃，
+剩余写入按 BLE 链路可承受的最小间隔依次发送。
+两个通道同时设为相同强度时 (submit_both)，合并为一个 A+B 通道控制帧发送。
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from pydglab_ws import YCYBLEClient, Channel, StrengthOperationType
+from pydglab_ws.ble import YCYBLEProtocol, YCYChannel, map_strength_to_ycy
+
+import srv
+
+STAT_KEYS = (
+    'submitted',     # 收到的写入请求
+    'superseded',    # 发送前被新值覆盖
+    'deduplicated',  # 与设备当前强度相同而跳过
+    'written',       # 成功写入
+    'failed',        # 写入失败
+    'dropped',       # 未连接时丢弃的待发送状态
+    'combined',      # 通过 A+B 合并帧写入 (同时计入 written)
+)
+
+
+class _ChannelSlot:
+    """单个通道的待发送状态"""
+    __slots__ = ('strength', 'clear', 'written', 'last_write', 'submitted_at', 'stats', 'event', 'task')
+
+    def __init__(self):
+        self.strength: Optional[int] = None   # 待发送强度 (None 表示无)
+        self.clear = False                    # 待发送的清除波形请求
+        self.written: Optional[int] = None    # 最近一次成功写入设备的强度
+        self.last_write = float('-inf')       # 最近一次写入的时间 (loop.time())
+        self.submitted_at = 0.0               # 进入待发送状态的时间 (perf_counter)
+        self.stats: Dict[str, int] = dict.fromkeys(STAT_KEYS, 0)
+        self.event = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+# A+B 合并写入用到的 YCYBLEClient 内部成员 (pydglab_ws 没有公开的合并写入接口)
+_COMBINED_FIELDS = (
+    '_strength_limit', '_send_command',
+    '_channel_a_mode', '_channel_b_mode',
+    '_channel_a_enabled', '_channel_b_enabled',
+    '_channel_a_strength', '_channel_b_strength',
+)
+_combined_unsupported_logged = False
+
+
+def _combined_write(client: YCYBLEClient, strength: int) -> Optional[Tuple[Awaitable[bool], Callable[[str], None]]]:
+    """
+    A+B 合并写入的适配层，对 YCYBLEClient 内部成员的访问都在这里
+
+    合并帧 (YCYChannel.AB) 的两个通道共用开关、强度与模式，只在两个通道模式相同时可用。
+    客户端不支持时 (bench 中的替身客户端，或 pydglab_ws 版本改动了这些内部成员) 返回 None，
+    由调用方按通道分别 set_strength。
+
+    :return: (发送帧的协程, 写入成功后更新某个通道缓存的函数)；客户端缓存在写入成功前不修改
+    """
+    global _combined_unsupported_logged
+    if not isinstance(client, YCYBLEClient):
+        return None
+    if not all(hasattr(client, name) for name in _COMBINED_FIELDS):
+        if not _combined_unsupported_logged:
+            _combined_unsupported_logged = True
+            logger.warning("当前 pydglab_ws 版本不支持 A+B 合并写入，改为按通道分别写入")
+        return None
+    # 模式缓存只由库的 set_pulse_preset 更新，set_mode 不会更新它；
+    # 库自身的 set_strength 同样按此缓存构建帧，合并帧与单通道写入发送的模式一致
+    mode = client._channel_a_mode
+    if mode != client._channel_b_mode:
+        return None
+    strength = max(0, min(client._strength_limit, strength))
+    enabled, ycy_strength = map_strength_to_ycy(strength)
+    frame = YCYBLEProtocol.build_channel_control(
+        channel=YCYChannel.AB,
+        enabled=enabled,
+        strength=ycy_strength,
+        mode=mode,
+    )
+
+    def commit(channel: str):
+        # 之后的相对强度、模式写入基于此缓存构建
+        suffix = channel.lower()
+        setattr(client, f'_channel_{suffix}_enabled', enabled)
+        setattr(client, f'_channel_{suffix}_strength', ycy_strength)
+
+    return client._send_command(frame), commit
+
+
+class BLEWriteScheduler:
+    """
+    按通道合并的 BLE 写入调度器
+
+    submit_* 方法是同步的，只更新目标状态并唤醒对应通道的发送任务；
+    可以从其它线程调用，整个提交会被转交到调度器所在的事件循环执行。
+    合并写入由单独的发送任务执行，期间到达的单通道请求会先把它拆回各通道，保证先后顺序。
+    """
+
+    CHANNELS = ('A', 'B')
+
+    def __init__(
+            self,
+            get_client: Callable[[], Optional[YCYBLEClient]],
+            min_interval: float = 0.025,
+            write_timeout: Optional[float] = None,
+        ):
+        """
+        :param get_client: 返回当前可用 BLE 客户端的函数
+        :param min_interval: 同一通道两次写入之间的最小间隔 (秒)
+        :param write_timeout: 单次写入的超时 (秒)，超时按写入失败处理，None 表示不限
+        """
+        self._get_client = get_client
+        self.min_interval = min_interval
+        self.write_timeout = write_timeout
+        self._slots: Dict[str, _ChannelSlot] = {ch: _ChannelSlot() for ch in self.CHANNELS}
+        # 各通道最近一次提交的目标强度 (清除为 0)，未连接时同样更新，重连后据此恢复输出
+        self.desired: Dict[str, int] = dict.fromkeys(self.CHANNELS, 0)
+        # 待发送的 A+B 合并写入 (只使用 strength / submitted_at / event / task)
+        self._pair = _ChannelSlot()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 成功写入后的回调 (channel, strength)，用于状态推送
+        self.listeners: List[Callable[[str, int], None]] = []
+        # 各通道计数 (键见 STAT_KEYS)
+        self.stats: Dict[str, Dict[str, int]] = {ch: slot.stats for ch, slot in self._slots.items()}
+        self._queue_wait = srv.METRICS.stage('ble_queue_wait')
+        self._write_time = srv.METRICS.stage('ble_write')
+
+    def start(self):
+        """在当前事件循环中启动各通道的发送任务"""
+        self._loop = asyncio.get_running_loop()
+        for channel, slot in self._slots.items():
+            if slot.task is None or slot.task.done():
+                slot.task = self._loop.create_task(self._drain(channel))
+        pair = self._pair
+        if pair.task is None or pair.task.done():
+            pair.task = self._loop.create_task(self._drain_pair())
+
+    def stop(self):
+        for slot in (*self._slots.values(), self._pair):
+            if slot.task:
+                slot.task.cancel()
+                slot.task = None
+
+    def invalidate(self):
+        """设备重连后调用：忘记已写入的强度，下一次写入不会被去重"""
+        for slot in self._slots.values():
+            slot.written = None
+
+    def totals(self) -> Dict[str, int]:
+        """所有通道的计数合计"""
+        return {key: sum(stats[key] for stats in self.stats.values()) for key in STAT_KEYS}
+
+    def collect(self):
+        """导出各通道计数与排队数，供 srv.METRICS.add_collector 使用"""
+        counts = []
+        for channel, slot in self._slots.items():
+            for key in STAT_KEYS:
+                counts.append(({'channel': channel, 'result': key}, slot.stats[key]))
+        paired = int(self._pair.strength is not None)
+        queued = [
+            ({'channel': channel}, int(slot.strength is not None) + int(slot.clear) + paired)
+            for channel, slot in self._slots.items()
+        ]
+        return [
+            ('ble_writes_total', 'counter', 'BLE write requests by channel and outcome', counts),
+            ('ble_queued', 'gauge', 'Writes waiting in the per-channel scheduler slot', queued),
+        ]
+
+    def pending(self, channel: str) -> bool:
+        slot = self._slots[channel.upper()]
+        return slot.strength is not None or slot.clear or self._pair.strength is not None
+
+    def active(self) -> bool:
+        """是否有通道正在输出 (有待发送的写入或设备强度非 0)"""
+        return self._pair.strength is not None or any(
+            slot.strength is not None or slot.clear or slot.written
+            for slot in self._slots.values()
+        )
+
+    def submit_strength(self, channel: str, strength: int):
+        """提交通道目标强度 (0-200)，覆盖尚未发送的旧值"""
+        self._call(self._submit_strength, channel, strength)
+
+    def submit_clear(self, channel: str):
+        """提交清除波形请求，多次请求在发送前合并为一次"""
+        self._call(self._submit_clear, channel)
+
+    def submit_both(self, strength_a: int, strength_b: int):
+        """
+        同时提交 A、B 两个通道的目标强度
+
+        两个值相同时合并为一个 A+B 写入；值不同、有待发送的清除请求、
+        或只有一个通道需要改变时，按通道分别提交 (两个通道的发送任务并发写入)。
+        """
+        self._call(self._submit_both, strength_a, strength_b)
+
+    def _call(self, func, *args):
+        """待发送状态只在事件循环线程中修改，其他线程 (flask 模式的请求线程) 的提交转交到事件循环"""
+        loop = self._loop
+        if loop is None:
+            func(*args)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            func(*args)
+        else:
+            loop.call_soon_threadsafe(func, *args)
+
+    def _submit_strength(self, channel: str, strength: int):
+        channel = channel.upper()
+        self.desired[channel] = strength
+        if self._pair.strength is not None:
+            self._split_pair()
+        slot = self._slots[channel]
+        stats = slot.stats
+        stats['submitted'] += 1
+        if slot.strength is not None:
+            stats['superseded'] += 1
+        elif strength == slot.written:
+            stats['deduplicated'] += 1
+            return
+        elif not slot.clear:
+            slot.submitted_at = time.perf_counter()
+        slot.strength = strength
+        self._wake(slot)
+
+    def _submit_clear(self, channel: str):
+        channel = channel.upper()
+        self.desired[channel] = 0
+        if self._pair.strength is not None:
+            self._split_pair()
+        slot = self._slots[channel]
+        slot.stats['submitted'] += 1
+        if slot.clear:
+            slot.stats['superseded'] += 1
+        elif slot.strength is None:
+            slot.submitted_at = time.perf_counter()
+        slot.clear = True
+        self._wake(slot)
+
+    def _submit_both(self, strength_a: int, strength_b: int):
+        slot_a, slot_b = self._slots['A'], self._slots['B']
+        pair = self._pair
+        self.desired['A'], self.desired['B'] = strength_a, strength_b
+        if (strength_a != strength_b or slot_a.clear or slot_b.clear
+                or (pair.strength is None and strength_a in (slot_a.written, slot_b.written))):
+            self._submit_strength('A', strength_a)
+            self._submit_strength('B', strength_b)
+            return
+        for slot in (slot_a, slot_b):
+            slot.stats['submitted'] += 1
+            if slot.strength is not None or pair.strength is not None:
+                slot.stats['superseded'] += 1
+                slot.strength = None
+        if pair.strength is None:
+            pair.submitted_at = time.perf_counter()
+        pair.strength = strength_a
+        self._wake(pair)
+
+    def _split_pair(self):
+        """把尚未发送的合并写入拆回各通道，后到的单通道请求会覆盖其中一个"""
+        pair = self._pair
+        strength, pair.strength = pair.strength, None
+        for slot in self._slots.values():
+            if slot.strength is None:
+                slot.strength = strength
+                slot.submitted_at = pair.submitted_at
+                self._wake(slot)
+
+    def _wake(self, slot: _ChannelSlot):
+        # 只在事件循环线程中调用 (见 _call)
+        if self._loop is not None:
+            slot.event.set()
+
+    async def _drain(self, channel: str):
+        slot = self._slots[channel]
+        stats = slot.stats
+        ch = Channel.A if channel == 'A' else Channel.B
+        loop = asyncio.get_running_loop()
+        while True:
+            await slot.event.wait()
+            # 限速：等待期间到达的新值直接覆盖待发送值
+            delay = slot.last_write + self.min_interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            slot.event.clear()
+
+            strength, slot.strength = slot.strength, None
+            clear, slot.clear = slot.clear, False
+            if strength is None and not clear:
+                continue
+
+            client = self._get_client()
+            if client is None or not client.connected:
+                stats['dropped'] += 1
+                logger.debug("Channel {}: BLE 未连接，丢弃待发送状态", channel)
+                continue
+
+            issued_at = time.perf_counter()
+            self._queue_wait.observe(issued_at - slot.submitted_at)
+
+            try:
+                if clear:
+                    await asyncio.wait_for(client.clear_pulses(ch), self.write_timeout)
+                    logger.debug("Channel {}: 波形已清除", channel)
+                if strength is None:
+                    continue
+                if strength == slot.written:
+                    stats['deduplicated'] += 1
+                    continue
+                slot.last_write = loop.time()
+                ok = await asyncio.wait_for(
+                    client.set_strength(ch, StrengthOperationType.SET_TO, strength),
+                    self.write_timeout,
+                )
+                self._write_time.observe(time.perf_counter() - issued_at)
+                if ok:
+                    slot.written = strength
+                    stats['written'] += 1
+                    logger.debug("Channel {}: 强度设置为 {}", channel, strength)
+                    for listener in self.listeners:
+                        listener(channel, strength)
+                else:
+                    slot.written = None
+                    stats['failed'] += 1
+            except asyncio.TimeoutError:
+                slot.written = None
+                stats['failed'] += 1
+                logger.warning(f"Channel {channel}: BLE 写入超时 ({self.write_timeout}s)")
+            except Exception as e:
+                slot.written = None
+                stats['failed'] += 1
+                logger.error(f"设置强度失败: {e}")
+
+    async def _drain_pair(self):
+        pair = self._pair
+        slots = list(self._slots.values())
+        loop = asyncio.get_running_loop()
+        while True:
+            await pair.event.wait()
+            # 两个通道都满足最小写入间隔后才发送
+            delay = max(slot.last_write for slot in slots) + self.min_interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pair.event.clear()
+
+            strength, pair.strength = pair.strength, None
+            if strength is None:
+                continue
+
+            client = self._get_client()
+            if client is None or not client.connected:
+                for slot in slots:
+                    slot.stats['dropped'] += 1
+                logger.debug("Channel AB: BLE 未连接，丢弃待发送状态")
+                continue
+
+            issued_at = time.perf_counter()
+            self._queue_wait.observe(issued_at - pair.submitted_at)
+            if all(slot.written == strength for slot in slots):
+                for slot in slots:
+                    slot.stats['deduplicated'] += 1
+                continue
+
+            started = loop.time()
+            for slot in slots:
+                slot.last_write = started
+            combined = None
+            try:
+                combined = _combined_write(client, strength)
+                if combined is not None:
+                    ok = await asyncio.wait_for(combined[0], self.write_timeout)
+                else:
+                    results = await asyncio.wait_for(asyncio.gather(
+                        client.set_strength(Channel.A, StrengthOperationType.SET_TO, strength),
+                        client.set_strength(Channel.B, StrengthOperationType.SET_TO, strength),
+                    ), self.write_timeout)
+                    ok = all(results)
+                self._write_time.observe(time.perf_counter() - issued_at)
+            except asyncio.TimeoutError:
+                ok = False
+                logger.warning(f"Channel AB: BLE 写入超时 ({self.write_timeout}s)")
+            except Exception as e:
+                ok = False
+                logger.error(f"设置强度失败: {e}")
+
+            for channel, slot in self._slots.items():
+                # 写入期间该通道已有新的单通道写入发出，以其结果为准
+                if slot.last_write != started:
+                    continue
+                if ok:
+                    slot.written = strength
+                    slot.stats['written'] += 1
+                    if combined is not None:
+                        combined[1](channel)
+                        slot.stats['combined'] += 1
+                else:
+                    slot.written = None
+                    slot.stats['failed'] += 1
+            if ok:
+                logger.debug("Channel AB: 强度设置为 {}", strength)
+                for channel in self.CHANNELS:
+                    for listener in self.listeners:
+                        listener(channel, strength)
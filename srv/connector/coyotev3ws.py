@@ -4,6 +4,7 @@ import websockets
 from websockets.legacy.protocol import WebSocketCommonProtocol
 
 from srv import WS_CONNECTIONS, DEFAULT_WAVE #, WS_CONNECTIONS_ID_REVERSE, WS_BINDS
+from srv.wave import IntensityFrame
 
 class DGWSMessage():
     HEARTBEAT = json.dumps({'type': 'heartbeat', 'clientId': '', 'targetId': '', 'message': '200'})
@@ -99,6 +100,9 @@ class DGConnection():
         await self.set_strength(channel=channel, mode='2', value=strength)
 
     async def send_wave(self, channel='A', wavestr=DEFAULT_WAVE):
+        # 处理器产生的 IntensityFrame 只在这里编码为 DG-Lab 波形字符串
+        if isinstance(wavestr, IntensityFrame):
+            wavestr = wavestr.to_source()
         msg = DGWSMessage('msg', self.master_uuid, self.uuid, f"pulse-{channel}:{wavestr}")
         await msg.send(self)
     
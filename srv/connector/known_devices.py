@@ -0,0 +1,52 @@
+"""
+最近连接成功的 BLE 设备地址
+
+未在配置中指定地址时，DeviceRegistry 先用较短的超时直接连接这里记录的地址，
+全部失败才扫描。文件与配置文件同在工作目录，内容为按最近连接顺序排列的地址列表。
+"""
+import json
+import os
+from typing import List
+
+from loguru import logger
+
+DEFAULT_PATH = 'ble-known-devices.json'
+
+# 最多记录的地址数
+MAX_ADDRESSES = 8
+
+
+def load(path: str = DEFAULT_PATH) -> List[str]:
+    """:return: 记录的地址 (最近连接的在前)，文件不存在或损坏时为空"""
+    try:
+        with open(path, 'r', encoding='utf-8') as fr:
+            addresses = json.load(fr).get('addresses', [])
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning(f"读取 {path} 失败，忽略记录的设备地址: {e!r}")
+        return []
+    return [address for address in addresses if isinstance(address, str) and address]
+
+
+def remember(addresses: List[str], path: str = DEFAULT_PATH) -> List[str]:
+    """
+    把本次连接成功的地址移到记录的最前面并写回文件 (先写临时文件再替换)
+
+    :return: 写入的地址列表
+    """
+    known = load(path)
+    merged = list(addresses)
+    lowered = {address.lower() for address in merged}
+    merged.extend(address for address in known if address.lower() not in lowered)
+    merged = merged[:MAX_ADDRESSES]
+    if merged == known:
+        return known
+    tmp = f'{path}.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as fw:
+            json.dump({'addresses': merged}, fw, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"保存设备地址到 {path} 失败: {e!r}")
+    return merged
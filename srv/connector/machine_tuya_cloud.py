@@ -1,53 +1,239 @@
+"""
+涂鸦云设备连接器
+
+涂鸦云 API (tuya_connector.TuyaOpenAPI) 是同步的 HTTP 调用，
+这里把请求放到有界线程池中执行，事件循环不会被云端延迟阻塞。
+每个设备有独立的发送任务与令牌桶：待发送命令按 code 只保留最新值 (latest wins)，
+同一设备同时最多一个请求，一台设备响应缓慢只会让它收到的中间档位变少，不影响其它设备。
+tuya_connector (及其依赖的 requests) 在创建连接时才导入；获取令牌与打开开关在 start() 后于线程池中进行，不阻塞启动。
+"""
+import asyncio
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 from loguru import logger
-from tuya_connector import (
-	TuyaOpenAPI,
-	TuyaOpenPulsar,
-	TuyaCloudPulsarTopic,
+
+STAT_KEYS = (
+    'submitted',   # 收到的命令
+    'coalesced',   # 发送前被同 code 的新值覆盖的设备请求
+    'sent',        # 发出的设备请求
+    'failed',      # 失败或超时的设备请求
 )
 
+
+class TokenBucket:
+    """
+    令牌桶
+
+    :param rate: 每秒补充的令牌数
+    :param burst: 桶容量 (允许的突发数)
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """距离有可用令牌的时间 (秒)，0 表示现在可用"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """等待并取走一个令牌"""
+        while True:
+            delay = self.delay()
+            if delay <= 0:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(delay)
+
+
+class _DeviceSlot:
+    """单个设备的待发送命令"""
+    __slots__ = ('pending', 'bucket', 'inflight', 'event', 'task')
+
+    def __init__(self, bucket: TokenBucket):
+        self.pending: Dict[str, Any] = {}   # code -> value，按首次提交的顺序发送
+        self.bucket = bucket
+        self.inflight: Optional[Future] = None  # 进行中的请求 (同一设备最多一个)
+        self.event: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+
 class TuYaConnection():
     def __init__(
-            self, 
-            access_id: str, 
-            access_key: str, 
-            device_ids: list, 
-            api_endpoint= "https://openapi.tuyacn.com", 
-            mq_endpoint="wss://mqe.tuyacn.com:8285/", 
+            self,
+            access_id: str,
+            access_key: str,
+            device_ids: list,
+            api_endpoint= "https://openapi.tuyacn.com",
+            mq_endpoint="wss://mqe.tuyacn.com:8285/",
             cmd_gap=0.2,
+            burst: int = 1,
+            max_workers: int = 8,
+            request_timeout: float = 5.0,
+            api: Any = None,
         ) -> None:
-        self.tyapi = TuyaOpenAPI(api_endpoint, access_id, access_key)
-        self.tyapi.connect()
-        self.last_cmd_time = 0
-        self.cmd_gap = cmd_gap
-        self.device_ids = device_ids
+        """
+        :param device_ids: 设备 ID 列表，同一命令发往所有设备
+        :param api_endpoint: 涂鸦云 API 地址 (可指向本地测试服务，见 bench/fake_tuya.py)
+        :param cmd_gap: 每个设备命令的平均最小间隔 (秒)，即令牌桶速率 1 / cmd_gap
+        :param burst: 令牌桶容量
+        :param max_workers: 执行 HTTP 请求的线程数上限
+        :param request_timeout: 请求超过此时长 (秒) 记为失败；该设备的下一个请求仍在本次请求返回后发出
+        :param api: 提供 connect() / post(path, body) 的 API 对象，默认创建 TuyaOpenAPI
+        """
+        if api is None:
+            try:
+                from tuya_connector import TuyaOpenAPI
+            except ImportError:
+                raise RuntimeError("缺少 tuya_connector，请安装 tuya-connector-python") from None
+            api = TuyaOpenAPI(api_endpoint, access_id, access_key)
+        self.tyapi = api
+        self.device_ids: List[str] = list(device_ids)
         self.mq_endpoint = mq_endpoint
-        self.set_switch(True)
+        self.cmd_gap = cmd_gap
+        self.request_timeout = request_timeout
+        rate = 1 / cmd_gap if cmd_gap > 0 else float('inf')
+        self._slots: Dict[str, _DeviceSlot] = {
+            device_id: _DeviceSlot(TokenBucket(rate, burst)) for device_id in self.device_ids
+        }
+        self.stats: Dict[str, int] = dict.fromkeys(STAT_KEYS, 0)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(self.device_ids))),
+            thread_name_prefix='tuya',
+        )
         self.current_level = 1
-    
+        # 获取令牌后置位，各设备的发送任务在此之前只合并待发送命令
+        self._ready: Optional[asyncio.Event] = None
+        self._connected = False
+
     def __del__(self):
-        self.set_switch(False)
+        if not self._connected:
+            return
+        try:
+            self.set_switch(False)
+        except Exception:
+            pass
+
+    def connect(self):
+        """获取令牌并打开各设备开关 (同步，阻塞到完成)"""
+        self.tyapi.connect()
+        self._connected = True
+        self.set_switch(True)
+
+    async def _connect(self):
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.tyapi.connect)
+            self._connected = True
+        except Exception as e:
+            logger.error(f"涂鸦云连接失败: {e!r}")
+        # 打开开关作为各设备的第一条命令，由各自的发送任务发出，慢设备不拖延其它设备
+        for slot in self._slots.values():
+            slot.pending = {'switch': True, **slot.pending}
+        self._ready.set()
+
+    def start(self):
+        """在当前事件循环中启动连接与各设备的发送任务"""
+        loop = asyncio.get_running_loop()
+        if self._ready is None:
+            self._ready = asyncio.Event()
+            if self._connected:
+                self._ready.set()
+            else:
+                loop.create_task(self._connect())
+        for device_id, slot in self._slots.items():
+            if slot.task is None or slot.task.done():
+                slot.event = asyncio.Event()
+                if slot.pending:
+                    slot.event.set()
+                slot.task = loop.create_task(self._sender(device_id, slot))
+
+    async def close(self):
+        for slot in self._slots.values():
+            if slot.task:
+                slot.task.cancel()
+                slot.task = None
+        self._executor.shutdown(wait=False)
+
+    def collect(self):
+        """导出命令计数，供 srv.METRICS.add_collector 使用"""
+        return [(
+            'tuya_commands_total', 'counter', 'Tuya cloud device requests by outcome',
+            [({'result': key}, self.stats[key]) for key in STAT_KEYS],
+        )]
+
+    def submit(self, code: str, value: Any):
+        """提交命令 (不阻塞)，覆盖各设备尚未发送的同 code 命令"""
+        self.stats['submitted'] += 1
+        for slot in self._slots.values():
+            if code in slot.pending:
+                self.stats['coalesced'] += 1
+            slot.pending[code] = value
+            if slot.event is not None:
+                slot.event.set()
 
     async def sendcmd(self, code, value):
-        curr_time = time.time()
-        if curr_time - self.last_cmd_time < self.cmd_gap and code in ['level', 'mode']:
-            logger.debug(f"Skip cmd: {code}:{value}")
-        for device_id in self.device_ids:
-            resp = self.tyapi.post(f"/v1.0/iot-03/devices/{device_id}/commands", {"commands":[{"code":code,"value":value}]})
-            logger.success(f"{device_id}:{code}:{value}")
-            if resp.get('success') != True:
-                logger.error(f"{resp}")
+        self.submit(code, value)
+
+    async def _sender(self, device_id: str, slot: _DeviceSlot):
+        await self._ready.wait()
+        while True:
+            await slot.event.wait()
+            slot.event.clear()
+            while slot.pending:
+                # 等待令牌与上一个请求期间到达的新值直接覆盖待发送值
+                await slot.bucket.acquire()
+                code = next(iter(slot.pending))
+                value = slot.pending.pop(code)
+                await self._send(device_id, slot, code, value)
+
+    async def _send(self, device_id, slot: _DeviceSlot, code, value):
+        # 同一设备只保留一个进行中的请求 (包括超时后仍未返回的)，避免占满线程池
+        if slot.inflight is not None and not slot.inflight.done():
+            await asyncio.wait([asyncio.wrap_future(slot.inflight)])
+        self.stats['sent'] += 1
+        slot.inflight = self._executor.submit(self._post, device_id, code, value)
+        try:
+            resp = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(slot.inflight)), self.request_timeout)
+        except asyncio.TimeoutError:
+            self.stats['failed'] += 1
+            logger.error(f"{device_id}:{code}:{value} 请求超时 ({self.request_timeout}s)")
+            return
+        except Exception as e:
+            self.stats['failed'] += 1
+            logger.error(f"{device_id}:{code}:{value} 请求失败: {e!r}")
+            return
+        if resp.get('success') != True:
+            self.stats['failed'] += 1
+            logger.error(f"{resp}")
+        else:
+            logger.success("{}:{}:{}", device_id, code, value)
+
+    def _post(self, device_id, code, value) -> dict:
+        return self.tyapi.post(f"/v1.0/iot-03/devices/{device_id}/commands", {"commands":[{"code":code,"value":value}]})
 
     def sendcmd_sync(self, code, value):
-        curr_time = time.time()
-        if curr_time - self.last_cmd_time < self.cmd_gap and code in ['level', 'mode']:
-            logger.debug(f"Skip cmd: {code}:{value}")
-        for device_id in self.device_ids:
-            resp = self.tyapi.post(f"/v1.0/iot-03/devices/{device_id}/commands", {"commands":[{"code":code,"value":value}]})
+        """同步发送 (启动 / 退出时使用)，各设备的请求并发执行"""
+        for device_id, slot in self._slots.items():
+            slot.inflight = self._executor.submit(self._post, device_id, code, value)
+        for device_id, slot in self._slots.items():
+            try:
+                resp = slot.inflight.result(timeout=self.request_timeout)
+            except Exception as e:
+                logger.error(f"{device_id}:{code}:{value} 请求失败: {e!r}")
+                continue
             logger.success(f"{device_id}:{code}:{value}")
             if resp.get('success') != True:
                 logger.error(f"{resp}")
-    
+
     def set_switch(self, switch:bool=True):
         self.sendcmd_sync('switch', switch)
 
@@ -67,6 +253,4 @@ class TuYaConnection():
 
     async def set_mode(self, mode:str='A'):
         await self.sendcmd('mode', f"level_{mode}")
-    
 
-        
\ No newline at end of file
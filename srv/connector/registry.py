@@ -0,0 +1,268 @@
+"""
+多设备注册表
+
+管理 N 台役次元设备 (每台一个 YCYBLEConnector)，把逻辑通道 A / B 的输出分发到各设备。
+每台设备有独立的写入调度器与发送任务，强度写入只是提交到各设备的调度器，
+一台设备变慢或断开不会推迟其它设备的写入；需要等待结果的操作 (连接、断开、设置模式)
+在各设备上并发执行，并分别设置超时。
+强度提交也发往未连接的设备，记录为其调度器的目标状态，设备重连后按当前上限恢复。
+未指定地址的设备先直接连接上次连接成功的地址 (见 known_devices)，失败才扫描。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from . import known_devices
+from .ycy_ble import YCYBLEConnector
+
+
+class DeviceRegistry:
+    """
+    役次元设备注册表
+
+    :param op_timeout: 单台设备上一次操作 (设置模式、断开等) 的超时 (秒)
+    :param connect_timeout: 单台设备连接的超时 (秒，不含扫描)
+    :param max_devices: 未指定地址时，自动扫描最多连接的设备数
+    :param known_devices_path: 记录最近连接成功地址的文件，None 表示不记录
+    :param remembered_timeout: 直接连接记录地址的超时 (秒)，超时后改为扫描
+    """
+
+    def __init__(
+            self,
+            op_timeout: float = 5.0,
+            connect_timeout: float = 20.0,
+            max_devices: int = 1,
+            known_devices_path: Optional[str] = None,
+            remembered_timeout: float = 3.0,
+        ):
+        self.op_timeout = op_timeout
+        self.connect_timeout = connect_timeout
+        self.max_devices = max_devices
+        self.known_devices_path = known_devices_path
+        self.remembered_timeout = remembered_timeout
+        self.devices: List[YCYBLEConnector] = []
+
+    @classmethod
+    def from_config(cls, ble_config: dict) -> "DeviceRegistry":
+        """
+        根据 SETTINGS['ble'] 创建注册表
+
+        ble.devices 为空时，按 ble.device_address 创建单台设备 (留空则自动扫描)，
+        并按 ble.max_devices 决定自动扫描时连接的设备数。
+        """
+        timeout = ble_config.get('device_timeout', 5.0)
+        connect_timeout = ble_config.get('connect_timeout', 20.0)
+        registry = cls(
+            op_timeout=timeout,
+            connect_timeout=connect_timeout,
+            max_devices=ble_config.get('max_devices', 1),
+            known_devices_path=(
+                ble_config.get('known_devices_file') or known_devices.DEFAULT_PATH
+                if ble_config.get('remember_device', True) else None
+            ),
+            remembered_timeout=ble_config.get('remembered_connect_timeout', 3.0),
+        )
+        common = dict(
+            write_interval=ble_config.get('write_interval_ms', 25) / 1000.0,
+            write_timeout=timeout,
+            telemetry_interval=ble_config.get('telemetry_interval', 30.0),
+            telemetry_max_age=ble_config.get('telemetry_max_age', 120.0),
+            connect_timeout=connect_timeout,
+            auto_reconnect=ble_config.get('reconnect', True),
+            reconnect_min_delay=ble_config.get('reconnect_min_delay', 0.5),
+            reconnect_max_delay=ble_config.get('reconnect_max_delay', 30.0),
+        )
+        devices = ble_config.get('devices') or []
+        if devices:
+            for device in devices:
+                registry.add(YCYBLEConnector(
+                    device_address=device.get('address'),
+                    strength_limit=device.get('strength_limit', ble_config.get('strength_limit', 200)),
+                    channel_map=device.get('channels'),
+                    **common,
+                ))
+        else:
+            count = 1 if ble_config.get('device_address') else max(1, registry.max_devices)
+            for _ in range(count):
+                registry.add(YCYBLEConnector(
+                    device_address=ble_config.get('device_address'),
+                    strength_limit=ble_config.get('strength_limit', 200),
+                    **common,
+                ))
+        return registry
+
+    def add(self, connector: YCYBLEConnector) -> YCYBLEConnector:
+        self.devices.append(connector)
+        return connector
+
+    @property
+    def connected(self) -> bool:
+        return any(device.connected for device in self.devices)
+
+    @property
+    def all_connected(self) -> bool:
+        return all(device.connected for device in self.devices)
+
+    def connected_devices(self) -> List[YCYBLEConnector]:
+        return [device for device in self.devices if device.connected]
+
+    def targets(self, channel: str, connected_only: bool = True) -> Iterator[Tuple[YCYBLEConnector, str]]:
+        """逻辑通道对应的 (设备, 设备通道)，默认只包括已连接的设备"""
+        channel = channel.upper()
+        for device in self.devices:
+            physical = device.channel_map.get(channel)
+            if physical and (device.connected or not connected_only):
+                yield device, physical
+
+    # ==================== 强度写入 (非阻塞) ====================
+
+    def submit_strength(self, channel: str, strength: int) -> int:
+        """
+        提交逻辑通道的目标强度，按各设备的强度上限截断
+
+        :return: 提交到的设备数
+        """
+        count = 0
+        for device, physical in self.targets(channel, connected_only=False):
+            device.scheduler.submit_strength(physical, min(strength, device.strength_limit))
+            count += 1
+        return count
+
+    def submit_both(self, strength_a: int, strength_b: int) -> int:
+        """
+        同时提交逻辑通道 A、B 的目标强度
+
+        同一设备的两个通道都有输出时交给 BLEWriteScheduler.submit_both，
+        可能合并为一个 A+B 写入；否则按通道分别提交。
+        :return: 提交到的设备数
+        """
+        count = 0
+        for device in self.devices:
+            physical = {}
+            for channel, strength in (('A', strength_a), ('B', strength_b)):
+                target = device.channel_map.get(channel)
+                if target:
+                    physical[target] = min(strength, device.strength_limit)
+            if len(physical) == 2:
+                device.scheduler.submit_both(physical['A'], physical['B'])
+            else:
+                for target, strength in physical.items():
+                    device.scheduler.submit_strength(target, strength)
+            count += bool(physical)
+        return count
+
+    def submit_clear(self, channel: str) -> int:
+        count = 0
+        for device, physical in self.targets(channel, connected_only=False):
+            device.scheduler.submit_clear(physical)
+            count += 1
+        return count
+
+    # ==================== 并发操作 ====================
+
+    async def gather(
+            self,
+            func: Callable[[YCYBLEConnector], Awaitable[Any]],
+            devices: Optional[List[YCYBLEConnector]] = None,
+            timeout: Optional[float] = None,
+        ) -> List[Any]:
+        """
+        在各设备上并发执行 func，单台设备超时或出错时结果为 None，不影响其它设备
+
+        :param devices: 目标设备，默认全部已连接设备
+        :param timeout: 单台设备的超时 (秒)，默认 op_timeout
+        """
+        devices = self.connected_devices() if devices is None else devices
+        timeout = self.op_timeout if timeout is None else timeout
+
+        async def run(device: YCYBLEConnector):
+            try:
+                return await asyncio.wait_for(func(device), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"[{device.name}] 操作超时 ({timeout}s)")
+            except Exception as e:
+                logger.error(f"[{device.name}] 操作失败: {e}")
+            return None
+
+        return await asyncio.gather(*(run(device) for device in devices))
+
+    async def connect(self, scan_timeout: float = 10.0) -> bool:
+        """
+        连接所有设备：未指定地址的设备先直接连接记录的地址，其余的共用一次扫描结果
+        (发现足够的设备即结束，按 RSSI 选择信号最强的)，各设备的连接并发进行。
+        之后为每台已确定地址的设备启动连接监视，断开 (或本次连接失败) 后在后台自动重连。
+
+        :return: 是否至少有一台设备连接成功
+        """
+        automatic = [device for device in self.devices if not device.device_address]
+        unaddressed = automatic
+        failed = set()
+        if unaddressed and self.known_devices_path:
+            failed = await self._connect_remembered(unaddressed)
+            unaddressed = [device for device in unaddressed if not device.device_address]
+        if unaddressed:
+            taken = [device.device_address for device in self.devices if device.device_address]
+            candidates = await YCYBLEConnector.scan_devices(timeout=scan_timeout, count=len(unaddressed), exclude=taken)
+            # 刚才直接连接失败的记录地址排在最后，其它设备可用时优先连接其它设备
+            candidates.sort(key=lambda dev: dev.address.lower() in failed)
+            for device, dev in zip(unaddressed, candidates):
+                logger.info(f"选择设备: {dev.name} ({dev.address}) RSSI: {dev.rssi}")
+                device.device_address = dev.address
+            if not candidates:
+                logger.error("未找到役次元设备")
+
+        pending = [device for device in self.devices if device.device_address and not device.connected]
+        results = await self.gather(lambda device: device.connect(), devices=pending, timeout=self.connect_timeout)
+        for device, ok in zip(pending, results):
+            if not ok:
+                logger.error(f"[{device.name}] 连接失败")
+        remembered = [device.device_address for device in automatic if device.connected]
+        if remembered and self.known_devices_path:
+            known_devices.remember(remembered, self.known_devices_path)
+        for device in self.devices:
+            device.supervise()
+        connected = len(self.connected_devices())
+        if len(self.devices) > 1:
+            logger.info(f"已连接 {connected}/{len(self.devices)} 台设备")
+        return connected > 0
+
+    async def _connect_remembered(self, unaddressed: List[YCYBLEConnector]) -> Set[str]:
+        """
+        用 remembered_timeout 直接连接记录的地址，失败的设备恢复为未指定地址
+
+        :return: 连接失败的地址 (小写)
+        """
+        taken = {device.device_address.lower() for device in self.devices if device.device_address}
+        addresses = [
+            address for address in known_devices.load(self.known_devices_path)
+            if address.lower() not in taken
+        ][:len(unaddressed)]
+        if not addresses:
+            return set()
+        attempted = unaddressed[:len(addresses)]
+        for device, address in zip(attempted, addresses):
+            device.device_address = address
+        logger.info(f"直接连接上次使用的设备: {', '.join(addresses)}")
+        results = await self.gather(lambda device: device.connect(), devices=attempted, timeout=self.remembered_timeout)
+        failed = set()
+        for device, ok in zip(attempted, results):
+            if not ok:
+                logger.info(f"[{device.name}] 直接连接失败，改为扫描")
+                failed.add(device.device_address.lower())
+                device.device_address = None
+        return failed
+
+    async def disconnect(self):
+        await self.gather(lambda device: device.disconnect(), devices=list(self.devices))
+
+    # ==================== 指标与状态 ====================
+
+    def collect(self):
+        """合并各设备的调度器与连接指标，增加 device 标签"""
+        merged: Dict[str, list] = {}
+        for device in self.devices:
+            for name, kind, help_text, values in device.collect():
+                entry = merged.setdefault(name, [name, kind, help_text, []])
+                entry[3].extend(({'device': device.name, **labels}, value) for labels, value in values)
+        return [tuple(entry) for entry in merged.values()]
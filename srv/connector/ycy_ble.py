@@ -3,15 +3,51 @@
 
 通过蓝牙直连役次元设备，无需 App 中转。
 使用 YCY 预设波形模式，通过强度控制输出。
+连接后由后台监视任务检测断开并按指数退避自动重连，重连成功后按当前上限恢复各通道的目标状态。
 """
 import asyncio
-from typing import Optional, List
+from typing import Callable, Collection, Dict, Optional, List, Union
+from bleak import BleakScanner
 from loguru import logger
 
-from pydglab_ws import YCYBLEClient, YCYScanner, Channel, StrengthOperationType
-from pydglab_ws.ble import YCYMode
+from pydglab_ws import YCYBLEClient, Channel, StrengthOperationType
+from pydglab_ws.ble import YCYDevice, YCYMode, ElectrodeStatus
+from pydglab_ws.ble.scanner import SERVICE_UUID
 
 import srv
+from ..logs import LogThrottle
+from ..wave import IntensityFrame, WavePattern, intern as intern_wave
+from .ble_scheduler import BLEWriteScheduler
+
+# broadcast_wave / broadcast_frame 强度日志的限流 (按通道)
+_WAVE_LOG: Dict[str, LogThrottle] = {}
+# 设备未连接 (如启动时仍在扫描) 时的警告限流
+_DISCONNECTED_LOG = LogThrottle()
+
+
+def _warn_disconnected(devices):
+    """设备未全部连接时输出限流的警告；提交仍会记录为目标状态，重连后恢复"""
+    if not devices.all_connected and _DISCONNECTED_LOG.ready():
+        logger.warning("BLE 未连接，记录目标状态，重连后恢复 (省略 {} 条)", _DISCONNECTED_LOG.take())
+
+
+# 扫描到所需数量的设备后继续监听的时长 (秒)，用于按 RSSI 比较附近的其它设备
+SCAN_SETTLE = 0.3
+
+# 连接监视的检查间隔 (秒)
+SUPERVISE_INTERVAL = 0.5
+
+RECONNECT_STAT_KEYS = (
+    'disconnects',  # 检测到的意外断开
+    'attempts',     # 重连尝试
+    'recovered',    # 重连成功
+)
+
+_ELECTRODE_NAMES = {
+    ElectrodeStatus.NOT_CONNECTED: 'not_connected',
+    ElectrodeStatus.CONNECTED_ACTIVE: 'connected_active',
+    ElectrodeStatus.CONNECTED_INACTIVE: 'connected_inactive',
+}
 
 # YCY 预设模式名称 (1-16)
 YCY_MODE_NAMES = [
@@ -26,27 +62,80 @@ class YCYBLEConnector:
     """
     役次元 BLE 连接器
 
-    封装 YCYBLEClient，提供与原 DGConnection 兼容的接口。
+    封装单台设备的 YCYBLEClient；多台设备由 srv.connector.registry.DeviceRegistry 管理。
+    静态 broadcast_* 方法提供与原 DGConnection 兼容的接口，输出到 srv.BLE_DEVICES 中的全部设备。
     """
 
-    def __init__(self, device_address: str = None, strength_limit: int = 200):
+    def __init__(
+            self,
+            device_address: str = None,
+            strength_limit: int = 200,
+            write_interval: float = 0.025,
+            write_timeout: float = 5.0,
+            telemetry_interval: float = 30.0,
+            telemetry_max_age: float = 120.0,
+            channel_map: Dict[str, str] = None,
+            connect_timeout: float = 20.0,
+            auto_reconnect: bool = True,
+            reconnect_min_delay: float = 0.5,
+            reconnect_max_delay: float = 30.0,
+        ):
         """
         初始化连接器
 
         :param device_address: 设备蓝牙地址，留空则自动扫描
         :param strength_limit: 强度上限 (0-200)
+        :param write_interval: 同一通道两次 BLE 写入的最小间隔 (秒)
+        :param write_timeout: 单次 BLE 写入的超时 (秒)
+        :param telemetry_interval: 电量 / 电极状态的后台刷新间隔 (秒)
+        :param telemetry_max_age: 输出进行中时推迟刷新，但缓存不会超过此时长 (秒)
+        :param channel_map: 逻辑通道 -> 本设备通道，如 {'A': 'B'}；未列出的逻辑通道不输出到本设备
+        :param connect_timeout: 单次重连的超时 (秒)
+        :param auto_reconnect: 断开后是否自动重连
+        :param reconnect_min_delay: 重连失败后的首次等待 (秒)，之后每次加倍
+        :param reconnect_max_delay: 重连等待的上限 (秒)
         """
         self.device_address = device_address
         self.strength_limit = strength_limit
         self.client: Optional[YCYBLEClient] = None
+        self.channel_map: Dict[str, str] = {
+            k.upper(): v.upper() for k, v in (channel_map or {'A': 'A', 'B': 'B'}).items()
+        }
+        self.connect_timeout = connect_timeout
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = max(reconnect_min_delay, reconnect_max_delay)
+        self.reconnect_stats: Dict[str, int] = dict.fromkeys(RECONNECT_STAT_KEYS, 0)
+        self._recovery = srv.METRICS.stage('ble_recovery')
+        # 连接监视任务 (supervise() 启动)
         self._reconnect_task: Optional[asyncio.Task] = None
-        self._auto_reconnect = True
+        self._auto_reconnect = auto_reconnect
         self._connected_flag = False  # 连接成功标记
+        # 各设备通道最近一次设置的预设模式，重连后恢复
+        self.modes: Dict[str, YCYMode] = {}
+        # 输出调度器：合并每个通道的写入，只发送最新状态
+        self.scheduler = BLEWriteScheduler(
+            lambda: self.client if self.connected else None,
+            min_interval=write_interval,
+            write_timeout=write_timeout,
+        )
+        # 连接状态 / 遥测变化回调，用于状态推送
+        self.listeners: List[Callable[[], None]] = []
+        # 遥测缓存：由后台任务刷新，读取方不访问设备
+        self.telemetry_interval = telemetry_interval
+        self.telemetry_max_age = telemetry_max_age
+        self._telemetry = {'battery': -1, 'electrode_a': 'unknown', 'electrode_b': 'unknown'}
+        self._telemetry_time: Optional[float] = None
+        self._telemetry_error: Optional[str] = None
+        self._telemetry_task: Optional[asyncio.Task] = None
 
     @property
     def connected(self) -> bool:
-        """是否已连接 - 使用连接成功标记"""
-        return self._connected_flag and self.client is not None
+        """是否已连接 - 连接成功标记，且客户端未报告断开"""
+        return self._connected_flag and self.client is not None and self.client.connected
+
+    @property
+    def name(self) -> str:
+        return self.device_address or 'ble-device'
 
     @property
     def strength_data(self):
@@ -55,15 +144,49 @@ class YCYBLEConnector:
             return self.client.strength_data
         return None
 
-    async def scan_devices(self, timeout: float = 10.0) -> List:
+    @staticmethod
+    async def scan_devices(
+            timeout: float = 10.0,
+            count: Optional[int] = None,
+            exclude: Collection[str] = (),
+            settle: float = SCAN_SETTLE,
+        ) -> List[YCYDevice]:
         """
         扫描役次元设备
 
+        发现 count 台设备后再监听 settle 秒即结束，不必等到超时；
+        结果按 RSSI 从强到弱排序，调用方取前面的设备即为信号最好的。
+
         :param timeout: 扫描超时时间
+        :param count: 需要的设备数，None 表示扫描到超时
+        :param exclude: 忽略的设备地址 (如已被其它连接器使用)
+        :param settle: 发现足够设备后继续监听的时长 (秒)
         :return: 设备列表
         """
         logger.info(f"正在扫描役次元设备 (超时: {timeout}s)...")
-        devices = await YCYScanner.scan(timeout=timeout)
+        loop = asyncio.get_running_loop()
+        exclude = {address.lower() for address in exclude}
+        found: Dict[str, YCYDevice] = {}
+        enough = asyncio.Event()
+
+        def on_detect(device, adv):
+            if SERVICE_UUID.lower() not in (uuid.lower() for uuid in adv.service_uuids or ()):
+                return
+            if device.address.lower() in exclude:
+                return
+            found[device.address] = YCYDevice(address=device.address, name=device.name, rssi=adv.rssi)
+            if count and len(found) >= count:
+                enough.set()
+
+        deadline = loop.time() + timeout
+        async with BleakScanner(detection_callback=on_detect):
+            try:
+                await asyncio.wait_for(enough.wait(), timeout)
+                await asyncio.sleep(max(0.0, min(settle, deadline - loop.time())))
+            except asyncio.TimeoutError:
+                pass
+
+        devices = sorted(found.values(), key=lambda dev: -128 if dev.rssi is None else dev.rssi, reverse=True)
         for dev in devices:
             logger.info(f"  发现设备: {dev.name} ({dev.address}) RSSI: {dev.rssi}")
         return devices
@@ -81,8 +204,8 @@ class YCYBLEConnector:
                 logger.info(f"正在连接指定设备: {self.device_address}")
                 self.client = YCYBLEClient(self.device_address, strength_limit=self.strength_limit)
             else:
-                # 扫描并连接第一个设备
-                devices = await self.scan_devices(timeout=timeout)
+                # 扫描到设备即结束，连接信号最强的一台
+                devices = await self.scan_devices(timeout=timeout, count=1)
                 if not devices:
                     logger.error("未找到役次元设备")
                     return False
@@ -97,15 +220,18 @@ class YCYBLEConnector:
             if success:
                 # 设置连接标记
                 self._connected_flag = True
-                # 更新全局引用
-                srv.BLE_CLIENT = self.client
-
-                # 获取电池电量
-                try:
-                    battery = await self.client.get_battery()
-                    logger.success(f"BLE 连接成功! 电池电量: {battery}%")
-                except Exception:
+                # 新连接上的设备状态未知：重新启用写入去重，并按当前上限恢复各通道的目标状态
+                self.scheduler.invalidate()
+                self.scheduler.start()
+                await self._restore()
+                self._notify()
+
+                # 首次填充遥测缓存，之后由后台任务刷新
+                if await self.refresh_telemetry():
+                    logger.success(f"BLE 连接成功! 电池电量: {self._telemetry['battery']}%")
+                else:
                     logger.success("BLE 连接成功!")
+                self._start_telemetry()
 
                 return True
             else:
@@ -123,17 +249,193 @@ class YCYBLEConnector:
         self._connected_flag = False
         if self._reconnect_task:
             self._reconnect_task.cancel()
+        self._stop_telemetry()
+        self.scheduler.stop()
 
         if self.client:
             await self.client.disconnect()
-            srv.BLE_CLIENT = None
-            logger.info("BLE 已断开连接")
+            logger.info(f"[{self.name}] BLE 已断开连接")
+        self._notify()
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener()
 
     async def ensure_connected(self) -> bool:
         """确保已连接，未连接则尝试重连"""
         if self.connected:
             return True
-        return await self.connect()
+        return await self._reconnect()
+
+    def collect(self):
+        """调度器指标与连接状态、重连计数，供 DeviceRegistry.collect 合并"""
+        return [
+            *self.scheduler.collect(),
+            ('ble_connected', 'gauge', 'Whether the BLE device is connected', [({}, int(self.connected))]),
+            ('ble_reconnects_total', 'counter', 'BLE disconnects and reconnect attempts', [
+                ({'event': key}, self.reconnect_stats[key]) for key in RECONNECT_STAT_KEYS
+            ]),
+        ]
+
+    # ==================== 自动重连 ====================
+
+    def supervise(self):
+        """启动连接监视 (已在运行、未启用自动重连或尚无设备地址时忽略)"""
+        if not self._auto_reconnect or not self.device_address:
+            return
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._supervise())
+
+    async def _supervise(self):
+        """
+        连接监视
+
+        每 SUPERVISE_INTERVAL 秒检查一次连接，断开后立即重连，失败后按
+        reconnect_min_delay、加倍、最长 reconnect_max_delay 的间隔重试，直到成功或 disconnect()。
+        检测到断开到重连成功并恢复目标状态的耗时记入 ble_recovery 指标。
+        """
+        loop = asyncio.get_running_loop()
+        while self._auto_reconnect:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            if self.connected:
+                continue
+            lost_at = loop.time()
+            self._on_lost()
+            delay = self.reconnect_min_delay
+            attempts = 0
+            while self._auto_reconnect and not await self._reconnect():
+                attempts += 1
+                logger.warning(f"[{self.name}] 第 {attempts} 次重连失败，{delay:.1f}s 后重试")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.reconnect_max_delay)
+            if not self.connected:
+                return
+            recovery = loop.time() - lost_at
+            self._recovery.observe(recovery)
+            self.reconnect_stats['recovered'] += 1
+            logger.success(f"[{self.name}] BLE 已重连，恢复用时 {recovery:.1f}s (失败 {attempts} 次)")
+
+    def _on_lost(self):
+        if self._connected_flag:
+            self.reconnect_stats['disconnects'] += 1
+            logger.warning(f"[{self.name}] BLE 连接已断开，开始自动重连")
+        self._connected_flag = False
+        self._stop_telemetry()
+        self._notify()
+
+    async def _reconnect(self) -> bool:
+        """释放旧客户端后重新连接，单次尝试受 connect_timeout 限制"""
+        self.reconnect_stats['attempts'] += 1
+        if self.client is not None:
+            try:
+                await asyncio.wait_for(self.client.disconnect(), self.connect_timeout)
+            except Exception:
+                pass
+        try:
+            return await asyncio.wait_for(self.connect(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[{self.name}] 连接超时 ({self.connect_timeout}s)")
+            return False
+
+    def channel_limit(self, physical: str) -> int:
+        """设备通道的当前强度上限：设备上限与对应逻辑通道 strength_limit 的较小值"""
+        limit = self.strength_limit
+        for logical, target in self.channel_map.items():
+            config = srv.CHANNEL_CONFIG.get(logical)
+            if target == physical and config is not None:
+                limit = min(limit, config.strength_limit)
+        return limit
+
+    async def _restore(self):
+        """连接建立后重新设置各通道的预设模式，并按当前上限提交目标强度"""
+        for physical, mode in self.modes.items():
+            ch = Channel.A if physical == 'A' else Channel.B
+            try:
+                await asyncio.wait_for(self.client.set_mode(ch, mode), self.scheduler.write_timeout)
+            except Exception as e:
+                logger.warning(f"[{self.name}] 恢复通道 {physical} 模式失败: {e!r}")
+        desired = self.scheduler.desired
+        strength_a = min(desired['A'], self.channel_limit('A'))
+        strength_b = min(desired['B'], self.channel_limit('B'))
+        self.scheduler.submit_both(strength_a, strength_b)
+        if strength_a or strength_b:
+            logger.info(f"[{self.name}] 恢复输出: A {strength_a}, B {strength_b}")
+
+    # ==================== 遥测缓存 ====================
+
+    def telemetry(self) -> dict:
+        """
+        读取缓存的遥测数据 (不访问设备)
+
+        :return: battery / electrode_a / electrode_b，以及
+                 age (距上次成功刷新的秒数，从未刷新为 None)、stale (是否过期)、error (最近一次刷新的错误)
+        """
+        age = self.telemetry_age()
+        return {
+            **self._telemetry,
+            'age': None if age is None else round(age),
+            'stale': age is None or age > self.telemetry_max_age,
+            'error': self._telemetry_error,
+        }
+
+    def telemetry_age(self) -> Optional[float]:
+        if self._telemetry_time is None:
+            return None
+        return asyncio.get_running_loop().time() - self._telemetry_time
+
+    async def refresh_telemetry(self) -> bool:
+        """
+        向设备查询电量与电极状态并更新缓存
+
+        查询失败时保留旧值并记录错误。
+        :return: 是否刷新成功
+        """
+        client = self.client
+        if not self.connected:
+            return False
+        try:
+            battery = await client.get_battery()
+            if battery < 0:
+                raise TimeoutError("电量查询无响应")
+            electrode_a = await client.get_electrode_status(Channel.A)
+            electrode_b = await client.get_electrode_status(Channel.B)
+        except Exception as e:
+            self._telemetry_error = str(e) or type(e).__name__
+            logger.warning(f"遥测查询失败: {self._telemetry_error}")
+            return False
+        self._telemetry = {
+            'battery': battery,
+            'electrode_a': _ELECTRODE_NAMES.get(electrode_a, 'unknown'),
+            'electrode_b': _ELECTRODE_NAMES.get(electrode_b, 'unknown'),
+        }
+        self._telemetry_time = asyncio.get_running_loop().time()
+        self._telemetry_error = None
+        self._notify()
+        return True
+
+    def _start_telemetry(self):
+        if self._telemetry_task is None or self._telemetry_task.done():
+            self._telemetry_task = asyncio.get_running_loop().create_task(self._telemetry_loop())
+
+    def _stop_telemetry(self):
+        if self._telemetry_task:
+            self._telemetry_task.cancel()
+            self._telemetry_task = None
+
+    async def _telemetry_loop(self):
+        """
+        后台刷新遥测缓存
+
+        输出进行中时查询会与强度写入争用 BLE 链路，因此按 1, 2, 4... 秒退避，
+        直到输出停止或缓存年龄达到 telemetry_max_age 才查询。
+        """
+        while self.connected:
+            await asyncio.sleep(self.telemetry_interval)
+            backoff = min(1.0, self.telemetry_interval)
+            while self.scheduler.active() and not self.telemetry()['stale']:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.telemetry_interval)
+            await self.refresh_telemetry()
 
     async def get_battery(self) -> int:
         """获取电池电量"""
@@ -153,44 +455,30 @@ class YCYBLEConnector:
         if not self.connected or not self.client:
             return 'disconnected'
         try:
-            from pydglab_ws.ble import ElectrodeStatus
             ch = Channel.A if channel.upper() == 'A' else Channel.B
             status = await self.client.get_electrode_status(ch)
-            if status == ElectrodeStatus.NOT_CONNECTED:
-                return 'not_connected'
-            elif status == ElectrodeStatus.CONNECTED_ACTIVE:
-                return 'connected_active'
-            elif status == ElectrodeStatus.CONNECTED_INACTIVE:
-                return 'connected_inactive'
-            return 'unknown'
+            return _ELECTRODE_NAMES.get(status, 'unknown')
         except Exception:
             return 'unknown'
 
     # ==================== 兼容原 DGConnection 的静态方法 ====================
 
     @staticmethod
-    def _parse_wave_strength(wavestr: str) -> int:
+    def _parse_wave_strength(wavestr: Union[str, WavePattern]) -> int:
         """
-        从波形字符串解析强度值
+        取波形首帧强度 (0-100)，格式错误时为 0
 
-        波形格式: ["0A0A0A0A32323232"]
-        最后4个字节是强度 (00-64 = 0-100)
+        波形格式: ["0A0A0A0A32323232"]，字符串经 srv.wave.intern 缓存，只解析一次
         """
+        if isinstance(wavestr, WavePattern):
+            return wavestr.strength
         try:
-            import json
-            wave_list = json.loads(wavestr)
-            if isinstance(wave_list, list) and len(wave_list) > 0:
-                wave = wave_list[0]
-                # 取最后2个十六进制字符 (强度值)
-                strength_hex = wave[-2:]
-                strength = int(strength_hex, 16)
-                return strength  # 0-100
-        except Exception:
-            pass
-        return 0
+            return intern_wave(wavestr).strength
+        except ValueError:
+            return 0
 
     @staticmethod
-    async def broadcast_wave(channel: str, wavestr: str, strength_limit: int = 200):
+    async def broadcast_wave(channel: str, wavestr: Union[str, WavePattern], strength_limit: int = 200):
         """
         发送波形 (兼容原接口)
 
@@ -198,32 +486,45 @@ class YCYBLEConnector:
         使用预设模式，不发送自定义波形
 
         :param channel: 通道 'A' 或 'B'
-        :param wavestr: JSON 格式的波形数组字符串
+        :param wavestr: WavePattern 或 JSON 格式的波形数组字符串
         :param strength_limit: 强度软上限 (0-200)，默认200
         """
-        client = srv.BLE_CLIENT
-        if not client or not client.connected:
-            logger.warning("BLE 未连接，无法发送")
-            return
+        # 首帧强度 (0-100)
+        YCYBLEConnector._submit_percent(channel, YCYBLEConnector._parse_wave_strength(wavestr), strength_limit)
 
-        try:
-            ch = Channel.A if channel.upper() == 'A' else Channel.B
-
-            # 从波形解析强度 (0-100)
-            strength_percent = YCYBLEConnector._parse_wave_strength(wavestr)
+    @staticmethod
+    async def broadcast_frame(channel: str, frame: IntensityFrame, strength_limit: int = 200):
+        """
+        提交处理器产生的数值强度帧，以帧的结束强度设置通道强度 (不经过波形字符串)
 
-            # 转换为 YCY 强度，应用软上限
-            # strength_percent (0-100) * strength_limit / 100
-            ycy_strength = int(strength_percent * strength_limit / 100)
-            ycy_strength = max(0, min(strength_limit, ycy_strength))
+        :param channel: 通道 'A' 或 'B'
+        :param frame: 强度帧
+        :param strength_limit: 强度软上限 (0-200)，默认200
+        """
+        YCYBLEConnector._submit_percent(channel, 100 * frame.end, strength_limit)
 
-            # 设置强度
-            await client.set_strength(ch, StrengthOperationType.SET_TO, ycy_strength)
-            # 使用 info 级别日志方便调试
-            if ycy_strength > 0:
-                logger.info(f"Channel {channel}: 强度 {strength_percent}% -> {ycy_strength}/{strength_limit}")
-        except Exception as e:
-            logger.error(f"设置强度失败: {e}")
+    @staticmethod
+    def _submit_percent(channel: str, strength_percent: float, strength_limit: int):
+        devices = srv.BLE_DEVICES
+        if not devices:
+            return
+        _warn_disconnected(devices)
+
+        # 转换为 YCY 强度，应用软上限
+        # strength_percent (0-100) * strength_limit / 100
+        ycy_strength = int(strength_percent * strength_limit / 100)
+        ycy_strength = max(0, min(strength_limit, ycy_strength))
+
+        # 交给各设备的调度器合并发送
+        devices.submit_strength(channel, ycy_strength)
+        # 使用 info 级别日志方便调试 (每个节拍都会调用，按通道限流)
+        if ycy_strength > 0:
+            throttle = _WAVE_LOG.get(channel) or _WAVE_LOG.setdefault(channel, LogThrottle())
+            if throttle.ready():
+                logger.info(
+                    "Channel {}: 强度 {:.0f}% -> {}/{} (省略 {} 条)",
+                    channel, strength_percent, ycy_strength, strength_limit, throttle.take(),
+                )
 
     @staticmethod
     async def broadcast_clear_wave(channel: str):
@@ -232,16 +533,11 @@ class YCYBLEConnector:
 
         :param channel: 通道 'A' 或 'B'
         """
-        client = srv.BLE_CLIENT
-        if not client or not client.connected:
+        devices = srv.BLE_DEVICES
+        if not devices:
             return
 
-        try:
-            ch = Channel.A if channel.upper() == 'A' else Channel.B
-            await client.clear_pulses(ch)
-            logger.debug(f"Channel {channel}: 波形已清除")
-        except Exception as e:
-            logger.error(f"清除波形失败: {e}")
+        devices.submit_clear(channel)
 
     @staticmethod
     async def broadcast_strength(channel: str, strength: int):
@@ -251,17 +547,29 @@ class YCYBLEConnector:
         :param channel: 通道 'A' 或 'B'
         :param strength: 强度值 (0-200)
         """
-        client = srv.BLE_CLIENT
-        if not client or not client.connected:
-            logger.warning("BLE 未连接，无法设置强度")
+        devices = srv.BLE_DEVICES
+        if not devices:
             return
+        _warn_disconnected(devices)
 
-        try:
-            ch = Channel.A if channel.upper() == 'A' else Channel.B
-            await client.set_strength(ch, StrengthOperationType.SET_TO, strength)
-            logger.debug(f"Channel {channel}: 强度设置为 {strength}")
-        except Exception as e:
-            logger.error(f"设置强度失败: {e}")
+        devices.submit_strength(channel, strength)
+
+    @staticmethod
+    async def broadcast_strength_both(strength_a: int, strength_b: Optional[int] = None):
+        """
+        同时设置 A、B 两个通道的强度
+
+        两个通道强度相同时合并为一个 A+B 通道控制帧，否则两个通道并发写入，避免两次顺序写入造成的 A/B 时差。
+
+        :param strength_a: A 通道强度 (0-200)
+        :param strength_b: B 通道强度 (0-200)，默认与 A 相同
+        """
+        devices = srv.BLE_DEVICES
+        if not devices:
+            return
+        _warn_disconnected(devices)
+
+        devices.submit_both(strength_a, strength_a if strength_b is None else strength_b)
 
     @staticmethod
     async def broadcast_strength_0_to_1(channel: str, value: float):
@@ -271,20 +579,16 @@ class YCYBLEConnector:
         :param channel: 通道 'A' 或 'B'
         :param value: 强度值 (0.0-1.0)
         """
-        client = srv.BLE_CLIENT
-        if not client or not client.connected:
-            logger.warning("BLE 未连接，无法设置强度")
+        devices = srv.BLE_DEVICES
+        if not devices:
             return
+        _warn_disconnected(devices)
 
-        try:
-            ch = Channel.A if channel.upper() == 'A' else Channel.B
-            # 转换为 0-200 范围
-            strength = int(value * 200)
-            strength = max(0, min(200, strength))
-            await client.set_strength(ch, StrengthOperationType.SET_TO, strength)
-            logger.debug(f"Channel {channel}: 强度设置为 {value:.2f} ({strength}/200)")
-        except Exception as e:
-            logger.error(f"设置强度失败: {e}")
+        # 转换为 0-200 范围
+        strength = int(value * 200)
+        strength = max(0, min(200, strength))
+        devices.submit_strength(channel, strength)
+        logger.debug("Channel {}: 强度设置为 {:.2f} ({}/200)", channel, value, strength)
 
     @staticmethod
     async def set_mode(channel: str, mode: int):
@@ -294,28 +598,30 @@ class YCYBLEConnector:
         :param channel: 通道 'A' 或 'B'
         :param mode: 模式 (1-16)
         """
-        client = srv.BLE_CLIENT
-        if not client or not client.connected:
+        devices = srv.BLE_DEVICES
+        if not devices:
             return
 
-        try:
-            ch = Channel.A if channel.upper() == 'A' else Channel.B
-            ycy_mode = YCYMode(mode) if 1 <= mode <= 16 else YCYMode.PRESET_1
-            await client.set_mode(ch, ycy_mode)
-            logger.info(f"Channel {channel}: 模式设置为 {ycy_mode.name}")
-        except Exception as e:
-            logger.error(f"设置模式失败: {e}")
+        ycy_mode = YCYMode(mode) if 1 <= mode <= 16 else YCYMode.PRESET_1
+        # 记录到所有映射到该通道的设备，未连接的设备在重连后恢复
+        for device, physical in devices.targets(channel, connected_only=False):
+            device.modes[physical] = ycy_mode
+        targets = dict(devices.targets(channel))
+
+        async def apply(device: "YCYBLEConnector"):
+            ch = Channel.A if targets[device] == 'A' else Channel.B
+            await device.client.set_mode(ch, ycy_mode)
+
+        # 各设备并发设置，单台设备超时不影响其它设备
+        await devices.gather(apply, devices=list(targets))
+        logger.info(f"Channel {channel}: 模式设置为 {ycy_mode.name}")
 
     @staticmethod
     async def stop_all():
         """停止所有通道"""
-        client = srv.BLE_CLIENT
-        if not client or not client.connected:
+        devices = srv.BLE_DEVICES
+        if not devices:
             return
 
-        try:
-            await client.set_strength(Channel.A, StrengthOperationType.SET_TO, 0)
-            await client.set_strength(Channel.B, StrengthOperationType.SET_TO, 0)
-            logger.info("所有通道已停止")
-        except Exception as e:
-            logger.error(f"停止失败: {e}")
+        devices.submit_both(0, 0)
+        logger.info("所有通道已停止")
@@ -0,0 +1,133 @@
+"""
+共享截止时间调度器
+
+用一个最小堆保存所有按键注册的截止时间，只在最早的截止时间上挂一个
+loop.call_at 定时器，取代各处理器中每 50ms 唤醒一次的轮询清除循环。
+时间基准为事件循环的单调时钟 (loop.time())。
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from loguru import logger
+
+
+class DeadlineScheduler:
+    """
+    按键管理的截止时间调度器
+
+    每个键最多只有一个有效截止时间，重新设置会替换旧的截止时间。
+    回调可以是普通函数或协程函数，协程会被包装为 Task 执行。
+    非事件循环线程中的调用会被转交到所属事件循环执行。
+    """
+
+    def __init__(self):
+        self._heap: List[list] = []
+        self._entries: Dict[Hashable, list] = {}
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_when: Optional[float] = None
+        # 与事件循环一致：允许定时器在时钟分辨率内提前触发
+        self._resolution = time.get_clock_info('monotonic').resolution
+
+    def attach(self, loop: asyncio.AbstractEventLoop = None):
+        """绑定到事件循环，默认使用当前运行中的循环"""
+        self._loop = loop or asyncio.get_running_loop()
+
+    def time(self) -> float:
+        return self._loop.time()
+
+    def set(self, key: Hashable, delay: float, callback: Callable[[], Any]):
+        """
+        重置模式：截止时间 = 现在 + delay
+
+        :param key: 截止时间的键，例如 ('shock', 'A')
+        :param delay: 延迟 (秒)
+        :param callback: 到期回调
+        """
+        self._call(self._set, key, delay, callback, False)
+
+    def extend(self, key: Hashable, delay: float, callback: Callable[[], Any]):
+        """叠加模式：若该键尚未到期，在剩余时间上继续增加 delay，否则同 set"""
+        self._call(self._set, key, delay, callback, True)
+
+    def cancel(self, key: Hashable):
+        self._call(self._cancel, key)
+
+    def pending(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def remaining(self, key: Hashable) -> float:
+        """该键距离到期的剩余时间 (秒)，未注册时为 0"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0.0
+        return max(0.0, entry[0] - self.time())
+
+    def _call(self, func, *args):
+        if self._loop is None:
+            self.attach()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _set(self, key, delay, callback, stack):
+        now = self._loop.time()
+        old = self._entries.pop(key, None)
+        if old is not None:
+            old[3] = None  # 惰性删除：堆中的旧条目到期时跳过
+        if stack and old is not None and old[0] > now:
+            deadline = old[0] + delay
+        else:
+            deadline = now + delay
+        entry = [deadline, next(self._seq), key, callback]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+        self._arm()
+
+    def _cancel(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry[3] = None
+            self._arm()
+
+    def _arm(self):
+        heap = self._heap
+        while heap and heap[0][3] is None:
+            heapq.heappop(heap)
+        if not heap:
+            return
+        when = heap[0][0]
+        if self._timer is not None:
+            # 已挂的定时器不晚于新的最早截止时间：延长截止时间无需重新挂载，
+            # 旧定时器触发时会重新计算
+            if self._timer_when <= when:
+                return
+            self._timer.cancel()
+        self._timer_when = when
+        self._timer = self._loop.call_at(when, self._fire)
+
+    def _fire(self):
+        self._timer = None
+        self._timer_when = None
+        now = self._loop.time() + self._resolution
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, _, key, callback = heapq.heappop(heap)
+            if callback is None:
+                continue
+            del self._entries[key]
+            try:
+                ret = callback()
+                if asyncio.iscoroutine(ret):
+                    self._loop.create_task(ret)
+            except Exception as e:
+                logger.error(f"[Deadline] {key} 回调异常: {e}")
+        self._arm()
@@ -22,4 +22,7 @@ class BaseHandler():
     def osc_handler(self, address, *args):
         # logger.debug(f"VRCOSC: CHANN {self.channel}: {address}: {args}")
         val = self.param_sanitizer(args)
-        return asyncio.ensure_future(self._handler(val))
\ No newline at end of file
+        # 状态更新在数据报回调中同步完成，只有处理器返回协程 (需要 I/O) 时才创建 Task
+        ret = self._handler(val)
+        if ret is not None:
+            asyncio.ensure_future(ret)
\ No newline at end of file
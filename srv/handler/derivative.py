@@ -0,0 +1,83 @@
+"""
+流式导数估计器 (触摸模式)
+
+每个采样 O(1) 更新，不保存历史数组：
+先对位置做 3 点滑动平均，再逐级后向差分得到速度、加速度与加加速度。
+"""
+
+
+class StreamingDerivative:
+    """
+    位置 / 速度 / 加速度 / 加加速度的增量估计
+
+    平滑后的采样时间取 3 点窗口的中间采样时间。至少需要 4 个原始采样才会
+    输出非零结果 (与原 np.gradient 实现的要求一致)，加速度和加加速度分别
+    在第 5、6 个采样后开始有效。
+    """
+    __slots__ = ('_raw', '_times', '_count', '_levels', '_t', '_s', '_v', '_a', '_j')
+
+    WINDOW = 3
+
+    def __init__(self):
+        self._raw = [0.0] * self.WINDOW
+        self._times = [0.0] * self.WINDOW
+        self.reset()
+
+    def reset(self):
+        self._count = 0    # 原始采样数
+        self._levels = 0   # 已处理的平滑采样数 (最多记到 4)
+        self._t = 0.0
+        self._s = self._v = self._a = self._j = 0.0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, t: float, x: float):
+        """
+        加入一个采样
+
+        :param t: 采样时间 (秒，单调时钟)
+        :param x: 归一化后的位置 (0-1)
+        """
+        window = self.WINDOW
+        i = self._count % window
+        self._raw[i] = x
+        self._times[i] = t
+        self._count += 1
+        if self._count < window:
+            return
+
+        s = sum(self._raw) / window
+        tc = self._times[(self._count - 2) % window]
+        levels = self._levels
+        if levels == 0:
+            self._s, self._t, self._levels = s, tc, 1
+            return
+
+        dt = tc - self._t
+        if dt <= 0:
+            # 同一时刻的重复采样：只更新位置，导数保持不变
+            self._s = s
+            return
+        v = (s - self._s) / dt
+        if levels >= 2:
+            a = (v - self._v) / dt
+            if levels >= 3:
+                self._j = (a - self._a) / dt
+            self._a = a
+        self._v = v
+        self._s, self._t = s, tc
+        if levels < 4:
+            self._levels = levels + 1
+
+    def values(self):
+        """:return: (位置, 速度, 加速度, 加加速度)"""
+        levels = self._levels
+        if levels < 2:
+            return 0, 0, 0, 0
+        return (
+            self._s,
+            self._v,
+            self._a if levels >= 3 else 0,
+            self._j if levels >= 4 else 0,
+        )
@@ -0,0 +1,90 @@
+"""
+多参数融合
+
+一个通道可以监听多个 avatar_params，多个接触同时有输入时，各地址的 (已按 trigger_range 归一化的) 数值
+分别保存在 numpy 数组中 (每个实际 OSC 地址一个槽位，通配地址匹配到的每个地址各占一个)，
+发送节拍时按 mode_config.distance.fusion 做一次向量化归约：
+    max       取最大值
+    sum       按 weights 加权求和，上限为 1
+    priority  取 avatar_params 中排在最前、当前有输入 (> 0) 的参数
+输出不再随最后到达的参数来回跳变，强度不变的节拍也不会产生 BLE 写入。
+"""
+import re
+from functools import lru_cache
+from typing import Dict
+
+import numpy as np
+
+from ..config import ChannelConfig
+
+FUSION_MODES = ('max', 'sum', 'priority')
+
+
+@lru_cache(maxsize=256)
+def _pattern(address: str) -> "re.Pattern":
+    """avatar_params / weights 中的地址，* 匹配任意字符 (与 CompiledDispatcher 一致)"""
+    return re.compile('.*?'.join(re.escape(part) for part in address.split('*')))
+
+
+class ParamFusion:
+    """
+    单个通道的参数状态与归约
+
+    :param capacity: 初始槽位数，地址数超过时加倍
+    """
+
+    def __init__(self, capacity: int = 4):
+        self.index: Dict[str, int] = {}
+        self.values = np.zeros(capacity)
+        self.weights = np.ones(capacity)
+        self.ranks = np.zeros(capacity)
+        # 计算 weights / ranks 时使用的配置快照，热加载后重新计算
+        self._config = None
+
+    def update(self, address: str, value: float):
+        """记录地址的最新数值 (0-1)"""
+        slot = self.index.get(address)
+        if slot is None:
+            slot = self._add(address)
+        self.values[slot] = value
+
+    def reset(self):
+        self.values[:] = 0.0
+
+    def value(self, config: ChannelConfig) -> float:
+        """:return: 按 config.fusion 归约后的数值 (0-1)"""
+        count = len(self.index)
+        if count == 0:
+            return 0
+        if config is not self._config:
+            self._configure(config)
+        values = self.values[:count]
+        if config.fusion == 'sum':
+            return min(1.0, float(values @ self.weights[:count]))
+        if config.fusion == 'priority':
+            ranks = np.where(values > 0, self.ranks[:count], np.inf)
+            slot = int(ranks.argmin())
+            return float(values[slot]) if ranks[slot] != np.inf else 0
+        return float(values.max())
+
+    def _add(self, address: str) -> int:
+        slot = len(self.index)
+        if slot == len(self.values):
+            self.values = np.concatenate((self.values, np.zeros(slot)))
+            self.weights = np.concatenate((self.weights, np.ones(slot)))
+            self.ranks = np.concatenate((self.ranks, np.zeros(slot)))
+        self.index[address] = slot
+        # 新地址的权重与优先级在下一次归约时计算
+        self._config = None
+        return slot
+
+    def _configure(self, config: ChannelConfig):
+        for address, slot in self.index.items():
+            self.weights[slot] = next(
+                (weight for pattern, weight in config.fusion_weights if _pattern(pattern).fullmatch(address)), 1.0,
+            )
+            self.ranks[slot] = next(
+                (rank for rank, pattern in enumerate(config.avatar_params) if _pattern(pattern).fullmatch(address)),
+                len(config.avatar_params),
+            )
+        self._config = config
@@ -3,6 +3,9 @@ from ..connector.machine_tuya_cloud import TuYaConnection
 import asyncio, time, math
 from loguru import logger
 
+import srv
+from ..logs import LogThrottle
+
 class TuyaHandler(BaseHandler):
     def __init__(self, SETTINGS: dict, DEV_CONN: TuYaConnection) -> None:
         self.SETTINGS = SETTINGS
@@ -19,36 +22,34 @@ class TuyaHandler(BaseHandler):
         
         self.distance_update_time_window = 0.2
         self.distance_current_strength = 0
+        # 每个节拍的档位日志限流
+        self._tick_log = LogThrottle()
+        # 有新输入 (或被清除) 时置位，唤醒档位发送循环
+        self.input_event = asyncio.Event()
 
-        self.to_clear_time    = 0
+        self.clear_key        = ('tuya', 'level')
         self.is_cleared       = True
     
     def start_background_jobs(self):
         # logger.info(f"Channel: {self.channel}, background job started.")
-        asyncio.ensure_future(self.clear_check())
+        self.DEV_CONN.start()
         if self.mode == 'level':
             asyncio.ensure_future(self.distance_background_wave_feeder())
 
 
-    async def clear_check(self):
-        # logger.info(f'Channel {self.channel} started clear check.')
-        sleep_time = 0.05
-        while 1:
-            await asyncio.sleep(sleep_time)
-            current_time = time.time()
-            # logger.debug(f"{str(self.is_cleared)}, {current_time}, {self.to_clear_time}")
-            if not self.is_cleared and current_time > self.to_clear_time:
-                self.is_cleared = True
-                self.level_current = 1
-                await self.DEV_CONN.set_level(1)
-                logger.info(f'Machine set to level 1 cleared after timeout.')
+    async def clear_timeout(self):
+        """截止时间到期回调，由 srv.DEADLINES 调度"""
+        self.is_cleared = True
+        self.level_current = 1
+        await self.DEV_CONN.set_level(1)
+        logger.info(f'Machine set to level 1 cleared after timeout.')
 
-    async def set_clear_after(self, val):
+    def set_clear_after(self, val):
         self.is_cleared = False
-        self.to_clear_time = time.time() + val
+        srv.DEADLINES.set(self.clear_key, val, self.clear_timeout)
 
-    async def handler_level(self, distance):
-        await self.set_clear_after(5)
+    def handler_level(self, distance):
+        self.set_clear_after(5)
         strength = 0
         trigger_bottom = self.mode_config['trigger_range']['bottom']
         trigger_top = self.mode_config['trigger_range']['top']
@@ -60,22 +61,30 @@ class TuyaHandler(BaseHandler):
                 )
             strength = 1 if strength > 1 else strength
         self.distance_current_strength = strength
+        self.input_event.set()
 
     async def distance_background_wave_feeder(self):
-        tick_time_window = self.distance_update_time_window / 20
+        loop = asyncio.get_running_loop()
         next_tick_time   = 0
         last_level    = 0
         while 1:
-            current_time = time.time()
+            # 没有新输入时挂起，不再轮询
+            await self.input_event.wait()
+            current_time = loop.time()
             if current_time < next_tick_time:
-                await asyncio.sleep(tick_time_window)
-                continue
-            next_tick_time = current_time + self.distance_update_time_window
+                await asyncio.sleep(next_tick_time - current_time)
+                next_tick_time += self.distance_update_time_window
+            else:
+                next_tick_time = current_time + self.distance_update_time_window
+            self.input_event.clear()
             current_strength = self.distance_current_strength
             current_level = math.ceil(self.mode_config['level_max'] * current_strength)
             if last_level == current_level:
                 continue
-            logger.success(f'Machine Tuya, strength {current_strength:.3f}, Setting level {current_level}')
+            if self._tick_log.ready():
+                logger.success(
+                    'Machine Tuya, strength {:.3f}, Setting level {} (省略 {} 条)',
+                    current_strength, current_level, self._tick_log.take(),
+                )
             last_level = current_level
             await self.DEV_CONN.set_level(current_level)
-    
\ No newline at end of file
@@ -1,8 +1,12 @@
-import numpy as np
-import collections
 from .base_handler import BaseHandler
+from .derivative import StreamingDerivative
+from .fusion import ParamFusion
 from loguru import logger
-import time, asyncio, math, json
+import time, asyncio
+
+from ..config import ChannelConfig
+from ..logs import LogThrottle
+from ..wave import IntensityFrame, WavePattern
 
 from ..connector.ycy_ble import YCYBLEConnector
 import srv  # For dynamic wave access
@@ -14,9 +18,9 @@ class ShockHandler(BaseHandler):
         self.channel = channel_name.upper()
         self.channel_key = f'channel_{channel_name.lower()}'
         self.shock_settings = SETTINGS['dglab3'][self.channel_key]
-        self.mode_config    = self.shock_settings['mode_config']
 
-        self.shock_mode = self.shock_settings['mode']
+        # 模式决定处理函数，修改后需要重启；其余参数每次从 srv.CHANNEL_CONFIG 快照读取
+        self.shock_mode = self.config.mode
         # 初始强度上限 (运行时通过 property 动态读取)
         logger.info(f"[ShockHandler] Channel {self.channel} initialized with strength_limit = {self.strength_limit}")
 
@@ -29,27 +33,40 @@ class ShockHandler(BaseHandler):
         else:
             raise ValueError(f"Not supported mode: {self.shock_mode}")
 
-        self.bg_wave_update_time_window = 0.1
         self.bg_wave_current_strength = 0
-
-        self.touch_dist_arr = collections.deque(maxlen=20)
-
-        self.to_clear_time    = 0
+        # 有新输入 (或被清除) 时置位，唤醒波形发送循环
+        self.input_event = asyncio.Event()
+        # 本轮首个新输入的时间 (perf_counter)，用于 input_to_tick 指标
+        self.input_at = 0.0
+        self._update_time = srv.METRICS.stage('handler_update')
+        self._tick_delay = srv.METRICS.stage('input_to_tick')
+
+        # distance 模式下各参数地址的数值，每个节拍合并一次
+        self.fusion = ParamFusion(max(1, len(self.config.avatar_params)))
+        self.touch_derivative = StreamingDerivative()
+        # 每个节拍的强度日志限流
+        self._tick_log = LogThrottle()
+
+        self.clear_key        = ('shock', self.channel)
         self.is_cleared       = True
 
+    @property
+    def config(self) -> ChannelConfig:
+        """当前配置快照 (配置修改或热加载时整体替换，同一次处理内应只读取一次)"""
+        return srv.CHANNEL_CONFIG[self.channel]
+
     @property
     def strength_limit(self) -> int:
         """动态读取强度上限，支持运行时修改"""
-        return self.SETTINGS['dglab3'][self.channel_key].get('strength_limit', 200)
+        return srv.CHANNEL_CONFIG[self.channel].strength_limit
 
     @property
-    def current_wave(self) -> str:
+    def current_wave(self) -> WavePattern:
         """动态读取当前波形，支持运行时修改"""
         return srv.DEFAULT_WAVE
 
     def start_background_jobs(self):
         # logger.info(f"Channel: {self.channel}, background job started.")
-        asyncio.ensure_future(self.clear_check())
         # if self.shock_mode == 'shock':
         #     asyncio.ensure_future(self.feed_wave())
         if self.shock_mode == 'distance':
@@ -58,24 +75,31 @@ class ShockHandler(BaseHandler):
             asyncio.ensure_future(self.touch_background_wave_feeder())
 
     def osc_handler(self, address, *args):
-        logger.debug(f"VRCOSC: CHANN {self.channel}: {address}: {args}")
+        logger.debug("VRCOSC: CHANN {}: {}: {}", self.channel, address, args)
+        start = time.perf_counter()
         val = self.param_sanitizer(args)
-        asyncio.ensure_future(self._handler(val))
-        # 不返回 Task，避免 pythonosc 解析错误
-
-    async def clear_check(self):
-        # logger.info(f'Channel {self.channel} started clear check.')
-        sleep_time = 0.05
-        while 1:
-            await asyncio.sleep(sleep_time)
-            current_time = time.time()
-            # logger.debug(f"{str(self.is_cleared)}, {current_time}, {self.to_clear_time}")
-            if not self.is_cleared and current_time > self.to_clear_time:
-                self.is_cleared = True
-                self.bg_wave_current_strength = 0
-                self.touch_dist_arr.clear()
-                await YCYBLEConnector.broadcast_clear_wave(self.channel)
-                logger.info(f'Channel {self.channel}, wave cleared after timeout.')
+        # 处理器只更新通道状态，直接在数据报回调中同步执行，不创建 Task
+        self._handler(val, address)
+        self._update_time.observe(time.perf_counter() - start)
+
+    def signal_input(self):
+        """通知波形发送循环有新输入"""
+        if not self.input_event.is_set():
+            self.input_at = time.perf_counter()
+            self.input_event.set()
+
+    async def clear_timeout(self):
+        """截止时间到期回调，由 srv.DEADLINES 调度"""
+        self.is_cleared = True
+        self.bg_wave_current_strength = 0
+        self.fusion.reset()
+        self.touch_derivative.reset()
+        self.signal_input()
+        srv.WAVE_SEQUENCERS[self.channel].stop()
+        await YCYBLEConnector.broadcast_clear_wave(self.channel)
+        # 清除波形队列不会改变设备强度，停止播放后需显式归零
+        await YCYBLEConnector.broadcast_strength(self.channel, 0)
+        logger.info(f'Channel {self.channel}, wave cleared after timeout.')
     
     async def feed_wave(self):
         raise NotImplemented
@@ -85,129 +109,92 @@ class ShockHandler(BaseHandler):
             await asyncio.sleep(sleep_time)
             await YCYBLEConnector.broadcast_wave(channel=self.channel, wavestr=self.shock_settings['shock_wave'])
 
-    async def set_clear_after(self, val):
+    def set_clear_after(self, val):
         self.is_cleared = False
-        self.to_clear_time = time.time() + val
-
-    @staticmethod
-    def generate_wave_100ms(freq, from_, to_):
-        assert 0 <= from_ <= 1, "Invalid wave generate."
-        assert 0 <= to_   <= 1, "Invalid wave generate."
-        from_ = int(100*from_)
-        to_   = int(100*to_)
-        ret = ["{:02X}".format(freq)]*4
-        delta = (to_ - from_) // 4
-        ret += ["{:02X}".format(min(max(from_ + delta*i, 0),100)) for i in range(1,5,1)]
-        ret = ''.join(ret)
-        return json.dumps([ret],separators=(',', ':'))
-    
-    def normalize_distance(self, distance):
-        out_distance = 0
-        trigger_bottom = self.mode_config['trigger_range']['bottom']
-        trigger_top = self.mode_config['trigger_range']['top']
-        if distance > self.mode_config['trigger_range']['bottom']:
-            out_distance = (
-                    distance - trigger_bottom
-                ) / (
-                    trigger_top - trigger_bottom
-                )
-            out_distance = 1 if out_distance > 1 else out_distance
-        return out_distance
-
-    async def handler_distance(self, distance):
-        await self.set_clear_after(0.5)
-        self.bg_wave_current_strength = self.normalize_distance(distance)
+        srv.DEADLINES.set(self.clear_key, val, self.clear_timeout)
 
-    async def distance_background_wave_feeder(self):
-        tick_time_window = self.bg_wave_update_time_window / 20
-        next_tick_time   = 0
-        last_strength    = 0
+    def normalize_distance(self, distance):
+        config = srv.CHANNEL_CONFIG[self.channel]
+        if distance <= config.trigger_bottom:
+            return 0
+        out_distance = (distance - config.trigger_bottom) * config.trigger_scale
+        return 1 if out_distance > 1 else out_distance
+
+    def handler_distance(self, distance, address=''):
+        self.set_clear_after(0.5)
+        self.fusion.update(address, self.normalize_distance(distance))
+        self.signal_input()
+
+    def distance_strength(self):
+        self.bg_wave_current_strength = self.fusion.value(srv.CHANNEL_CONFIG[self.channel])
+        return self.bg_wave_current_strength
+
+    async def background_wave_feeder(self, compute_strength):
+        """
+        事件驱动的波形发送循环
+
+        没有新输入时挂起在 input_event 上，不产生任何唤醒；
+        输入持续变化时按当前模式 tick_hz 的节拍发送，
+        节拍时间在单调时钟上累加，补偿 sleep 的漂移。
+        """
+        loop = asyncio.get_running_loop()
+        next_tick_time = 0
+        last_strength  = 0
         while 1:
-            current_time = time.time()
+            await self.input_event.wait()
+            config = srv.CHANNEL_CONFIG[self.channel]
+            tick_interval = config.tick_interval
+            current_time = loop.time()
             if current_time < next_tick_time:
-                await asyncio.sleep(tick_time_window)
-                continue
-            next_tick_time = current_time + self.bg_wave_update_time_window
-            current_strength = self.bg_wave_current_strength
-            if current_strength == last_strength == 0:
+                await asyncio.sleep(next_tick_time - current_time)
+                next_tick_time += tick_interval
+            else:
+                # 空闲后的首个输入立即发送，并作为新的节拍起点
+                next_tick_time = current_time + tick_interval
+            # 等待期间到达的输入由本次节拍一并处理
+            self.input_event.clear()
+            self._tick_delay.observe(time.perf_counter() - self.input_at)
+            current_strength = compute_strength()
+            if current_strength == last_strength:
                 continue
-            wave = self.generate_wave_100ms(
-                self.mode_config['distance']['freq_ms'], 
-                last_strength, 
-                current_strength
-            )
-            logger.success(f'Channel {self.channel}, strength {last_strength:.3f} to {current_strength:.3f}, limit {self.strength_limit}')
+            frame = IntensityFrame(config.freq_ms, last_strength, current_strength)
+            if self._tick_log.ready():
+                logger.success(
+                    'Channel {}, strength {:.3f} to {:.3f}, limit {} (省略 {} 条)',
+                    self.channel, last_strength, current_strength, config.strength_limit, self._tick_log.take(),
+                )
             last_strength = current_strength
-            await YCYBLEConnector.broadcast_wave(self.channel, wavestr=wave, strength_limit=self.strength_limit)
-
-    async def send_shock_wave(self, shock_time):
-        """发送电击波形，使用动态波形设置"""
-        shockwave = self.current_wave  # 使用动态波形
-        shockwave_duration = (shockwave.count(',')+1) * 0.1
-        send_times = math.ceil(shock_time // shockwave_duration)
-        for _ in range(send_times):
-            await YCYBLEConnector.broadcast_wave(self.channel, wavestr=self.current_wave, strength_limit=self.strength_limit)
-            await asyncio.sleep(shockwave_duration)
-
-    async def handler_shock(self, distance):
-        current_time = time.time()
-        if distance > self.mode_config['trigger_range']['bottom'] and current_time > self.to_clear_time:
-            shock_duration = self.mode_config['shock']['duration']
-            await self.set_clear_after(shock_duration)
-            logger.success(f'Channel {self.channel}: Shocking for {shock_duration} s, wave: {self.current_wave[:30]}...')
-            asyncio.create_task(self.send_shock_wave(shock_duration))
-
-    async def handler_touch(self, distance):
-        await self.set_clear_after(0.5)
+            await YCYBLEConnector.broadcast_frame(self.channel, frame, strength_limit=config.strength_limit)
+
+    async def distance_background_wave_feeder(self):
+        await self.background_wave_feeder(self.distance_strength)
+
+    def handler_shock(self, distance, address=''):
+        config = srv.CHANNEL_CONFIG[self.channel]
+        if distance > config.trigger_bottom and not srv.DEADLINES.pending(self.clear_key):
+            self.set_clear_after(config.shock_duration)
+            logger.success(f'Channel {self.channel}: Shocking for {config.shock_duration} s, wave: {self.current_wave!r}')
+            # 按帧播放当前波形，到期由 clear_timeout 停止并清除
+            srv.WAVE_SEQUENCERS[self.channel].play(self.current_wave, config.strength_limit)
+
+    def handler_touch(self, distance, address=''):
+        self.set_clear_after(0.5)
         out_distance = self.normalize_distance(distance)
         if out_distance == 0:
             return
-        t = time.time()
-        self.touch_dist_arr.append([t,out_distance])
+        self.touch_derivative.append(time.perf_counter(), out_distance)
+        self.signal_input()
     
     def compute_derivative(self):
-        data = self.touch_dist_arr
-        if len(data) < 4:
-            # logger.warning('At least 4 samples are required to calculate acc and jerk.')
-            return 0, 0, 0, 0
-
-        time_ = np.array([point[0] for point in data])
-        distance = np.array([point[1] for point in data])
-
-        window_size = 3
-        distance = np.convolve(distance, np.ones(window_size) / window_size, mode='valid')
-        time_ = time_[:len(distance)]
+        """:return: (距离, 速度, 加速度, 加加速度)，由流式估计器增量维护"""
+        return self.touch_derivative.values()
 
-        velocity = np.gradient(distance, time_)
-        acceleration = np.gradient(velocity, time_)
-        jerk = np.gradient(acceleration, time_)
-        # logger.success(f"{distance[-1]:9.4f} {velocity[-1]:9.4f} {acceleration[-1]:9.4f} {jerk[-1]:9.4f}")
-        return distance[-1], velocity[-1], acceleration[-1], jerk[-1]
+    def touch_strength(self):
+        config = srv.CHANNEL_CONFIG[self.channel]
+        value = abs(self.compute_derivative()[config.n_derivative])
+        value = min(max(value, config.deriv_bottom), config.deriv_top)
+        self.bg_wave_current_strength = (value - config.deriv_bottom) * config.deriv_scale
+        return self.bg_wave_current_strength
 
     async def touch_background_wave_feeder(self):
-        tick_time_window = self.bg_wave_update_time_window / 20
-        next_tick_time   = 0
-        last_strength    = 0
-        while 1:
-            current_time = time.time()
-            if current_time < next_tick_time:
-                await asyncio.sleep(tick_time_window)
-                continue
-            next_tick_time = current_time + self.bg_wave_update_time_window
-            n_derivative = self.mode_config['touch']['n_derivative']
-            current_strength = self.compute_derivative()[n_derivative]
-            derivative_params = self.mode_config['touch']['derivative_params'][n_derivative]
-            current_strength = max(min(derivative_params['bottom'],abs(current_strength)),derivative_params['top'])/(derivative_params['top']-derivative_params['bottom'])
-
-            self.bg_wave_current_strength = current_strength
-            if current_strength == last_strength == 0:
-                continue
-            wave = self.generate_wave_100ms(
-                self.mode_config['touch']['freq_ms'], 
-                last_strength, 
-                current_strength
-            )
-            logger.success(f'Channel {self.channel}, strength {last_strength:.3f} to {current_strength:.3f}, limit {self.strength_limit}')
-            last_strength = current_strength
-            await YCYBLEConnector.broadcast_wave(self.channel, wavestr=wave, strength_limit=self.strength_limit)
-
+        await self.background_wave_feeder(self.touch_strength)
@@ -0,0 +1,204 @@
+"""
+事件循环内的 HTTP 服务器
+
+在 OSC / BLE 所在的 asyncio 事件循环上直接处理 Flask 路由：
+异步视图在本循环中 await，不再经过 Flask 为每个请求新建事件循环的线程转接，
+视图中调用的 YCYBLEConnector / channel_manager 与其所属循环一致。
+
+只实现 HTTP/1.1 的必要子集 (Content-Length 请求体、keep-alive)，供本地面板与 VRChat 世界脚本使用。
+响应体为异步迭代器时 (如 SSE) 按块流式发送，发送完毕后关闭连接。
+"""
+import asyncio
+import inspect
+import io
+import sys
+from typing import Optional
+from urllib.parse import unquote
+
+from flask import Flask, request
+from loguru import logger
+from werkzeug.http import HTTP_STATUS_CODES
+
+
+class LoopHTTPServer:
+    """
+    在当前事件循环中运行 Flask 应用的最小 HTTP 服务器
+
+    :param app: Flask 应用
+    :param host: 监听地址
+    :param port: 监听端口
+    """
+
+    KEEP_ALIVE_TIMEOUT = 15.0
+    MAX_BODY_SIZE = 1 << 20
+
+    def __init__(self, app: Flask, host: str, port: int):
+        self.app = app
+        self.host = host
+        self.port = int(port)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve_client, self.host, self.port)
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername') or ('', 0)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    return
+                environ = self._build_environ(head, peer)
+                if environ is None:
+                    await self._write_simple(writer, 400)
+                    return
+                try:
+                    length = int(environ.get('CONTENT_LENGTH') or 0)
+                except ValueError:
+                    await self._write_simple(writer, 400)
+                    return
+                if length > self.MAX_BODY_SIZE:
+                    await self._write_simple(writer, 413)
+                    return
+                body = await reader.readexactly(length) if length else b''
+                environ['wsgi.input'] = io.BytesIO(body)
+
+                keep_alive = self._keep_alive(environ)
+                response = await self._dispatch(environ)
+                if hasattr(response.response, '__aiter__'):
+                    await self._write_stream(reader, writer, environ, response)
+                    return
+                await self._write_response(writer, environ, response, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"[HTTP] 处理请求异常: {e}")
+        finally:
+            writer.close()
+
+    def _build_environ(self, head: bytes, peer) -> Optional[dict]:
+        try:
+            lines = head.decode('latin-1').split('\r\n')
+            method, target, protocol = lines[0].split(' ', 2)
+        except ValueError:
+            return None
+        path, _, query = target.partition('?')
+        environ = {
+            'REQUEST_METHOD': method.upper(),
+            'SCRIPT_NAME': '',
+            # WSGI 约定：PATH_INFO 为解码后按 latin-1 表示的字节串
+            'PATH_INFO': unquote(path, encoding='latin-1'),
+            'QUERY_STRING': query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': str(self.port),
+            'SERVER_PROTOCOL': protocol,
+            'REMOTE_ADDR': peer[0],
+            'REMOTE_PORT': str(peer[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(':')
+            key = name.strip().upper().replace('-', '_')
+            value = value.strip()
+            if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[key] = value
+            else:
+                key = 'HTTP_' + key
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    @staticmethod
+    def _keep_alive(environ: dict) -> bool:
+        connection = environ.get('HTTP_CONNECTION', '').lower()
+        if environ['SERVER_PROTOCOL'] == 'HTTP/1.1':
+            return connection != 'close'
+        return connection == 'keep-alive'
+
+    async def _dispatch(self, environ: dict):
+        """与 Flask.full_dispatch_request 相同的流程，异步视图在当前循环中直接 await"""
+        app = self.app
+        with app.request_context(environ):
+            try:
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        if request.routing_exception is not None:
+                            app.raise_routing_exception(request)
+                        rule = request.url_rule
+                        if getattr(rule, 'provide_automatic_options', False) and request.method == 'OPTIONS':
+                            rv = app.make_default_options_response()
+                        else:
+                            rv = app.view_functions[rule.endpoint](**request.view_args)
+                            if inspect.isawaitable(rv):
+                                rv = await rv
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                return app.finalize_request(rv)
+            except Exception as e:
+                return app.finalize_request(app.handle_exception(e), from_error_handler=True)
+
+    async def _write_response(self, writer: asyncio.StreamWriter, environ: dict, response, keep_alive: bool):
+        body = b''.join(response.iter_encoded())
+        headers = [(k, v) for k, v in response.headers.to_wsgi_list() if k.lower() not in ('content-length', 'connection')]
+        headers.append(('Content-Length', str(len(body))))
+        headers.append(('Connection', 'keep-alive' if keep_alive else 'close'))
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            body = b''
+        writer.write(self._encode_head(response, headers) + body)
+        await writer.drain()
+        logger.debug("[HTTP] {} {} {}", environ['REQUEST_METHOD'], environ['PATH_INFO'], response.status_code)
+
+    @staticmethod
+    def _encode_head(response, headers) -> bytes:
+        head = f"HTTP/1.1 {response.status}\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in headers) + "\r\n"
+        return head.encode('latin-1')
+
+    async def _write_stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, environ: dict, response):
+        body = response.response
+        headers = [(k, v) for k, v in response.headers.to_wsgi_list() if k.lower() not in ('content-length', 'connection')]
+        headers.append(('Connection', 'close'))
+        logger.debug("[HTTP] {} {} {} (stream)", environ['REQUEST_METHOD'], environ['PATH_INFO'], response.status_code)
+
+        async def pump():
+            async for chunk in body:
+                writer.write(chunk)
+                await writer.drain()
+
+        try:
+            writer.write(self._encode_head(response, headers))
+            await writer.drain()
+            if environ['REQUEST_METHOD'] == 'HEAD':
+                return
+            # 客户端断开时 read() 返回，立即结束推送而不是等到下一次写入失败
+            pump_task = asyncio.ensure_future(pump())
+            eof_task = asyncio.ensure_future(reader.read())
+            try:
+                await asyncio.wait((pump_task, eof_task), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in (pump_task, eof_task):
+                    task.cancel()
+                await asyncio.gather(pump_task, eof_task, return_exceptions=True)
+        finally:
+            await body.aclose()
+
+    @staticmethod
+    async def _write_simple(writer: asyncio.StreamWriter, status: int):
+        reason = HTTP_STATUS_CODES.get(status, '')
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode('latin-1'))
+        await writer.drain()
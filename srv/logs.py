@@ -0,0 +1,79 @@
+"""
+日志配置
+
+热路径上的日志按以下约定书写：
+- 使用 loguru 的 "{}" 参数 (logger.debug("... {}", value)) 而不是 f-string，格式化推迟到通过级别过滤之后；
+  sink 的级别取各子系统级别中最低的一个，低于它的调用在 loguru 内部直接返回，不创建日志记录；
+- 每个节拍都会产生的日志经 LogThrottle 限流，间隔内的其余消息只计数；
+- 默认 enqueue=True，由 loguru 的后台线程写控制台，事件循环只把记录放入队列。
+"""
+import sys
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+
+# LogThrottle 未指定间隔时使用 (log.tick_interval)
+_tick_interval = 1.0
+
+
+def _level_no(level) -> Optional[int]:
+    if level is False:
+        return None
+    if isinstance(level, int):
+        return level
+    return logger.level(str(level).upper()).no
+
+
+def setup(settings: dict, sink=sys.stderr) -> int:
+    """
+    按 SETTINGS 重新配置日志输出 (启动与配置热加载时调用)
+
+    :param settings: SETTINGS，读取 log_level 与 log 段
+    :return: sink 的 handler id
+    """
+    global _tick_interval
+    log_config = settings.get('log') or {}
+    levels: Dict[str, object] = {'': str(settings.get('log_level', 'INFO')).upper()}
+    for name, level in (log_config.get('levels') or {}).items():
+        levels[name] = level if level is False or isinstance(level, int) else str(level).upper()
+    # 校验级别名，无效时抛出 ValueError，不改动当前输出
+    numbers = [no for no in map(_level_no, levels.values()) if no is not None]
+
+    _tick_interval = float(log_config.get('tick_interval', 1.0))
+    logger.remove()
+    return logger.add(
+        sink,
+        level=min(numbers, default=logger.level('CRITICAL').no),
+        filter=levels,
+        enqueue=bool(log_config.get('enqueue', True)),
+    )
+
+
+class LogThrottle:
+    """
+    限制同一条日志的输出频率
+
+    ready() 距上次输出不足 interval 秒时返回 False 并计数；
+    输出时用 take() 取得上次输出以来被跳过的条数。
+
+    :param interval: 最小输出间隔 (秒)，默认使用 log.tick_interval，0 为不限流
+    """
+    __slots__ = ('interval', 'suppressed', '_next')
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval
+        self.suppressed = 0
+        self._next = 0.0
+
+    def ready(self) -> bool:
+        now = time.monotonic()
+        if now < self._next:
+            self.suppressed += 1
+            return False
+        self._next = now + (_tick_interval if self.interval is None else self.interval)
+        return True
+
+    def take(self) -> int:
+        suppressed, self.suppressed = self.suppressed, 0
+        return suppressed
@@ -0,0 +1,207 @@
+"""
+运行指标
+
+热路径上只做一次 bisect 与两次加法 (固定分桶直方图)，可以在正式运行时常开。
+计数类指标 (各通道写入、丢弃、排队) 不在热路径上维护，而是在导出时由 collector 从
+BLEWriteScheduler.stats 等现有状态读取。
+
+导出格式：Prometheus 文本格式 (render_prometheus) 与 JSON (to_dict)。
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+PREFIX = 'shocking_vrchat'
+
+# 秒：覆盖 10µs (单次数据报处理) 到数秒 (BLE 超时)
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+# 各阶段说明 (JSON 导出中使用)
+STAGES = {
+    'osc_dispatch': 'OSC 数据报解析、路由并执行处理器',
+    'handler_update': '通道处理器更新状态',
+    'input_to_tick': '首个新输入到波形发送节拍执行',
+    'ble_queue_wait': '强度提交到调度器发出 BLE 写入',
+    'ble_write': 'BLE 写入发出到完成',
+    'wave_step': '波形子步实际执行时间与计划时间之差',
+    'ble_recovery': 'BLE 断开到重连成功并恢复输出',
+}
+
+# 秒：重连耗时从不到 1 秒到数分钟
+RECOVERY_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# 不使用 DEFAULT_BUCKETS 的阶段
+STAGE_BUCKETS = {
+    'ble_recovery': RECOVERY_BUCKETS,
+}
+
+# (指标名, 类型, 说明, [(标签, 值)])
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class Histogram:
+    """固定分桶的直方图 (非线程安全，只在事件循环线程中 observe)"""
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        # 最后一个桶为 +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def clear(self):
+        """原地清零 (调用方缓存的引用继续有效)"""
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def quantile(self, q: float) -> float:
+        """按桶内线性插值估计分位数，无样本时返回 0"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                upper = self.bounds[i]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            if i < len(self.bounds):
+                lower = self.bounds[i]
+        return self.bounds[-1]
+
+
+# 启动阶段说明 (按通常发生的顺序)
+MILESTONES = {
+    'http_listening': 'HTTP API 开始监听',
+    'osc_listening': 'OSC 开始监听',
+    'first_osc_packet': '收到第一个 OSC 数据报',
+    'ble_connected': '首次有 BLE 设备连接成功',
+}
+
+
+class Milestones:
+    """
+    启动阶段耗时
+
+    各阶段只记录第一次发生的时间，值为距 origin (程序开始加载) 的秒数。
+    """
+
+    def __init__(self, origin: Optional[float] = None):
+        self.origin = time.perf_counter() if origin is None else origin
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str, at: Optional[float] = None) -> float:
+        """记录阶段 name 在 at (perf_counter，默认现在) 发生，已记录过时返回原值"""
+        if name not in self.marks:
+            elapsed = self.marks[name] = (time.perf_counter() if at is None else at) - self.origin
+            logger.info(f"[Startup] {MILESTONES.get(name, name)}: 启动后 {elapsed * 1000:.0f} ms")
+        return self.marks[name]
+
+    def collect(self):
+        """导出各阶段耗时，供 Metrics.add_collector 使用"""
+        return [(
+            'startup_seconds', 'gauge', 'Seconds from program start to each startup milestone',
+            [({'phase': name}, value) for name, value in self.marks.items()],
+        )]
+
+
+class Metrics:
+    """
+    指标注册表
+
+    stage(name) 返回对应阶段的直方图，调用方可以缓存返回值以省去字典查询。
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Histogram] = {name: _histogram(name) for name in STAGES}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def stage(self, name: str) -> Histogram:
+        hist = self.stages.get(name)
+        if hist is None:
+            hist = self.stages[name] = _histogram(name)
+        return hist
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """注册导出时调用的采集函数，返回 (指标名, 类型, 说明, 样本列表)"""
+        self._collectors.append(collector)
+
+    def reset(self):
+        """清零各阶段直方图，stage() 返回过的对象保持不变"""
+        for hist in self.stages.values():
+            hist.clear()
+
+    def _collect(self) -> List[Sample]:
+        samples: List[Sample] = []
+        for collector in self._collectors:
+            samples.extend(collector())
+        return samples
+
+    def to_dict(self) -> dict:
+        stages = {}
+        for name, hist in self.stages.items():
+            stages[name] = {
+                'description': STAGES.get(name, ''),
+                'count': hist.count,
+                'sum': hist.sum,
+                'mean': hist.sum / hist.count if hist.count else 0.0,
+                'p50': hist.quantile(0.5),
+                'p99': hist.quantile(0.99),
+                'buckets': {
+                    **{str(bound): n for bound, n in zip(hist.bounds, _cumulative(hist.counts))},
+                    '+Inf': hist.count,
+                },
+            }
+        collected = {}
+        for name, _, _, values in self._collect():
+            collected[name] = [{'labels': labels, 'value': value} for labels, value in values]
+        return {'unit': 'seconds', 'stages': stages, 'counters': collected}
+
+    def render_prometheus(self) -> str:
+        lines = []
+        name = f'{PREFIX}_stage_seconds'
+        lines.append(f'# HELP {name} Pipeline stage latency: ' + ', '.join(STAGES))
+        lines.append(f'# TYPE {name} histogram')
+        for stage, hist in self.stages.items():
+            for bound, n in zip(hist.bounds, _cumulative(hist.counts)):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {n}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {hist.sum}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+        for metric, kind, help_text, values in self._collect():
+            metric = f'{PREFIX}_{metric}'
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for labels, value in values:
+                label_str = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f'{metric}{{{label_str}}} {value}' if label_str else f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram(stage: str) -> Histogram:
+    return Histogram(STAGE_BUCKETS.get(stage, DEFAULT_BUCKETS))
+
+
+def _cumulative(counts: List[int]) -> List[int]:
+    total = 0
+    out = []
+    for n in counts:
+        total += n
+        out.append(total)
+    return out
@@ -0,0 +1,194 @@
+"""
+OSC 状态输出
+
+把设备状态作为 avatar 参数发送给 VRChat (osc.output_param_prefix 下)：
+    Connected        bool   是否有设备已连接
+    StrengthA / B    float  逻辑通道当前强度 / 200 (多台设备取最大值)
+    ActiveA / B      bool   逻辑通道是否有输出
+    Battery          float  电量 / 100 (多台设备取最低值，尚未读到时不发送)
+    ElectrodeA / B   bool   逻辑通道对应的电极是否已接触 (尚未读到时不发送)
+
+强度写入、连接变化与遥测刷新时由调用方 notify()，发送任务只发送变化的参数，
+两次发送至少间隔 min_interval 秒 (期间的变化合并)，每 keyframe_interval 秒发送一次全部参数，
+使之后加载的 avatar 也能同步。同一次发送的参数打包为一个 OSC bundle，
+经 asyncio 数据报传输发出，不阻塞事件循环。
+"""
+import asyncio
+from typing import Callable, Dict, Optional, Union
+
+from loguru import logger
+from pythonosc.osc_bundle_builder import IMMEDIATELY, OscBundleBuilder
+from pythonosc.osc_message_builder import OscMessageBuilder
+
+Value = Union[bool, int, float]
+
+STAT_KEYS = (
+    'bundles',    # 发出的 bundle
+    'messages',   # bundle 中的参数消息
+    'keyframes',  # 发送全部参数的 bundle (同时计入 bundles)
+    'errors',     # 发送失败
+)
+
+
+def device_parameters(devices) -> Dict[str, Value]:
+    """
+    由设备注册表的本地状态组装输出参数 (不访问设备)
+
+    :param devices: DeviceRegistry，None 时只输出 Connected
+    """
+    connected = devices.connected_devices() if devices else []
+    params: Dict[str, Value] = {'Connected': bool(connected)}
+    strength = {'A': 0, 'B': 0}
+    electrode: Dict[str, bool] = {}
+    battery = None
+    for device in connected:
+        data = device.strength_data
+        telemetry = device.telemetry()
+        # 尚未读到的电量为 -1，电极状态为 'unknown'
+        if telemetry['battery'] >= 0:
+            battery = telemetry['battery'] if battery is None else min(battery, telemetry['battery'])
+        for logical, physical in device.channel_map.items():
+            if data is not None:
+                strength[logical] = max(strength[logical], data.a if physical == 'A' else data.b)
+            status = telemetry[f'electrode_{physical.lower()}']
+            if status != 'unknown':
+                electrode[logical] = electrode.get(logical, False) or status.startswith('connected')
+    for channel in ('A', 'B'):
+        params[f'Strength{channel}'] = round(strength[channel] / 200, 3)
+        params[f'Active{channel}'] = strength[channel] > 0
+        if channel in electrode:
+            params[f'Electrode{channel}'] = electrode[channel]
+    if battery is not None:
+        params['Battery'] = round(battery / 100, 2)
+    return params
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, output: "OSCOutput"):
+        self._output = output
+
+    def error_received(self, exc):
+        # 对端端口未监听时 (VRChat 未运行) 部分平台会返回 ICMP 错误，不影响之后的发送
+        self._output.stats['errors'] += 1
+        logger.debug("OSC 输出错误: {!r}", exc)
+
+
+class OSCOutput:
+    """
+    变化驱动的 OSC 参数输出
+
+    :param host: 目标地址 (VRChat 的 OSC 输入)
+    :param port: 目标端口
+    :param prefix: 参数地址前缀，如 /avatar/parameters/ShockingVRChat
+    :param snapshot: 返回当前参数 {名称: 值} 的函数 (只读本地状态，不做 I/O)
+    :param min_interval: 两次发送之间的最小间隔 (秒)
+    :param keyframe_interval: 发送全部参数的间隔 (秒)，0 表示只在变化时发送
+    """
+
+    def __init__(
+            self,
+            host: str,
+            port: int,
+            prefix: str,
+            snapshot: Callable[[], Dict[str, Value]],
+            min_interval: float = 0.1,
+            keyframe_interval: float = 5.0,
+        ):
+        self.host = host
+        self.port = port
+        self.prefix = prefix.rstrip('/')
+        self._snapshot = snapshot
+        self.min_interval = min_interval
+        self.keyframe_interval = keyframe_interval
+        self.stats: Dict[str, int] = dict.fromkeys(STAT_KEYS, 0)
+        # 最近一次发出的参数值
+        self._sent: Dict[str, Value] = {}
+        self._dirty = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """创建数据报传输并启动发送任务 (立即发送一次全部参数)"""
+        self._loop = asyncio.get_running_loop()
+        self._transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _Protocol(self), remote_addr=(self.host, self.port),
+        )
+        self._task = self._loop.create_task(self._run())
+        self._dirty.set()
+
+    def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._transport:
+            self._transport.close()
+            self._transport = None
+
+    def notify(self, *_):
+        """状态可能已变化，请求发送任务检查 (可从任意线程调用)"""
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dirty.set()
+        else:
+            loop.call_soon_threadsafe(self._dirty.set)
+
+    def collect(self):
+        """导出发送计数，供 srv.METRICS.add_collector 使用"""
+        return [(
+            'osc_output_total', 'counter', 'OSC status output bundles and messages',
+            [({'kind': key}, self.stats[key]) for key in STAT_KEYS],
+        )]
+
+    async def _run(self):
+        loop = self._loop
+        next_keyframe = loop.time()
+        while True:
+            timeout = None if self.keyframe_interval <= 0 else max(0.0, next_keyframe - loop.time())
+            try:
+                await asyncio.wait_for(self._dirty.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._dirty.clear()
+            keyframe = self.keyframe_interval > 0 and loop.time() >= next_keyframe
+            try:
+                params = self._snapshot()
+            except Exception as e:
+                logger.error(f"[OSC] 生成输出参数失败: {e}")
+                params = {}
+            if keyframe:
+                next_keyframe = loop.time() + self.keyframe_interval
+                changed = params
+            else:
+                changed = {name: value for name, value in params.items() if self._sent.get(name) != value}
+            if changed:
+                self._send(changed, keyframe)
+                await asyncio.sleep(self.min_interval)
+
+    def _send(self, params: Dict[str, Value], keyframe: bool):
+        builder = OscBundleBuilder(IMMEDIATELY)
+        for name, value in params.items():
+            message = OscMessageBuilder(address=f'{self.prefix}/{name}')
+            message.add_arg(value)
+            builder.add_content(message.build())
+        try:
+            self._transport.sendto(builder.build().dgram)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.debug("OSC 输出发送失败: {!r}", e)
+            return
+        if 'Connected' in params and self._sent.get('Connected') != params['Connected']:
+            logger.info(f"OSC 发送设备状态: Connected = {params['Connected']}")
+        self._sent.update(params)
+        self.stats['bundles'] += 1
+        self.stats['messages'] += len(params)
+        if keyframe:
+            self.stats['keyframes'] += 1
+        else:
+            logger.debug("OSC 输出: {}", params)
@@ -0,0 +1,161 @@
+"""
+OSC 会话录制与回放
+
+文件格式 (小端)：
+    文件头  8 字节 magic b'SVRCOSC1' + 8 字节录制开始时的 Unix 时间 (float64)
+    记录    8 字节单调时钟时间戳 (uint64, 纳秒) + 4 字节长度 (uint32) + 原始数据报
+
+只追加写入，每次录制以一个文件头开始；同一文件中的多次录制在读取时首尾相接。
+录制在数据报回调中只把记录追加到内存缓冲区，
+由后台任务定期在线程池中写入文件，不在事件循环上做磁盘 I/O。
+回放通过 mmap 读取文件，把原始数据报直接交给 dispatcher，可按录制时的节奏或尽可能快地执行。
+"""
+import asyncio
+import mmap
+import os
+import struct
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+MAGIC = b'SVRCOSC1'
+_FILE_HEADER = struct.Struct('<8sd')
+_RECORD_HEADER = struct.Struct('<QI')
+
+
+class SessionRecorder:
+    """
+    OSC 数据报录制器
+
+    :param path: 录制文件路径 (支持 strftime 格式，如 recordings/osc-%Y%m%d-%H%M%S.oscrec)
+    :param flush_interval: 缓冲区写入文件的间隔 (秒)
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = time.strftime(path)
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.bytes = 0
+        self._buffer: List[bytes] = []
+        self._file = None
+        self._task: Optional[asyncio.Task] = None
+        self._writing: Optional[asyncio.Future] = None  # 线程池中进行中的写入
+
+    def start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        # 各次录制的单调时钟起点不同，每次都写文件头以便读取时分段计算时间
+        self._file.write(_FILE_HEADER.pack(MAGIC, time.time()))
+        self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+        logger.success(f"OSC 会话录制: {self.path}")
+
+    def record(self, data: bytes):
+        """记录一个数据报 (热路径：只追加到内存缓冲区)"""
+        self._buffer.append(_RECORD_HEADER.pack(time.monotonic_ns(), len(data)))
+        self._buffer.append(data)
+        self.records += 1
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        # 上一次写入完成后再取缓冲区，之后到提交写入之间没有 await，取消不会丢失数据
+        await self._wait_write()
+        if not self._buffer or self._file is None:
+            return
+        chunk, self._buffer = b''.join(self._buffer), []
+        self.bytes += len(chunk)
+        self._writing = asyncio.get_running_loop().run_in_executor(None, self._write, chunk)
+        # 取消 flush 不会中断线程中的写入，close() 会等待其完成
+        await asyncio.shield(self._writing)
+
+    async def _wait_write(self):
+        if self._writing is not None:
+            await self._writing
+            self._writing = None
+
+    def _write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._file.flush()
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        await self._wait_write()
+        if self._file:
+            self._file.close()
+            self._file = None
+            logger.info(f"OSC 会话录制结束: {self.records} 个数据报, {self.bytes} 字节")
+
+
+def read_session(path: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    读取录制文件
+
+    :return: (相对第一个数据报的时间 (纳秒), 数据报) 迭代器；文件末尾不完整的记录会被忽略。
+        文件中追加的多次录制依次读取，后一次录制接在前一次的最后一个数据报之后
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < _FILE_HEADER.size:
+            raise ValueError(f"不是 OSC 录制文件: {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, _ = _FILE_HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"不是 OSC 录制文件: {path}")
+            offset = _FILE_HEADER.size
+            size = len(mm)
+            start = None
+            base = last = 0
+            while offset + _RECORD_HEADER.size <= size:
+                if mm[offset:offset + len(MAGIC)] == MAGIC:
+                    # 下一次录制的文件头 (时间戳不可能与 magic 相同)：重新确定时间起点
+                    offset += _FILE_HEADER.size
+                    if start is not None:
+                        base, start = last, None
+                    continue
+                timestamp, length = _RECORD_HEADER.unpack_from(mm, offset)
+                offset += _RECORD_HEADER.size
+                if offset + length > size:
+                    logger.warning(f"录制文件末尾记录不完整，已忽略: {path}")
+                    break
+                if start is None:
+                    start = timestamp
+                last = base + timestamp - start
+                yield last, mm[offset:offset + length]
+                offset += length
+
+
+def is_session_file(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+async def replay(path: str, dispatcher, speed: Optional[float] = 1.0, client_address=('replay', 0)) -> int:
+    """
+    把录制的数据报交给 dispatcher
+
+    :param path: 录制文件
+    :param dispatcher: pythonosc Dispatcher (或 CompiledDispatcher)
+    :param speed: 回放倍速；None 表示尽可能快 (每个数据报之间让出一次事件循环，结果与时间无关)
+    :return: 回放的数据报数量
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    count = 0
+    for offset_ns, data in read_session(path):
+        if speed:
+            delay = start + offset_ns / 1e9 / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+        dispatcher.call_handlers_for_packet(data, client_address)
+        count += 1
+    return count
@@ -0,0 +1,147 @@
+"""
+编译式 OSC 地址路由
+
+pythonosc 的 Dispatcher 对每条消息都会把地址编译成正则，再与全部已注册地址逐一匹配。
+VRChat 每秒发送数百个参数地址，其中绝大多数与本程序无关。
+这里把已注册地址预先分为两类：
+    - 精确地址：放入 dict
+    - 含 * 的通配地址：按通配符前的完整路径段挂到前缀树上，节点内保存编译好的正则
+查询结果 (包括未匹配的空结果) 按地址缓存在有界 LRU 中，未知地址再次到达时只需一次 dict 查询。
+"""
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from pythonosc.dispatcher import Dispatcher, Handler
+
+import srv
+
+# 传入地址本身含有这些字符时视为 OSC 地址模式，交回 pythonosc 原始逻辑处理
+_OSC_PATTERN_CHARS = frozenset('*?[]{}')
+
+
+class _TrieNode:
+    __slots__ = ('children', 'patterns')
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.patterns: List[Tuple[int, "re.Pattern", str]] = []
+
+
+class CompiledDispatcher(Dispatcher):
+    """
+    与 pythonosc Dispatcher 兼容的编译式路由
+
+    注册地址中的 * 匹配任意字符 (可跨越 /)，与原 Dispatcher 对通配地址的处理一致。
+    """
+
+    CACHE_SIZE = 4096
+
+    def __init__(self, cache_size: int = CACHE_SIZE, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[Handler, ...]]" = OrderedDict()
+        self._exact: Dict[str, int] = {}
+        self._trie = _TrieNode()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # 是否已收到过数据报 (第一个数据报记入 srv.STARTUP)
+        self.received_any = False
+        self._dispatch_time = srv.METRICS.stage('osc_dispatch')
+        # 可选的会话录制器 (srv.osc.recorder.SessionRecorder)
+        self.recorder = None
+
+    def map(self, address: str, handler, *args, needs_reply_address: bool = False) -> Handler:
+        handlerobj = super().map(address, handler, *args, needs_reply_address=needs_reply_address)
+        self._compile()
+        return handlerobj
+
+    def unmap(self, address, handler, *args, needs_reply_address=False):
+        super().unmap(address, handler, *args, needs_reply_address=needs_reply_address)
+        self._compile()
+
+    def _compile(self):
+        """根据 self._map 重建精确表与前缀树，并清空缓存"""
+        self._cache.clear()
+        self._exact = {}
+        self._trie = _TrieNode()
+        for order, address in enumerate(self._map):
+            if '*' not in address:
+                self._exact[address] = order
+                continue
+            literal = address[:address.index('*')]
+            node = self._trie
+            # 只有通配符之前的完整路径段进入前缀树，剩余部分交给正则
+            for segment in literal.split('/')[:-1]:
+                node = node.children.setdefault(segment, _TrieNode())
+            regex = re.compile('.*?'.join(re.escape(part) for part in address.split('*')))
+            node.patterns.append((order, regex, address))
+
+    def _match(self, address: str) -> Tuple[Handler, ...]:
+        matched = []
+        order = self._exact.get(address)
+        if order is not None:
+            matched.append((order, address))
+        node = self._trie
+        for segment in address.split('/'):
+            for order, regex, pattern in node.patterns:
+                if regex.fullmatch(address):
+                    matched.append((order, pattern))
+            node = node.children.get(segment)
+            if node is None:
+                break
+        else:
+            for order, regex, pattern in node.patterns:
+                if regex.fullmatch(address):
+                    matched.append((order, pattern))
+        matched.sort()
+        handlers = []
+        for _, pattern in matched:
+            handlers.extend(self._map[pattern])
+        if not handlers and self._default_handler:
+            handlers.append(self._default_handler)
+        return tuple(handlers)
+
+    def collect(self):
+        """导出路由缓存计数，供 srv.METRICS.add_collector 使用"""
+        return [
+            ('osc_route_cache_total', 'counter', 'OSC address lookups by route cache result', [
+                ({'result': 'hit'}, self.cache_hits),
+                ({'result': 'miss'}, self.cache_misses),
+            ]),
+        ]
+
+    def call_handlers_for_packet(self, data, client_address):
+        start = time.perf_counter()
+        if not self.received_any:
+            self.received_any = True
+            srv.STARTUP.mark('first_osc_packet', start)
+        if self.recorder is not None:
+            self.recorder.record(data)
+        try:
+            return super().call_handlers_for_packet(data, client_address)
+        finally:
+            self._dispatch_time.observe(time.perf_counter() - start)
+
+    def handlers_for_address(self, address_pattern: str):
+        """
+        返回匹配地址的处理器元组 (未匹配时为空元组)
+
+        :param address_pattern: 传入的 OSC 地址
+        """
+        cache = self._cache
+        handlers = cache.get(address_pattern)
+        if handlers is not None:
+            self.cache_hits += 1
+            cache.move_to_end(address_pattern)
+            return handlers
+        if not _OSC_PATTERN_CHARS.isdisjoint(address_pattern):
+            return tuple(super().handlers_for_address(address_pattern))
+
+        self.cache_misses += 1
+        handlers = self._match(address_pattern)
+        cache[address_pattern] = handlers
+        if len(cache) > self._cache_size:
+            cache.popitem(last=False)
+        return handlers
@@ -0,0 +1,155 @@
+"""
+多帧波形播放
+
+WavePattern 的每帧 100ms 分为 4 个 25ms 子步，WaveSequencer 按子步把强度提交到
+srv.BLE_DEVICES，循环播放直到 stop()。第 k 个子步的计划时间固定为 start + k * step，
+不累加 sleep 的误差；事件循环卡顿导致落后超过一个子步时，跳过已过期的子步而不是补发。
+每个子步实际执行时间与计划时间之差记录在 wave_step 指标中。
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from loguru import logger
+
+import srv
+from srv.wave import WavePattern, FRAME_SECONDS, SUB_STEPS
+
+SUB_STEP_SECONDS = FRAME_SECONDS / SUB_STEPS
+
+# 时钟分辨率较粗的平台 (Windows 约 15.6ms) 上，asyncio.sleep 可能晚醒一个时钟周期
+_CLOCK_RESOLUTION = time.get_clock_info('monotonic').resolution
+# 这类平台上每个子步最后一个时钟周期交给计时线程用 time.sleep 等待 (Python 3.11+ 在 Windows 上为高精度计时器)，
+# 事件循环在此期间照常处理其他任务
+_PRECISE_WAIT = _CLOCK_RESOLUTION > 0.001
+_TIMER = ThreadPoolExecutor(max_workers=2, thread_name_prefix='wave-timer')  # 每通道一个，线程在首次使用时创建
+
+
+def _submit(channel: str, strength: int):
+    devices = srv.BLE_DEVICES
+    if devices:
+        # 未连接的设备只记录目标强度，重连后恢复
+        devices.submit_strength(channel, strength)
+
+
+class WaveSequencer:
+    """
+    单个通道的波形播放器
+
+    播放任务运行在 attach() 绑定的事件循环上 (默认为首次调用时运行中的循环)，
+    play() / stop() 可从其他线程 (flask 模式下的请求线程) 调用，会转交到该循环执行。
+
+    :param channel: 逻辑通道 'A' 或 'B'
+    :param step: 子步时长 (秒)
+    :param spin: 每个子步最后 spin 秒改为让出事件循环的忙等 (占满一个核心)，默认 0 不忙等
+    :param precise: 每个子步最后一个时钟周期改由计时线程等待，默认在时钟分辨率粗于 1ms 时启用
+    :param submit: 强度输出 (channel, strength)，默认提交到 srv.BLE_DEVICES
+    """
+
+    def __init__(
+            self,
+            channel: str,
+            step: float = SUB_STEP_SECONDS,
+            spin: float = 0.0,
+            precise: Optional[bool] = None,
+            submit: Callable[[str, int], None] = _submit,
+        ):
+        self.channel = channel.upper()
+        self.step = step
+        self.spin = spin
+        self.precise = _PRECISE_WAIT if precise is None else precise
+        self.submit = submit
+        self.wave: Optional[WavePattern] = None
+        self.skipped = 0  # 因落后而跳过的子步数
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._jitter = srv.METRICS.stage('wave_step')
+
+    def attach(self, loop: asyncio.AbstractEventLoop = None):
+        """绑定到事件循环，默认使用当前运行中的循环"""
+        self._loop = loop or asyncio.get_running_loop()
+
+    @property
+    def playing(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def play(self, wave: WavePattern, strength_limit: int, restart: bool = True):
+        """
+        开始循环播放波形，替换正在播放的波形 (从第一帧开始)
+
+        :param wave: 波形
+        :param strength_limit: 强度软上限 (0-200)，波形强度 0-100 按比例映射
+        :param restart: False 时若同一波形正在播放则继续播放，不从头开始
+        """
+        self._call(self._play, wave, strength_limit, restart)
+
+    def stop(self):
+        """停止播放，不改变设备当前强度 (由调用方清除或归零)"""
+        if self._loop is None:
+            return  # 从未播放过
+        self._call(self._stop)
+
+    def _call(self, func, *args):
+        if self._loop is None:
+            self.attach()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _play(self, wave: WavePattern, strength_limit: int, restart: bool):
+        if not restart and self.playing and self.wave == wave:
+            return
+        self._stop()
+        self.wave = wave
+        self._task = self._loop.create_task(self._run(wave, strength_limit))
+
+    def _stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, wave: WavePattern, strength_limit: int):
+        strengths = wave.strengths
+        count = len(strengths)
+        step = self.step
+        spin = self.spin
+        margin = max(spin, _CLOCK_RESOLUTION) if self.precise else spin
+        timer = _TIMER if self.precise else None
+        loop = asyncio.get_running_loop()
+        clock = time.perf_counter
+        observe = self._jitter.observe
+        submit = self.submit
+        channel = self.channel
+        last = None
+        start = clock()
+        k = 0
+        while True:
+            target = start + k * step
+            delay = target - clock()
+            if delay > margin:
+                await asyncio.sleep(delay - margin)
+            if timer is not None:
+                remaining = target - clock() - spin
+                if remaining > 0:
+                    await loop.run_in_executor(timer, time.sleep, remaining)
+            if spin > 0:
+                while clock() < target:
+                    await asyncio.sleep(0)
+            late = clock() - target
+            observe(late)
+            if late >= step:
+                missed = int(late / step)
+                k += missed
+                self.skipped += missed
+                logger.debug("Channel {}: 波形落后 {:.1f}ms，跳过 {} 个子步", channel, late * 1000, missed)
+            strength = strengths[k % count] * strength_limit // 100
+            if strength != last:
+                submit(channel, strength)
+                last = strength
+            k += 1
@@ -0,0 +1,94 @@
+"""
+设备状态推送
+
+由单一生产者生成设备状态快照，通过 Server-Sent Events 推送给任意数量的观看者。
+强度、连接状态或遥测缓存变化时由调用方 notify() 触发推送，
+快照只读取本地状态，观看者数量不会增加 BLE 查询。
+"""
+import asyncio
+import json
+from typing import Callable, Optional, Set
+from loguru import logger
+
+
+class StatusHub:
+    """
+    状态快照的共享生产者
+
+    :param snapshot: 返回当前状态 dict 的函数 (只读本地状态，不做 I/O)
+    :param min_interval: 两次推送之间的最小间隔 (秒)，期间的变化合并为一次
+    """
+
+    HEARTBEAT_INTERVAL = 15.0
+
+    def __init__(self, snapshot: Callable[[], dict], min_interval: float = 0.1):
+        self._snapshot = snapshot
+        self.min_interval = min_interval
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._last: Optional[str] = None
+        self._dirty = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._produce())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def notify(self, *_):
+        """状态可能已变化，请求生产者重新生成快照 (可从任意线程调用)"""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dirty.set()
+        else:
+            loop.call_soon_threadsafe(self._dirty.set)
+
+    async def _produce(self):
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            try:
+                payload = json.dumps(self._snapshot(), ensure_ascii=False, separators=(',', ':'))
+            except Exception as e:
+                logger.error(f"[Status] 生成状态快照失败: {e}")
+                continue
+            if payload != self._last:
+                self._last = payload
+                for queue in self._subscribers:
+                    # 每个观看者只保留最新快照，慢速观看者不会积压
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(payload)
+            await asyncio.sleep(self.min_interval)
+
+    async def stream(self):
+        """
+        SSE 事件流 (异步生成器，产出 bytes)
+
+        连接建立时立即发送当前快照，之后只在快照变化时发送，空闲时发送注释行保活。
+        """
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        try:
+            if self._last is not None:
+                yield f"data: {self._last}\n\n".encode('utf-8')
+            self.notify()
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), self.HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b': keepalive\n\n'
+                    continue
+                yield f"data: {payload}\n\n".encode('utf-8')
+        finally:
+            self._subscribers.discard(queue)
@@ -0,0 +1,127 @@
+"""
+预解码的波形
+
+波形的源格式为 Coyote v3 波形的 JSON 数组字符串，例如 '["0A0A0A0A00000000","0A0A0A0A0A0A0A0A"]'，
+每个元素 16 个十六进制字符表示 100ms：4 字节频率 + 4 字节强度 (每 25ms 一个，0-100)。
+WavePattern 只在创建时解析一次，之后热路径只读取预先计算好的字节数组与时长；
+intern() 以源字符串为键缓存 WavePattern，配置接口与各处理器共用同一批对象。
+
+处理器每个节拍产生的强度变化用 IntensityFrame 表示 (数值，不经过字符串)，
+只有需要波形字符串的设备 (DG-Lab WebSocket) 才调用 to_source() 编码。
+"""
+import json
+from functools import lru_cache
+
+FRAME_SECONDS = 0.1   # 每帧时长
+SUB_STEPS = 4         # 每帧的强度子步数 (25ms)
+_FRAME_BYTES = 8
+
+
+class WavePattern:
+    """
+    解码后的波形 (不可变)
+
+    :ivar source: 源字符串 (JSON 数组)
+    :ivar data: 全部帧的原始字节，每帧 8 字节 (4 字节频率 + 4 字节强度)
+    :ivar strengths: 各 25ms 子步的强度 (0-100)，每帧 4 个
+    :ivar frame_strengths: 各帧最后一个子步的强度 (0-100)
+    :ivar duration: 波形时长 (秒)
+    """
+    __slots__ = ('source', 'data', 'strengths', 'frame_strengths', 'duration')
+
+    def __init__(self, source: str):
+        try:
+            frames = json.loads(source)
+        except (TypeError, ValueError):
+            raise ValueError(f"波形格式错误: {source!r:.50}") from None
+        if not isinstance(frames, list) or not frames \
+                or not all(isinstance(frame, str) and len(frame) == 2 * _FRAME_BYTES for frame in frames):
+            raise ValueError(f"波形格式错误: {source!r:.50}")
+        try:
+            data = bytes.fromhex(''.join(frames))
+        except ValueError:
+            raise ValueError(f"波形格式错误: {source!r:.50}") from None
+        strengths = b''.join(data[i + SUB_STEPS:i + _FRAME_BYTES] for i in range(0, len(data), _FRAME_BYTES))
+        if max(strengths) > 100:
+            # 强度按通道 strength_limit 的百分比播放，超过 100 会越过通道上限
+            raise ValueError(f"波形强度超出 0-100 范围: {source!r:.50}")
+
+        self.source = source
+        self.data = data
+        self.strengths = strengths
+        self.frame_strengths = self.strengths[SUB_STEPS - 1::SUB_STEPS]
+        self.duration = len(frames) * FRAME_SECONDS
+
+    @property
+    def frames(self) -> int:
+        return len(self.frame_strengths)
+
+    @property
+    def strength(self) -> int:
+        """首帧强度 (0-100)，BLE 预设模式下作为通道强度"""
+        return self.frame_strengths[0]
+
+    def __str__(self) -> str:
+        return self.source
+
+    def __repr__(self) -> str:
+        return f"WavePattern({self.frames} frames, {self.duration:.1f}s)"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, WavePattern) and self.source == other.source
+
+    def __hash__(self) -> int:
+        return hash(self.source)
+
+
+class IntensityFrame:
+    """
+    一段线性变化的强度 (数值帧)
+
+    :ivar freq: 频率 (编码为波形时使用，0-255)
+    :ivar start: 起始强度 (0-1)
+    :ivar end: 结束强度 (0-1)，BLE 预设模式下作为通道强度
+    :ivar duration: 时长 (秒)
+    """
+    __slots__ = ('freq', 'start', 'end', 'duration')
+
+    def __init__(self, freq: int, start: float, end: float, duration: float = FRAME_SECONDS):
+        if not (0 <= start <= 1 and 0 <= end <= 1):
+            raise ValueError(f"强度超出 0-1 范围: {start}, {end}")
+        self.freq = max(0, min(255, int(freq)))
+        self.start = start
+        self.end = end
+        self.duration = duration
+
+    @property
+    def strength(self) -> int:
+        """结束强度 (0-100)，与 WavePattern.strength 对应"""
+        return int(100 * self.end)
+
+    def to_source(self) -> str:
+        """编码为波形 JSON 字符串：每 100ms 一帧，各 25ms 子步的强度从 start 线性变化到 end"""
+        start, end = int(100 * self.start), int(100 * self.end)
+        steps = max(1, round(self.duration / FRAME_SECONDS)) * SUB_STEPS
+        values = [start + (end - start) * (i + 1) // steps for i in range(steps)]
+        freq = '{:02X}'.format(self.freq) * SUB_STEPS
+        frames = [
+            freq + ''.join('{:02X}'.format(value) for value in values[i:i + SUB_STEPS])
+            for i in range(0, steps, SUB_STEPS)
+        ]
+        return json.dumps(frames, separators=(',', ':'))
+
+    def __str__(self) -> str:
+        return self.to_source()
+
+    def __repr__(self) -> str:
+        return f"IntensityFrame({self.start:.3f} -> {self.end:.3f}, {self.duration:.1f}s)"
+
+
+@lru_cache(maxsize=256)
+def intern(source: str) -> WavePattern:
+    """
+    按源字符串取得 WavePattern，相同字符串只解析一次
+
+    :raises ValueError: 波形格式错误 (不会被缓存)
+    """
+    return WavePattern(source)